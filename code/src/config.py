@@ -18,6 +18,7 @@ class Config:
         'local_port': 53,
         'listen_port': 53,
         'timeout': 5,  # seconds
+        'primary_timeout': 0.5,  # seconds; the local DNS answers fast or not at all
         'max_cache_size': 1000,
         'cache_ttl': 300  # seconds
     }
@@ -9,7 +9,34 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import urllib.robotparser
-from .config import Config
+from config import Config
+
+_RISK_LEVEL_LINE_RE = re.compile(r'Risk Level:\s*(low|medium|high)', re.IGNORECASE)
+_CATEGORY_LINE_RE = re.compile(r'Category:\s*(social|shopping|gambling|gaming|news|education|entertainment|business|technology|health|finance|adult|malicious|search|cloud|government|nonprofit|other)', re.IGNORECASE)
+
+# Free-text risk wording, one pattern per level, in priority order
+_RISK_LEVEL_RES = tuple((level, re.compile('|'.join(patterns), re.IGNORECASE)) for level, patterns in (
+    ('high', [
+        r'high(?:-|\s)?risk',
+        r'severe(?:-|\s)?risk',
+        r'critical(?:-|\s)?risk',
+        r'extremely(?:-|\s)?dangerous',
+        r'block(?:ed)?\s+immediately'
+    ]),
+    ('medium', [
+        r'medium(?:-|\s)?risk',
+        r'moderate(?:-|\s)?risk',
+        r'caution(?:ary)?',
+        r'potentially(?:-|\s)?harmful',
+        r'proceed(?:-|\s)?with(?:-|\s)?caution'
+    ]),
+    ('low', [
+        r'low(?:-|\s)?risk',
+        r'minimal(?:-|\s)?risk',
+        r'likely(?:-|\s)?safe',
+        r'no(?:-|\s)?significant(?:-|\s)?risk'
+    ]),
+))
 
 class ContentChecker:
     def __init__(self):
@@ -243,7 +270,7 @@ class ContentChecker:
     def _extract_risk_level_from_response(self, response: str) -> str:
         """Extract risk level from structured GPT response."""
         # Look for the structured format first
-        risk_match = re.search(r'Risk Level:\s*(low|medium|high)', response, re.IGNORECASE)
+        risk_match = _RISK_LEVEL_LINE_RE.search(response)
         if risk_match:
             return risk_match.group(1).lower()
         return "unknown"
@@ -251,41 +278,16 @@ class ContentChecker:
     def _extract_category_from_response(self, response: str) -> str:
         """Extract category from structured GPT response."""
         # Look for the structured format first
-        category_match = re.search(r'Category:\s*(social|shopping|gambling|gaming|news|education|entertainment|business|technology|health|finance|adult|malicious|search|cloud|government|nonprofit|other)', response, re.IGNORECASE)
+        category_match = _CATEGORY_LINE_RE.search(response)
         if category_match:
             return category_match.group(1).lower()
         return "unknown"
 
     def _extract_risk_level(self, analysis: str) -> str:
         """Extracts risk level from the analysis text using pattern matching."""
-        analysis_lower = analysis.lower()
-        
-        # More comprehensive risk level detection
-        risk_patterns = {
-            'high': [
-                r'high(?:-|\s)?risk',
-                r'severe(?:-|\s)?risk',
-                r'critical(?:-|\s)?risk',
-                r'extremely(?:-|\s)?dangerous',
-                r'block(?:ed)?\s+immediately'
-            ],
-            'medium': [
-                r'medium(?:-|\s)?risk',
-                r'moderate(?:-|\s)?risk',
-                r'caution(?:ary)?',
-                r'potentially(?:-|\s)?harmful',
-                r'proceed(?:-|\s)?with(?:-|\s)?caution'
-            ],
-            'low': [
-                r'low(?:-|\s)?risk',
-                r'minimal(?:-|\s)?risk',
-                r'likely(?:-|\s)?safe',
-                r'no(?:-|\s)?significant(?:-|\s)?risk'
-            ]
-        }
-        
-        for level, patterns in risk_patterns.items():
-            if any(re.search(pattern, analysis_lower) for pattern in patterns):
+        # One case-insensitive search per level, highest first, without a lowercased copy
+        for level, pattern in _RISK_LEVEL_RES:
+            if pattern.search(analysis):
                 return level
                 
         return "unknown"
@@ -166,6 +166,12 @@ class DatabaseManager:
             if result:
                 domain_id = result[0]
                 logging.debug(f"Found existing domain ID {domain_id} for {domain_name}")
+                if category is not None:
+                    # Query logging creates rows before the domain has been categorised
+                    cursor.execute(
+                        "UPDATE domains SET category = %s, is_unethical = %s WHERE id = %s AND category IS NULL",
+                        (category, is_unethical, domain_id)
+                    )
             else:
                 # Create new domain
                 cursor.execute(
@@ -182,6 +188,26 @@ class DatabaseManager:
             logging.error(f"Error getting/creating domain: {err}")
             return None
     
+    def get_domain_verdict(self, domain_name: str) -> Optional[Tuple[str, bool]]:
+        """Get the category and is_unethical flag stored for a domain, or None if it hasn't been categorised"""
+        connection = self._ensure_connection()
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT category, is_unethical FROM domains WHERE domain = %s AND category IS NOT NULL",
+                (domain_name,)
+            )
+            result = cursor.fetchone()
+            cursor.close()
+            return (result[0], bool(result[1])) if result else None
+            
+        except mysql.connector.Error as err:
+            logging.error(f"Error getting domain verdict: {err}")
+            return None
+    
     def dns_query(self, domain_name: str, dns_server_ip: str, cache_hit: bool, 
                      is_blocked: bool = False):
         """
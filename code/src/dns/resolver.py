@@ -1,99 +1,353 @@
 import socket
 import struct
 import logging
+import functools
 from ip_blocker import IPBlocker
-from content_checker import ContentChecker
 import time
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dns_cache import DNSCache
 
+# Connected sockets kept per upstream server; DNSServer runs 6 workers
+UPSTREAM_POOL_SIZE = 8
+# Largest upstream response read
+UPSTREAM_RECV_SIZE = 1024
+# Domains whose content check has run (or is running), most recent last
+CONTENT_CHECK_CACHE_SIZE = 8192
+# Seconds before a checked domain is checked again
+CONTENT_CHECK_TTL = 3600
+CONTENT_CHECK_WORKERS = 2
+# Cache hits waiting to be logged; beyond this they are dropped and counted
+QUERY_LOG_QUEUE_SIZE = 1024
+
+# Big-endian 16-bit field; unpack_from reads it in place without slicing the packet
+_U16 = struct.Struct('!H')
+
 class DNSResolver:
     def __init__(self, primary_dns, primary_port, fallback_dns_list, notification_manager, 
-                 database_manager, timeout=5, max_cache_size=1000, cache_ttl=300):
+                 database_manager, timeout=5, max_cache_size=1000, cache_ttl=300, primary_timeout=None):
         self.primary_dns = primary_dns
         self.primary_port = primary_port
         self.fallback_dns_list = fallback_dns_list  # List of (dns_server, port) tuples
         self.timeout = timeout
+        # Give up on the primary DNS sooner so the fallbacks still answer in time
+        self.primary_timeout = timeout if primary_timeout is None else primary_timeout
         self.ip_blocker = IPBlocker()
         self.cache = DNSCache(max_size=max_cache_size, ttl=cache_ttl)
         self.notification_manager = notification_manager
-        self.content_checker = ContentChecker()
         self.database_manager = database_manager
+        # (server, port) -> queue of idle sockets already connected to that server
+        self._upstream_sockets = {}
+        self._upstream_sockets_lock = threading.Lock()
+        # Per-thread receive buffer, so reading a response allocates only the copy returned
+        self._recv_buffers = threading.local()
+        # Query (minus its ID) -> Future for the lookup already resolving it
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # Content checks call out to the network, so they run off the query path
+        # domain -> monotonic time its last check was started
+        self._content_checks = OrderedDict()
+        self._content_checks_lock = threading.Lock()
+        self._content_check_executor = ThreadPoolExecutor(max_workers=CONTENT_CHECK_WORKERS,
+                                                          thread_name_prefix="content-check")
+        # Cache hits answered on the server's reader thread are logged by a background
+        # thread, started on first use; the queue is bounded so a slow database only drops them
+        self._query_log = queue.Queue(maxsize=QUERY_LOG_QUEUE_SIZE)
+        self._query_log_thread = None
+        self._query_log_thread_lock = threading.Lock()
+        self.dropped_query_logs = 0
+
+    @functools.cached_property
+    def content_checker(self):
+        """
+        The ContentChecker, created on first use since it brings in the OpenAI and web clients
+        """
+        from content_checker import ContentChecker
+        return ContentChecker()
 
     def resolve(self, query_data):
+        """
+        Resolves a DNS query, sharing the upstream lookup with any identical query already in flight
+        Returns the response data if successful, None if all attempts fail
+        """
+        # Identical queries from different clients differ only in their ID
+        key = bytes(query_data[2:])
+        with self._inflight_lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                future = self._inflight[key] = Future()
+
+        if pending is not None:
+            # Wait as long as the first query can take to try every server
+            try:
+                response = pending.result(timeout=self.primary_timeout + self.timeout * len(self.fallback_dns_list))
+            except FutureTimeoutError:
+                return None
+            # Answer with this client's query ID
+            return query_data[:2] + response[2:] if response else None
+
+        try:
+            response = self._resolve(query_data)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def record_cache_hit(self, query_data):
+        """
+        Records a query that was answered from the cache without going through resolve()
+        """
+        if not self.database_manager:
+            return
+        if self._query_log_thread is None:
+            self._start_query_log_thread()
+        try:
+            self._query_log.put_nowait(query_data)
+        except queue.Full:
+            self.dropped_query_logs += 1
+
+    def _start_query_log_thread(self):
+        """
+        Starts the thread logging queued cache hits, unless it is already running
+        """
+        with self._query_log_thread_lock:
+            if self._query_log_thread is None:
+                thread = threading.Thread(target=self._log_cache_hits, name="query-log", daemon=True)
+                thread.start()
+                self._query_log_thread = thread
+
+    def _log_cache_hits(self):
+        """
+        Logs queued cache hits to the database, one at a time
+        """
+        while True:
+            query_data = self._query_log.get()
+            try:
+                self._record_cache_hit(query_data)
+            finally:
+                self._query_log.task_done()
+
+    def _record_cache_hit(self, query_data):
+        """
+        Logs a cache hit to the database, as _resolve does for hits it answers itself
+        """
+        try:
+            self._database_info_dns_query(self._query_domain(query_data), "cache", True, False)
+        except Exception as e:
+            # Nothing waits on the log entry, so report failures here
+            logging.error("Error logging cache hit: %s", str(e))
+
+    def _resolve(self, query_data):
         """
         Attempts to resolve a DNS query using cache then primary DNS first, then falls back to secondary DNS servers
         Returns the response data if successful, None if all attempts fail
         """
-        cached_response = self.cache.get(query_data)
+        # Parsed once here and shared by the content check and the query log
+        domain = self._query_domain(query_data)
+
+        cached_response = self.cache.get_response(query_data)
         if cached_response:
-            logging.info(f"Cache hit for DNS query.")
-            self._database_info(cached_response, "cache", True, False)
+            logging.debug("Cache hit for DNS query.")
+            self._database_info_dns_query(domain, "cache", True, False)
             return cached_response
 
         # Try primary DNS first
         response = self._try_resolve(query_data, self.primary_dns, self.primary_port, is_primary=True)
         if response:
-            self.cache.set(query_data, response)
-            self._database_info(response, self.primary_dns, False, False)
+            self.cache.set_response(query_data, response)
+            self._database_info_dns_query(domain, self.primary_dns, False, False)
             return response
 
         # Try each fallback DNS server in order
         for i, (fallback_dns, fallback_port) in enumerate(self.fallback_dns_list):
-            logging.info(f"Trying fallback DNS server {i+1}/{len(self.fallback_dns_list)}: {fallback_dns}")
+            logging.info("Trying fallback DNS server %d/%d: %s", i + 1, len(self.fallback_dns_list), fallback_dns)
             response = self._try_resolve(query_data, fallback_dns, fallback_port, is_primary=False)
             
             if response:
-                # Extract domain from query for content checking
-                domain_parts = self._extract_domain_name(query_data, 12)  # Start after DNS header
-                if domain_parts:
-                    domain = '.'.join(domain_parts)
-                    is_appropriate, reason, category = self.content_checker.check_domain(domain)
-                    logging.info(f"Domain analysis for {domain}: category={category}, appropriate={is_appropriate}")
-                    if not is_appropriate:
-                        self.notification_manager.notify_domain_inappropriate_content(domain, reason)
-
-                self.cache.set(query_data, response)
-                self._database_info_domain(domain, category, is_appropriate)
-                self._database_info(response, fallback_dns, False, False)
+                # Check the content of domains resolved outside the primary DNS
+                if domain:
+                    self._schedule_content_check(domain)
+
+                self.cache.set_response(query_data, response)
+                self._database_info_dns_query(domain, fallback_dns, False, False)
                 return response
             else:
-                logging.warning(f"Fallback DNS server {fallback_dns} failed, trying next server...")
+                logging.warning("Fallback DNS server %s failed, trying next server...", fallback_dns)
 
         logging.error("All DNS servers failed to resolve the query")
         return None
 
+    def _schedule_content_check(self, domain):
+        """
+        Starts a background content check for a domain unless it was checked recently
+        """
+        now = time.monotonic()
+        with self._content_checks_lock:
+            checked_at = self._content_checks.get(domain)
+            if checked_at is not None and now - checked_at < CONTENT_CHECK_TTL:
+                self._content_checks.move_to_end(domain)
+                return
+            self._content_checks[domain] = now
+            self._content_checks.move_to_end(domain)
+            if len(self._content_checks) > CONTENT_CHECK_CACHE_SIZE:
+                self._content_checks.popitem(last=False)
+        self._content_check_executor.submit(self._check_content, domain)
+
+    def _check_content(self, domain):
+        """
+        Checks a domain's content, notifying about and recording the verdict
+        """
+        try:
+            stored = self._database_domain_verdict(domain)
+            if stored:
+                # Checked before this run
+                category, is_appropriate = stored
+                reason = f"Previously categorised as {category}"
+            else:
+                is_appropriate, reason, category = self.content_checker.check_domain(domain)
+            logging.info("Domain analysis for %s: category=%s, appropriate=%s", domain, category, is_appropriate)
+            if not is_appropriate:
+                self.notification_manager.notify_domain_inappropriate_content(domain, reason)
+            if not stored:
+                self._database_info_domain(domain, category, not is_appropriate)
+        except Exception as e:
+            # Nothing waits on the check, so report failures here
+            logging.error("Error checking content of %s: %s", domain, str(e))
+
+    def _query_domain(self, query_data):
+        """
+        Returns the domain name a query asks about, or None if it can't be parsed
+        """
+        # Question names are never compressed, so the whole QNAME (after the DNS header)
+        # can be decoded in one go once its length bytes are rewritten as dots
+        try:
+            end = query_data.index(0, 12)
+            name = bytearray(query_data[12:end])
+            offset = 0
+            while offset < len(name):
+                length = name[offset]
+                if length & 0xc0:
+                    return None
+                name[offset] = 0x2e  # '.'
+                offset += length + 1
+            if offset != len(name) or not name:
+                return None
+            return name[1:].decode('ascii')
+        except (ValueError, UnicodeDecodeError):
+            return None
+
     def _try_resolve(self, query_data, dns_server, port, is_primary):
         """
         Attempts to resolve a DNS query using the specified DNS server
         """
-        query_id = struct.unpack('!H', query_data[:2])[0]
-        dns_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        dns_socket.settimeout(self.timeout)
-
+        query_id = _U16.unpack_from(query_data)[0]
+        timeout = self.primary_timeout if is_primary else self.timeout
         try:
-            dns_socket.sendto(query_data, (dns_server, port))
-            response_data, _ = dns_socket.recvfrom(1024)
-
-            if len(response_data) > 12:
-                answer_count = struct.unpack('!H', response_data[6:8])[0]
-                if answer_count > 0:
-                    # Extract and validate IP addresses from the response
-                    if self._validate_response_ips(response_data):
-                        logging.info(f"{'Primary' if is_primary else 'Fallback'} DNS resolved query ID: {query_id}")
-                        if not is_primary:
-                            self.notification_manager.notify_dns_change(self.primary_dns, dns_server)
-                        return response_data
-                    else:
-                        logging.warning(f"Blocked IP detected in response for query ID: {query_id}")
-                        return None
-
-            logging.info(f"{'Primary' if is_primary else 'Fallback'} DNS returned no answers for query ID: {query_id}")
+            dns_socket = self._checkout_socket(dns_server, port, timeout)
+        except OSError as e:
+            # E.g. the network is unreachable or the address is invalid
+            logging.info("%s DNS error for query ID %d: %s", 'Primary' if is_primary else 'Fallback', query_id, str(e))
             return None
 
+        try:
+            dns_socket.send(query_data)
+            buffer = self._recv_buffer()
+            deadline = time.monotonic() + timeout
+            while True:
+                nbytes = dns_socket.recv_into(buffer)
+                if buffer[:2] == query_data[:2]:
+                    break
+                # A late reply to an earlier query on this socket, or a spoofed one
+                logging.debug("Discarding reply with mismatched ID for query ID: %d", query_id)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout()
+                dns_socket.settimeout(remaining)
+            response_data = bytes(buffer[:nbytes])
         except socket.timeout:
-            logging.info(f"{'Primary' if is_primary else 'Fallback'} DNS timeout for query ID: {query_id}")
+            # A late reply could still arrive on this socket, so it is not reused
+            dns_socket.close()
+            logging.info("%s DNS timeout for query ID: %d", 'Primary' if is_primary else 'Fallback', query_id)
             return None
-        finally:
+        except OSError as e:
+            # The socket is connected, so an ICMP error from the server (e.g. port
+            # unreachable) surfaces here; treat it as a failed attempt
+            dns_socket.close()
+            logging.info("%s DNS error for query ID %d: %s", 'Primary' if is_primary else 'Fallback', query_id, str(e))
+            return None
+        except BaseException:
+            dns_socket.close()
+            raise
+        self._checkin_socket(dns_server, port, dns_socket)
+
+        if len(response_data) > 12:
+            # ANCOUNT; the length check above guarantees both bytes are there
+            if int.from_bytes(response_data[6:8], 'big') > 0:
+                # Extract and validate IP addresses from the response
+                if self._validate_response_ips(response_data):
+                    logging.debug("%s DNS resolved query ID: %d", 'Primary' if is_primary else 'Fallback', query_id)
+                    if not is_primary:
+                        self.notification_manager.notify_dns_change(self.primary_dns, dns_server)
+                    return response_data
+                else:
+                    logging.warning("Blocked IP detected in response for query ID: %d", query_id)
+                    return None
+
+        logging.debug("%s DNS returned no answers for query ID: %d", 'Primary' if is_primary else 'Fallback', query_id)
+        return None
+
+    def _recv_buffer(self):
+        """
+        Returns the calling thread's receive buffer, as a memoryview so slicing it doesn't copy
+        """
+        buffer = getattr(self._recv_buffers, 'buffer', None)
+        if buffer is None:
+            buffer = self._recv_buffers.buffer = memoryview(bytearray(UPSTREAM_RECV_SIZE))
+        return buffer
+
+    def _checkout_socket(self, dns_server, port, timeout):
+        """
+        Returns an idle socket connected to the given DNS server, creating one if none is free
+        """
+        pool = self._upstream_sockets.get((dns_server, port))
+        if pool is not None:
+            try:
+                dns_socket = pool.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                # The same server can be tried as primary and as a fallback, with different timeouts
+                if dns_socket.gettimeout() != timeout:
+                    dns_socket.settimeout(timeout)
+                return dns_socket
+
+        dns_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            dns_socket.settimeout(timeout)
+            dns_socket.connect((dns_server, port))
+        except BaseException:
+            dns_socket.close()
+            raise
+        return dns_socket
+
+    def _checkin_socket(self, dns_server, port, dns_socket):
+        """
+        Returns a socket to its server's pool, closing it if the pool is already full
+        """
+        pool = self._upstream_sockets.get((dns_server, port))
+        if pool is None:
+            with self._upstream_sockets_lock:
+                pool = self._upstream_sockets.setdefault((dns_server, port), queue.Queue(UPSTREAM_POOL_SIZE))
+        try:
+            pool.put_nowait(dns_socket)
+        except queue.Full:
             dns_socket.close()
 
     def _validate_response_ips(self, response_data):
@@ -101,22 +355,24 @@ class DNSResolver:
         Validates IP addresses in the DNS response against blocking rules
         Returns True if all IPs are valid, False if any are blocked
         """
+        # Records that are only parsed for the debug log are skipped otherwise
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         try:
             # Skip header (12 bytes) and question section
             offset = 12
-            logging.debug(f"Initial offset: {offset}, Response length: {len(response_data)}")
+            logging.debug("Initial offset: %d, Response length: %d", offset, len(response_data))
             
             # Skip question section
             while response_data[offset] != 0:
                 offset += 1
-            logging.debug(f"After question section, offset: {offset}")
+            logging.debug("After question section, offset: %d", offset)
             
             offset += 5  # Skip null terminator and type/class
-            logging.debug(f"After skipping type/class, offset: {offset}")
+            logging.debug("After skipping type/class, offset: %d", offset)
             
             # Check each answer section
             while offset < len(response_data):
-                logging.debug(f"Processing answer section at offset: {offset}")
+                logging.debug("Processing answer section at offset: %d", offset)
                 
                 # Skip the name field (which might be compressed)
                 name_offset = offset
@@ -133,72 +389,73 @@ class DNSResolver:
                     name_offset += 1 + length
                 
                 # Now we're at the type field
-                record_type = struct.unpack('!H', response_data[name_offset:name_offset+2])[0]
-                record_type_name = self._get_record_type_name(record_type)
-                logging.debug(f"Record type at offset {name_offset}: {record_type} ({record_type_name})")
+                record_type = _U16.unpack_from(response_data, name_offset)[0]
+                if debug:
+                    logging.debug("Record type at offset %d: %d (%s)", name_offset, record_type,
+                                  self._get_record_type_name(record_type))
                 
                 # Handle different record types
                 if record_type == 1:  # A Record (IPv4)
                     # Extract IPv4 address (4 bytes after the type/class)
                     ip_bytes = response_data[name_offset+10:name_offset+14]
                     ip_str = socket.inet_ntoa(ip_bytes)
-                    logging.debug(f"Found A record with IPv4: {ip_str}")
+                    logging.debug("Found A record with IPv4: %s", ip_str)
                     
                     # Check if IP is blocked
                     is_blocked, reason = self.ip_blocker.is_blocked_ip(ip_str)
                     if is_blocked:
-                        logging.warning(f"Blocked IPv4 detected: {ip_str} - {reason}")
+                        logging.warning("Blocked IPv4 detected: %s - %s", ip_str, reason)
                         return False
 
                 elif record_type == 28:  # AAAA Record (IPv6)
                     # Extract IPv6 address (16 bytes after the type/class)
                     ip_bytes = response_data[name_offset+10:name_offset+26]
                     ip_str = socket.inet_ntop(socket.AF_INET6, ip_bytes)
-                    logging.debug(f"Found AAAA record with IPv6: {ip_str}")
+                    logging.debug("Found AAAA record with IPv6: %s", ip_str)
                     
                     # Check if IP is blocked
                     is_blocked, reason = self.ip_blocker.is_blocked_ip(ip_str)
                     if is_blocked:
-                        logging.warning(f"Blocked IPv6 detected: {ip_str} - {reason}")
+                        logging.warning("Blocked IPv6 detected: %s - %s", ip_str, reason)
                         return False
 
-                elif record_type == 5:  # CNAME Record
+                elif record_type == 5 and debug:  # CNAME Record
                     # Extract the target domain name
                     target_name = self._extract_domain_name(response_data, name_offset+10)
-                    logging.debug(f"Found CNAME record pointing to: {'.'.join(target_name)}")
+                    logging.debug("Found CNAME record pointing to: %s", '.'.join(target_name))
                     # Note: We don't block CNAMEs, they're just aliases
 
-                elif record_type == 6:  # SOA Record
+                elif record_type == 6 and debug:  # SOA Record
                     try:
                         # Extract the primary nameserver and admin email
                         current_offset = name_offset + 10
                         primary_ns = self._extract_domain_name(response_data, current_offset)
                         current_offset += len(primary_ns) + 1  # +1 for the length byte
                         admin_email = self._extract_domain_name(response_data, current_offset)
-                        logging.debug(f"Found SOA record - Primary NS: {'.'.join(primary_ns)}, Admin: {'.'.join(admin_email)}")
+                        logging.debug("Found SOA record - Primary NS: %s, Admin: %s", '.'.join(primary_ns), '.'.join(admin_email))
                     except Exception as e:
-                        logging.debug(f"Error parsing SOA record: {str(e)}")
+                        logging.debug("Error parsing SOA record: %s", str(e))
                         # Don't block on SOA parsing errors, just log and continue
                     # Note: We don't block SOA records
 
-                elif record_type == 65:  # HTTPS Record
+                elif record_type == 65 and debug:  # HTTPS Record
                     try:
                         # Extract the target name
                         target_name = self._extract_domain_name(response_data, name_offset+10)
-                        logging.debug(f"Found HTTPS record pointing to: {'.'.join(target_name)}")
+                        logging.debug("Found HTTPS record pointing to: %s", '.'.join(target_name))
                     except Exception as e:
-                        logging.debug(f"Error parsing HTTPS record: {str(e)}")
+                        logging.debug("Error parsing HTTPS record: %s", str(e))
                         # Don't block on HTTPS parsing errors, just log and continue
                     # Note: We don't block HTTPS records
                 
                 # Move to next record
-                data_length = struct.unpack('!H', response_data[name_offset+8:name_offset+10])[0]
+                data_length = _U16.unpack_from(response_data, name_offset + 8)[0]
                 offset = name_offset + 10 + data_length
-                logging.debug(f"Next record offset: {offset}")
+                logging.debug("Next record offset: %d", offset)
 
             return True
         except Exception as e:
-            logging.error(f"Error validating response IPs: {str(e)}")
+            logging.error("Error validating response IPs: %s", str(e))
             return False
 
     def _get_record_type_name(self, record_type):
@@ -236,7 +493,7 @@ class DNSResolver:
             # Check if this is a pointer
             if length & 0xc0 == 0xc0:
                 # Get the pointer offset
-                pointer = struct.unpack('!H', data[current_offset:current_offset+2])[0] & 0x3fff
+                pointer = _U16.unpack_from(data, current_offset)[0] & 0x3fff
                 # Recursively get the name from the pointer location
                 name_parts.extend(self._extract_domain_name(data, pointer))
                 break
@@ -248,12 +505,12 @@ class DNSResolver:
             except UnicodeDecodeError:
                 # If we can't decode as ASCII, try to handle it as a compressed name
                 if length & 0xc0 == 0xc0:
-                    pointer = struct.unpack('!H', data[current_offset-1:current_offset+1])[0] & 0x3fff
+                    pointer = _U16.unpack_from(data, current_offset - 1)[0] & 0x3fff
                     name_parts.extend(self._extract_domain_name(data, pointer))
                     break
                 else:
                     # If it's not a compressed name, just skip this part
-                    logging.debug(f"Could not decode name part at offset {current_offset}")
+                    logging.debug("Could not decode name part at offset %d", current_offset)
             current_offset += length
         return name_parts 
 
@@ -269,4 +526,16 @@ class DNSResolver:
         Logs domain information to the database
         """
         if self.database_manager:
-            self.database_manager.get_or_create_domain(domain_name, category, is_unethical)
\ No newline at end of file
+            self.database_manager.get_or_create_domain(domain_name, category, is_unethical)
+
+    def _database_domain_verdict(self, domain_name):
+        """
+        Returns the (category, is_appropriate) stored for a domain, or None if it has none
+        """
+        if self.database_manager:
+            verdict = self.database_manager.get_domain_verdict(domain_name)
+            if verdict:
+                # The database stores the inverse, as is_unethical
+                category, is_unethical = verdict
+                return category, not is_unethical
+        return None
@@ -1,45 +1,346 @@
 import socket
 import threading
 import logging
-from .resolver import DNSResolver
+import queue
+import selectors
+import time
+from collections import OrderedDict, deque
+
+# Largest DNS query we accept over UDP (room for EDNS-sized packets)
+MAX_PACKET_SIZE = 4096
+
+# Maximum number of queries drained from the socket per wakeup
+RECV_BATCH_SIZE = 64
+
+# Queries waiting for a worker; beyond this the reader drops them and clients retry
+MAX_PENDING_QUERIES = 1024
+
+# Kernel socket buffer size; the defaults (~200 KiB) overflow and drop queries under bursts
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Worker threads resolving queries; this also caps concurrent upstream lookups,
+# kept small like browser resolvers do to stay clear of upstream rate limits
+DEFAULT_WORKERS = 6
+
+# Resolutions slower than this (seconds) move the client to the low-priority queue
+SLOW_QUERY_THRESHOLD = 0.05
+
+# Number of slow clients remembered
+MAX_SLOW_CLIENTS = 256
+
+
+class _QueryQueue:
+    """
+    Bounded two-level queue between the reader and the workers: workers always
+    take queries from the high-priority side before the low-priority one
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.high = deque()
+        self.low = deque()
+        self._ready = threading.Condition()
+
+    def qsize(self):
+        return len(self.high) + len(self.low)
+
+    def put_batch(self, high, low=()):
+        """
+        Queues a batch of queries under a single lock acquisition and returns
+        how many were dropped because maxsize queries are already waiting
+        """
+        with self._ready:
+            room = self.maxsize - self.qsize()
+            accepted_high = high[:room]
+            accepted_low = low[:max(room - len(accepted_high), 0)]
+            self.high.extend(accepted_high)
+            self.low.extend(accepted_low)
+            queued = len(accepted_high) + len(accepted_low)
+            if queued:
+                self._ready.notify(queued)
+            return len(high) + len(low) - queued
+
+    def put(self, item):
+        """
+        Queues an item behind everything already waiting, ignoring the size limit
+        (used for the workers' stop sentinels)
+        """
+        with self._ready:
+            self.low.append(item)
+            self._ready.notify()
+
+    def get(self):
+        """
+        Waits for an item, preferring the high-priority side
+        """
+        with self._ready:
+            while not (self.high or self.low):
+                self._ready.wait()
+            return self.high.popleft() if self.high else self.low.popleft()
+
 
 class DNSServer:
-    def __init__(self, listen_port, resolver):
-        self.listen_port = listen_port
+    def __init__(self, port, resolver, workers=DEFAULT_WORKERS, cache=None, reuse_port=False):
+        self.port = port
         self.resolver = resolver
-        self.socket = None
+        self.cache = cache
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.running = False
+        self.server_socket = None
+        self.dropped_queries = 0
+        self._selector = None
+        self._wakeup = None
+        self._threads = []
+        # Only the reader receives, so one preallocated buffer is reused for every packet
+        self._recv_buffer = memoryview(bytearray(MAX_PACKET_SIZE))
+        self._slow_clients = OrderedDict()
+        self._slow_clients_lock = threading.Lock()
+        self._queries = _QueryQueue(MAX_PENDING_QUERIES)
+        self._replies = queue.Queue()
 
     def start(self):
         """
-        Starts the DNS server and begins listening for queries
+        Starts the DNS server: a reader thread receives queries, a pool of worker
+        threads resolves them and a sender thread writes the answers back
         """
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.socket.bind(('0.0.0.0', self.listen_port))
-        logging.info("DNS Server listening on port %d", self.listen_port)
+        if self.running:
+            return
 
-        while True:
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port and hasattr(socket, 'SO_REUSEPORT'):
+                # Lets several server processes share the port; the kernel balances between them
+                server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self._set_buffer_sizes(server_socket)
+            server_socket.setblocking(False)
+            server_socket.bind(('', self.port))
+        except OSError as e:
+            logging.error("Failed to start DNS server on port %d: %s", self.port, str(e))
+            server_socket.close()
+            raise
+
+        # The reader sleeps in one selector on the server socket and a wakeup
+        # socket that stop() writes to, instead of polling with a timeout
+        self._wakeup = socket.socketpair()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(server_socket, selectors.EVENT_READ)
+        self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+
+        self.server_socket = server_socket
+        self.running = True
+        self._queries = _QueryQueue(MAX_PENDING_QUERIES)
+        self._replies = queue.Queue()
+        # The pool of threads is created once per start and lives until stop;
+        # no thread is ever spawned per query
+        self._threads = [threading.Thread(target=self._run_server)]
+        self._threads += [threading.Thread(target=self._worker_loop) for _ in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._sender_loop))
+        names = ["dns-reader"] + [f"dns-worker-{i}" for i in range(self.workers)] + ["dns-sender"]
+        for thread, name in zip(self._threads, names):
+            thread.name = name
+            thread.daemon = True
+            thread.start()
+        logging.info("DNS Server listening on port %d with %d workers", self.port, self.workers)
+
+    def _set_buffer_sizes(self, server_socket):
+        """
+        Enlarges the socket's kernel buffers so bursts of queries queue up
+        instead of being dropped; the OS may cap the size, which is fine
+        """
+        for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            try:
+                server_socket.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER_SIZE)
+            except OSError as e:
+                logging.warning("Could not set socket buffer size: %s", str(e))
+
+    def _wait_readable(self):
+        """
+        Blocks until the server socket has queries to read (True) or stop()
+        wakes the reader up (False)
+        """
+        for key, _ in self._selector.select():
+            if key.fileobj is self.server_socket:
+                return True
+        return False
+
+    def _recv_batch(self, max_batch=RECV_BATCH_SIZE):
+        """
+        Receives a batch of queries from the non-blocking socket, draining
+        whatever is queued so a burst of queries costs one wakeup instead of
+        one per packet. Packets land in the reused receive buffer and only
+        their payload is copied out
+        """
+        buffer = self._recv_buffer
+        recvfrom_into = self.server_socket.recvfrom_into
+
+        batch = []
+        while len(batch) < max_batch:
+            try:
+                nbytes, client_address = recvfrom_into(buffer)
+            except BlockingIOError:
+                break
+            except OSError:
+                if not batch:
+                    raise
+                # Handle what we have; the error shows up again on the next read
+                break
+            batch.append((bytes(buffer[:nbytes]), client_address))
+        return batch
+
+    def _run_server(self):
+        """
+        Reader loop: only drains the socket and queues queries for the workers,
+        so slow resolutions never leave the kernel receive buffer unread.
+        Queries already in the cache are answered straight away, and clients
+        whose lookups have been slow are queued behind everyone else
+        """
+        # Per-packet work is kept to local lookups; queueing takes one lock per batch
+        wait_readable = self._wait_readable
+        recv_batch = self._recv_batch
+        put_batch = self._queries.put_batch
+        reply = self._replies.put
+        cache_get = self.cache.get_response if self.cache is not None else None
+        record_cache_hit = self.resolver.record_cache_hit
+        slow_clients = self._slow_clients
+        while self.running:
             try:
-                data, client_address = self.socket.recvfrom(1024)
-                threading.Thread(target=self._handle_query, args=(data, client_address)).start()
+                if not wait_readable():
+                    continue
+                batch = recv_batch()
             except Exception as e:
+                if not self.running:
+                    break
                 logging.error("Error in main loop: %s", str(e))
+                continue
+
+            high, low = [], []
+            for query in batch:
+                data, client_address = query
+                if cache_get:
+                    cached_response = cache_get(data)
+                    if cached_response:
+                        reply((cached_response, client_address))
+                        record_cache_hit(data)
+                        continue
+                if client_address[0] in slow_clients:
+                    low.append(query)
+                else:
+                    high.append(query)
 
-    def _handle_query(self, data, client_address):
+            if high or low:
+                self.dropped_queries += put_batch(high, low)
+
+    def _worker_loop(self):
         """
-        Handles an incoming DNS query
+        Worker loop: resolves queued queries until it receives the stop sentinel
         """
-        try:
-            response_data = self.resolver.resolve(data)
+        get = self._queries.get
+        resolve = self.resolver.resolve
+        reply = self._replies.put
+        record_query_time = self._record_query_time
+        monotonic = time.monotonic
+        while True:
+            query = get()
+            if query is None:
+                break
+
+            data, client_address = query
+            started = monotonic()
+            try:
+                response_data = resolve(data)
+            except Exception as e:
+                logging.error("Error handling query: %s", str(e))
+                continue
+            finally:
+                record_query_time(client_address[0], monotonic() - started)
             if response_data:
-                self.socket.sendto(response_data, client_address)
-        except Exception as e:
-            logging.error("Error handling query: %s", str(e))
+                reply((response_data, client_address))
+
+    def _record_query_time(self, client_ip, elapsed):
+        """
+        Tracks clients whose queries are expensive to resolve so their later
+        queries don't hold up everyone else; a fast query clears the mark
+        """
+        is_slow = elapsed > SLOW_QUERY_THRESHOLD
+        if not is_slow and client_ip not in self._slow_clients:
+            return
+
+        with self._slow_clients_lock:
+            if is_slow:
+                self._slow_clients[client_ip] = None
+                self._slow_clients.move_to_end(client_ip)
+                if len(self._slow_clients) > MAX_SLOW_CLIENTS:
+                    self._slow_clients.popitem(last=False)
+            else:
+                self._slow_clients.pop(client_ip, None)
+
+    def _sender_loop(self):
+        """
+        Sender loop: flushes every answer that is ready in one go until it
+        receives the stop sentinel
+        """
+        while True:
+            replies = [self._replies.get()]
+            while replies[-1] is not None:
+                try:
+                    replies.append(self._replies.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = replies[-1] is None
+            if stopping:
+                replies.pop()
+            self._send_batch(replies)
+            if stopping:
+                break
+
+    def _send_batch(self, replies):
+        """
+        Sends (response, client_address) pairs, skipping queries with no response
+        """
+        server_socket = self.server_socket
+        if server_socket is None:
+            return  # Stopped while the batch was being resolved
+
+        sendto = server_socket.sendto
+        for response_data, client_address in replies:
+            if not response_data:
+                continue
+            try:
+                sendto(response_data, client_address)
+            except Exception as e:
+                logging.error("Error sending response to %s: %s", client_address, str(e))
 
     def stop(self):
         """
-        Stops the DNS server and cleans up resources
+        Stops the DNS server, letting the workers answer the queries already queued
         """
-        if self.socket:
-            self.socket.close()
-            self.socket = None 
\ No newline at end of file
+        self.running = False
+        if self._wakeup:
+            try:
+                self._wakeup[1].send(b'\0')
+            except OSError:
+                pass  # Reader is already awake
+
+        if self._threads:
+            reader, *workers, sender = self._threads
+            self._threads = []
+            reader.join()
+            for _ in workers:
+                self._queries.put(None)
+            for worker in workers:
+                worker.join()
+            self._replies.put(None)
+            sender.join()
+
+        if self._selector:
+            self._selector.close()
+            self._selector = None
+        if self._wakeup:
+            for wakeup_socket in self._wakeup:
+                wakeup_socket.close()
+            self._wakeup = None
+        if self.server_socket:
+            self.server_socket.close()
+            self.server_socket = None
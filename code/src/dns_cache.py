@@ -1,13 +1,105 @@
+import struct
 import time
+from collections import OrderedDict
 from threading import Lock
 
+_DNS_HEADER = struct.Struct('!HHHHHH')
+# TYPE, CLASS, TTL and RDLENGTH of a resource record
+_RR_FIXED = struct.Struct('!HHIH')
+_TTL = struct.Struct('!I')
+# Offset of the TTL field within the fixed part of a resource record
+_TTL_OFFSET = 4
+# TYPE of the EDNS OPT pseudo-record, whose CLASS is the client's UDP payload size
+_OPT_TYPE = 41
+# DO (DNSSEC OK) flag within the OPT record's TTL field
+_DO_BIT = 0x8000
+# UDP payload size and DO flag, as they go into a cache key
+_EDNS_KEY = struct.Struct('!HH')
+
+
+def _skip_name(data, offset):
+    """
+    Returns the offset just past the (possibly compressed) domain name at offset
+    """
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xc0 == 0xc0:  # Pointer; the name ends here
+            return offset + 2
+        offset += 1 + length
+
+
+def _question_end(query):
+    """
+    Returns the offset just past a query's question (QNAME, QTYPE and QCLASS),
+    or None if it can't be parsed
+    """
+    try:
+        end = query.index(0, _DNS_HEADER.size) + 5
+    except ValueError:
+        return None
+    return end if end <= len(query) else None
+
+
+def _edns_key(query, question_end):
+    """
+    Returns the UDP payload size and DO flag of a query's EDNS OPT record,
+    packed for a cache key, or b'' if it has none or can't be parsed
+    """
+    try:
+        _, _, _, ancount, nscount, arcount = _DNS_HEADER.unpack_from(query)
+        offset = question_end
+        for index in range(ancount + nscount + arcount):
+            offset = _skip_name(query, offset)
+            rtype, rclass, ttl, rdlength = _RR_FIXED.unpack_from(query, offset)
+            if rtype == _OPT_TYPE and index >= ancount + nscount:
+                return _EDNS_KEY.pack(rclass, ttl & _DO_BIT)
+            offset += _RR_FIXED.size + rdlength
+    except (IndexError, struct.error):
+        pass
+    return b''
+
+
+def _response_key(query, question_end):
+    """
+    Cache key for a query: its flags, its additional record count (EDNS or not),
+    its question with the name case-folded, and its EDNS UDP payload size and
+    DO flag, which change the answer a server sends. The rest of the additional
+    section, e.g. per-client EDNS cookies, is left out.
+    """
+    return (bytes(query[2:4]) + bytes(query[10:12]) + bytes(query[12:question_end]).lower()
+            + _edns_key(query, question_end))
+
+
+def answer_ttl_offsets(response):
+    """
+    Returns the offsets of the TTL fields of a response's answer records, or
+    None if it can't be parsed
+    """
+    try:
+        _, _, qdcount, ancount, _, _ = _DNS_HEADER.unpack_from(response)
+        offset = _DNS_HEADER.size
+        for _ in range(qdcount):
+            offset = _skip_name(response, offset) + 4  # QTYPE and QCLASS
+        offsets = []
+        for _ in range(ancount):
+            offset = _skip_name(response, offset)
+            _, _, _, rdlength = _RR_FIXED.unpack_from(response, offset)
+            offsets.append(offset + _TTL_OFFSET)
+            offset += _RR_FIXED.size + rdlength
+        return offsets
+    except (IndexError, struct.error):
+        return None
+
+
 class DNSCache:
     def __init__(self, max_size=1000, ttl=300):
         """
         :param max_size: Max number of cached entries
         :param ttl: Time to live for each cache entry (in seconds)
         """
-        self.cache = {}  # question -> (response, expire_time)
+        self.cache = OrderedDict()  # question -> (response, expire_time), least recently used first
         self.max_size = max_size
         self.ttl = ttl
         self.lock = Lock()
@@ -21,17 +113,58 @@ class DNSCache:
             if not entry:
                 return None
             response, expire_time = entry
-            if time.time() > expire_time:
+            if time.monotonic() > expire_time:
                 del self.cache[question]
                 return None
+            self.cache.move_to_end(question)
             return response
 
-    def set(self, question, response):
+    def set(self, question, response, ttl=None):
         """
-        Store DNS response in cache
+        Store DNS response in cache, for ttl seconds if given and the cache's TTL otherwise
         """
+        expire_time = time.monotonic() + (self.ttl if ttl is None else ttl)
         with self.lock:
-            # Limit size
-            if len(self.cache) >= self.max_size:
-                self.cache.pop(next(iter(self.cache)))  # FIFO eviction
-            self.cache[question] = (response, time.time() + self.ttl)
+            if question in self.cache:
+                self.cache.move_to_end(question)
+            elif len(self.cache) >= self.max_size:
+                self.cache.popitem(last=False)  # Evict the least recently used
+            self.cache[question] = (response, expire_time)
+
+    def get_response(self, query):
+        """
+        Get the cached response to a DNS query, carrying the query's own ID and
+        question, and its answer TTLs reduced by the time it has been cached
+        """
+        question_end = _question_end(query)
+        if question_end is None:
+            return None
+        entry = self.get(_response_key(query, question_end))
+        if entry is None:
+            return None
+        response, ttl_offsets, stored_at = entry
+
+        # The question is echoed as asked, since clients may check its letter case
+        patched = bytearray(response)
+        patched[:2] = query[:2]
+        patched[12:question_end] = query[12:question_end]
+        age = int(time.monotonic() - stored_at)
+        if age:
+            # The entry expires with its shortest TTL, so none of them drops below zero
+            for offset in ttl_offsets:
+                _TTL.pack_into(patched, offset, _TTL.unpack_from(patched, offset)[0] - age)
+        return bytes(patched)
+
+    def set_response(self, query, response):
+        """
+        Store the response to a DNS query for every later query asking the same
+        question, for no longer than its shortest-lived answer record
+        """
+        question_end = _question_end(query)
+        if question_end is None or response[12:question_end].lower() != query[12:question_end].lower():
+            return  # Only responses that repeat the question can be replayed for it
+        ttl_offsets = answer_ttl_offsets(response) or ()
+        ttl = min((_TTL.unpack_from(response, offset)[0] for offset in ttl_offsets), default=self.ttl)
+        ttl = min(ttl, self.ttl)
+        if ttl > 0:
+            self.set(_response_key(query, question_end), (response, ttl_offsets, time.monotonic()), ttl)
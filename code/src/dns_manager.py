@@ -17,6 +17,7 @@ class DNSManager:
         self.local_port = dns_config['local_port']
         self.listen_port = dns_config['listen_port']
         self.timeout = dns_config['timeout']
+        self.primary_timeout = dns_config['primary_timeout']
         self.max_cache_size = dns_config['max_cache_size']
         self.cache_ttl = dns_config['cache_ttl']
         
@@ -49,17 +50,18 @@ class DNSManager:
                 # Add both primary and secondary DNS servers from each active provider
                 if provider.get('primary_ip'):
                     fallback_list.append((provider['primary_ip'], 53))
-                    logging.debug(f"Added primary DNS: {provider['primary_ip']} ({provider['name']})")
+                    logging.debug("Added primary DNS: %s (%s)", provider['primary_ip'], provider['name'])
                 
                 if provider.get('secondary_ip'):
                     fallback_list.append((provider['secondary_ip'], 53))
-                    logging.debug(f"Added secondary DNS: {provider['secondary_ip']} ({provider['name']})")
+                    logging.debug("Added secondary DNS: %s (%s)", provider['secondary_ip'], provider['name'])
             
-            logging.info(f"Loaded {len(fallback_list)} fallback DNS servers from {len(dns_providers)} active providers in database")
+            logging.info("Loaded %d fallback DNS servers from %d active providers in database",
+                         len(fallback_list), len(dns_providers))
             return fallback_list
             
         except Exception as e:
-            logging.error(f"Failed to load DNS list from database: {str(e)}")
+            logging.error("Failed to load DNS list from database: %s", str(e))
             return self._get_default_dns_servers()
     
     def _get_default_dns_servers(self):
@@ -69,9 +71,9 @@ class DNSManager:
         
         for server in default_dns_config['servers']:
             default_servers.append((server['ip'], server['port']))
-            logging.debug(f"Added default DNS: {server['ip']}:{server['port']} ({server['name']})")
+            logging.debug("Added default DNS: %s:%s (%s)", server['ip'], server['port'], server['name'])
         
-        logging.info(f"Using {len(default_servers)} default DNS servers as fallback from config")
+        logging.info("Using %d default DNS servers as fallback from config", len(default_servers))
         return default_servers
 
     def start(self):
@@ -95,11 +97,12 @@ class DNSManager:
             notification_manager=self.notification_manager,
             database_manager=self.database_manager,
             timeout=self.timeout,
+            primary_timeout=self.primary_timeout,
             max_cache_size=self.max_cache_size,
             cache_ttl=self.cache_ttl
         )
 
-        self.server = DNSServer(self.listen_port, resolver)
+        self.server = DNSServer(self.listen_port, resolver, cache=resolver.cache)
         
         # Log primary and fallback DNS information
         fallback_dns_info = ", ".join([f"{dns}:{port}" for dns, port in self.fallback_dns_list[:4]])  # Show first 4
@@ -133,6 +136,10 @@ class DNSManager:
 
             # Notify about service stop
             self.notification_manager.notify_service_status("Stopped")
+            # Show them before the process exits and takes the delivery thread with it
+            self.notification_manager.flush()
+
+        self.notification_manager.close()
         
         # Close database connection
         if self.database_manager:
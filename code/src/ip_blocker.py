@@ -1,16 +1,150 @@
 import ipaddress
-from typing import Tuple, Set, List, Callable
+import functools
+import socket
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Tuple, Set, List, Callable, Sequence, Optional
 from dataclasses import dataclass
 
-@dataclass
+# Reason codes returned by IPBlocker.check_ip; format_reason turns them into text
+(REASON_OK, REASON_LOOPBACK, REASON_UNSPECIFIED, REASON_PRIVATE, REASON_MULTICAST,
+ REASON_LINK_LOCAL, REASON_RESERVED, REASON_KNOWN_BLOCK, REASON_INVALID, REASON_OTHER) = range(10)
+
+REASON_TEMPLATES = {
+    REASON_OK: "Looks okay",
+    REASON_LOOPBACK: "Loopback IP ({ip})",
+    REASON_UNSPECIFIED: "Unspecified IP ({ip})",
+    REASON_PRIVATE: "Private IP range ({ip})",
+    REASON_MULTICAST: "Multicast address ({ip})",
+    REASON_LINK_LOCAL: "Link-local address ({ip})",
+    REASON_RESERVED: "Reserved IP range ({ip})",
+    REASON_KNOWN_BLOCK: "Matched known block IP list",
+    REASON_INVALID: "Invalid IP format: {ip!r} does not appear to be an IPv4 or IPv6 address",
+    REASON_OTHER: "Blocked IP ({ip})",
+}
+
+def format_reason(reason_code: int, ip: str) -> str:
+    """Describe a reason code from IPBlocker.check_ip for the given IP."""
+    return REASON_TEMPLATES[reason_code].format(ip=ip)
+
+# dataclass only generates __slots__ from Python 3.10
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class BlockRule:
     """Represents a rule for blocking IP addresses."""
     name: str
     check_func: Callable[[ipaddress.IPv4Address], bool]
     reason_template: str
+    # Fast check on the integer form of an IPv4 address; IPv6 always uses check_func
+    ipv4_check: Optional[Callable[[int], bool]] = None
+    reason_code: int = REASON_OTHER
+
+class IPv4NetworkCheck:
+    """Check whether an integer IPv4 address falls in any of a fixed set of networks."""
+
+    __slots__ = ('masks', 'ranges')
+
+    def __init__(self, cidrs: Sequence[str]):
+        networks = [ipaddress.IPv4Network(cidr) for cidr in cidrs]
+        self.masks = tuple((int(net.netmask), int(net.network_address)) for net in networks)
+        # Inclusive (first, last) address ranges, used to compile the rules into one table
+        self.ranges = tuple((int(net.network_address), int(net.broadcast_address)) for net in networks)
+
+    def __call__(self, ip_int: int) -> bool:
+        return any(ip_int & mask == prefix for mask, prefix in self.masks)
+
+def ipv4_networks_check(*cidrs: str) -> IPv4NetworkCheck:
+    """Build a check testing whether an integer IPv4 address falls in any of the given networks."""
+    return IPv4NetworkCheck(cidrs)
+
+def _ipv4_private_cidrs(*more_precise: str) -> Optional[List[str]]:
+    """
+    The IPv4 networks this Python's ipaddress treats as private, minus the
+    given networks that other rules report more precisely. The definition
+    changes between Python releases, so it is read from ipaddress itself;
+    returns None if its table isn't available.
+    """
+    constants = getattr(ipaddress, '_IPv4Constants', None)
+    networks = getattr(constants, '_private_networks', None)
+    if networks is None:
+        return None
+    excluded = list(getattr(constants, '_private_networks_exceptions', ()))
+    excluded += [ipaddress.IPv4Network(cidr) for cidr in more_precise]
+
+    remaining = list(networks)
+    for exclude in excluded:
+        kept = []
+        for net in remaining:
+            if not net.overlaps(exclude):
+                kept.append(net)
+            elif net.prefixlen < exclude.prefixlen:
+                kept.extend(net.address_exclude(exclude))
+            # else net lies within exclude and is dropped
+        remaining = kept
+    return [str(net) for net in ipaddress.collapse_addresses(remaining)]
+
+# Private ranges as ipaddress defines them, minus those that the loopback,
+# link_local and reserved rules report more precisely
+_IPV4_PRIVATE_CIDRS = _ipv4_private_cidrs("127.0.0.0/8", "169.254.0.0/16", "240.0.0.0/4")
+
+def _compile_ipv4_rules(rules: List[BlockRule]) -> Optional[Tuple[List[int], List[Optional[BlockRule]]]]:
+    """
+    Flatten network-based rules into sorted, non-overlapping address ranges,
+    each owned by the first rule (in priority order) that covers it, so one
+    bisect finds the matching rule. Returns None if any rule is not
+    network-based.
+    """
+    if not all(isinstance(rule.ipv4_check, IPv4NetworkCheck) for rule in rules):
+        return None
+
+    points = {0}
+    for rule in rules:
+        for first, last in rule.ipv4_check.ranges:
+            points.add(first)
+            points.add(last + 1)
+    points.discard(1 << 32)
+
+    starts: List[int] = []
+    owners: List[Optional[BlockRule]] = []
+    for point in sorted(points):
+        owner = next((rule for rule in rules
+                      if any(first <= point <= last for first, last in rule.ipv4_check.ranges)), None)
+        if owners and owners[-1] is owner:
+            continue
+        starts.append(point)
+        owners.append(owner)
+    return starts, owners
+
+def _packed_address(ip_str: str) -> Optional[bytes]:
+    """Return the 4- or 16-byte form of an IP address, or None if it isn't one."""
+    # inet_pton is a thin libc call; ipaddress is only needed for forms it rejects (scoped IPv6)
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            return socket.inet_pton(family, ip_str)
+        except OSError:
+            pass
+    try:
+        return ipaddress.ip_address(ip_str).packed
+    except ValueError:
+        return None
+
+# Number of recent is_blocked_ip decisions kept per blocker
+CLASSIFY_CACHE_SIZE = 4096
+
+# Strings that are not IP addresses are remembered separately, for a limited time,
+# so junk input neither re-runs the failing parse nor evicts real decisions
+NEGATIVE_CACHE_SIZE = 1024
+NEGATIVE_CACHE_TTL = 60  # seconds
 
 class IPBlocker:
     """Handles IP address blocking logic."""
+
+    __slots__ = ('known_block_ips', 'rules', '_known_block_addrs', '_ipv4_table', '_rule_checks',
+                 '_rule_ipv4_checks', '_classify_cached', '_negative_cache', '_negative_cache_lock')
     
     def __init__(self):
         self.known_block_ips: Set[str] = {
@@ -20,7 +154,13 @@ class IPBlocker:
             "192.168.1.1",
             "203.98.7.65",  # Example of ISP redirect IP
         }
+        # Binary form of every valid known IP, so lookups don't depend on how the address is written
+        self._known_block_addrs: Set[bytes] = set(filter(None, map(_packed_address, self.known_block_ips)))
         self._setup_rules()
+        # Decisions are cached per instance; the same answers are looked up repeatedly
+        self._classify_cached = functools.lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(self._classify_uncached)
+        self._negative_cache: "OrderedDict[str, float]" = OrderedDict()
+        self._negative_cache_lock = threading.Lock()
 
     def _setup_rules(self) -> None:
         """Initialize the blocking rules."""
@@ -28,42 +168,78 @@ class IPBlocker:
             BlockRule(
                 name="loopback",
                 check_func=lambda ip: ip.is_loopback,
-                reason_template="Loopback IP ({ip})"
+                reason_template=REASON_TEMPLATES[REASON_LOOPBACK],
+                reason_code=REASON_LOOPBACK,
+                ipv4_check=ipv4_networks_check("127.0.0.0/8")
             ),
             BlockRule(
                 name="unspecified",
                 check_func=lambda ip: ip.is_unspecified,
-                reason_template="Unspecified IP ({ip})"
+                reason_template=REASON_TEMPLATES[REASON_UNSPECIFIED],
+                reason_code=REASON_UNSPECIFIED,
+                ipv4_check=ipv4_networks_check("0.0.0.0/32")
             ),
             BlockRule(
                 name="private",
                 check_func=lambda ip: ip.is_private,
-                reason_template="Private IP range ({ip})"
+                reason_template=REASON_TEMPLATES[REASON_PRIVATE],
+                reason_code=REASON_PRIVATE,
+                # Without ipaddress's table, IPv4 falls back to check_func
+                ipv4_check=(ipv4_networks_check(*_IPV4_PRIVATE_CIDRS)
+                            if _IPV4_PRIVATE_CIDRS is not None else None)
             ),
             BlockRule(
                 name="multicast",
                 check_func=lambda ip: ip.is_multicast,
-                reason_template="Multicast address ({ip})"
+                reason_template=REASON_TEMPLATES[REASON_MULTICAST],
+                reason_code=REASON_MULTICAST,
+                ipv4_check=ipv4_networks_check("224.0.0.0/4")
             ),
             BlockRule(
                 name="link_local",
                 check_func=lambda ip: ip.is_link_local,
-                reason_template="Link-local address ({ip})"
+                reason_template=REASON_TEMPLATES[REASON_LINK_LOCAL],
+                reason_code=REASON_LINK_LOCAL,
+                ipv4_check=ipv4_networks_check("169.254.0.0/16")
             ),
             BlockRule(
                 name="reserved",
                 check_func=lambda ip: ip.is_reserved,
-                reason_template="Reserved IP range ({ip})"
+                reason_template=REASON_TEMPLATES[REASON_RESERVED],
+                reason_code=REASON_RESERVED,
+                ipv4_check=ipv4_networks_check("240.0.0.0/4")
             ),
         ]
+        self._compile_rules()
+
+    def _compile_rules(self) -> None:
+        """Rebuild the lookup structures derived from self.rules."""
+        self._ipv4_table = _compile_ipv4_rules(self.rules)
+        # Flat tuples of the checks for the lookup loops; self.rules stays the public view
+        self._rule_checks = tuple(rule.check_func for rule in self.rules)
+        self._rule_ipv4_checks = tuple(rule.ipv4_check for rule in self.rules)
+
+    def add_rule(self, rule: BlockRule) -> None:
+        """Add a blocking rule, checked after the existing ones."""
+        self.rules.append(rule)
+        self._compile_rules()
+        self._classify_cached.cache_clear()
 
     def add_blocked_ip(self, ip: str) -> None:
         """Add an IP to the known blocked IPs list."""
         self.known_block_ips.add(ip)
+        packed = _packed_address(ip)
+        if packed:
+            self._known_block_addrs.add(packed)
+        self._classify_cached.cache_clear()
 
     def remove_blocked_ip(self, ip: str) -> None:
         """Remove an IP from the known blocked IPs list."""
         self.known_block_ips.discard(ip)
+        packed = _packed_address(ip)
+        if packed and not any(_packed_address(known) == packed for known in self.known_block_ips):
+            self._known_block_addrs.discard(packed)
+        self._classify_cached.cache_clear()
 
     def is_blocked_ip(self, ip_str: str) -> Tuple[bool, str]:
         """
@@ -77,21 +253,95 @@ class IPBlocker:
                 - bool: True if the IP should be blocked, False otherwise
                 - str: Reason for the decision
         """
+        is_blocked, _, reason = self._classify(ip_str)
+        return is_blocked, reason
+
+    def check_ip(self, ip_str: str) -> Tuple[bool, int]:
+        """
+        Like is_blocked_ip, but report the decision as a reason code (REASON_*)
+        for callers that only need the category; see format_reason.
+        """
+        is_blocked, reason_code, _ = self._classify(ip_str)
+        return is_blocked, reason_code
+
+    def is_blocked_ips(self, ip_strs: Sequence[str]) -> List[Tuple[bool, str]]:
+        """
+        Check many IP addresses at once, e.g. every address in a DNS answer.
+        
+        Args:
+            ip_strs (Sequence[str]): The IP addresses to check in string format
+            
+        Returns:
+            List[Tuple[bool, str]]: One is_blocked_ip result per address, in order
+        """
+        classify = self._classify
+        return [(is_blocked, reason) for is_blocked, _, reason in map(classify, ip_strs)]
+
+    def _classify(self, ip_str: str) -> Tuple[bool, int, str]:
+        """Cached decision for an IP; returns (is_blocked, reason_code, reason)."""
+        seen_at = self._negative_cache.get(ip_str)
+        if seen_at is not None and time.monotonic() - seen_at < NEGATIVE_CACHE_TTL:
+            return False, REASON_INVALID, REASON_TEMPLATES[REASON_INVALID].format(ip=ip_str)
+
+        try:
+            return self._classify_cached(ip_str)
+        except ValueError:
+            # lru_cache doesn't keep exceptions, so invalid input only lands here
+            with self._negative_cache_lock:
+                self._negative_cache.pop(ip_str, None)
+                self._negative_cache[ip_str] = time.monotonic()
+                if len(self._negative_cache) > NEGATIVE_CACHE_SIZE:
+                    self._negative_cache.popitem(last=False)
+            return False, REASON_INVALID, REASON_TEMPLATES[REASON_INVALID].format(ip=ip_str)
+
+    def _classify_uncached(self, ip_str: str) -> Tuple[bool, int, str]:
+        """
+        Evaluate the blocking rules for an IP; returns (is_blocked, reason_code, reason).
+        Raises ValueError if ip_str is not an IP address.
+        """
+        # IPv4 is by far the common case and gets its own path; only IPv6 contains ':'
+        if ':' not in ip_str:
+            try:
+                packed = socket.inet_pton(socket.AF_INET, ip_str)
+            except OSError:
+                raise ValueError(f"{ip_str!r} is not an IPv4 address") from None
+            return self._classify_ipv4(ip_str, packed)
+        return self._classify_ipv6(ip_str)
+
+    def _classify_ipv4(self, ip_str: str, packed: bytes) -> Tuple[bool, int, str]:
+        """IPv4 path: integer range checks on the packed address."""
+        ip_int = int.from_bytes(packed, 'big')
+        if self._ipv4_table:
+            starts, owners = self._ipv4_table
+            rule = owners[bisect_right(starts, ip_int) - 1]
+            if rule:
+                return True, rule.reason_code, rule.reason_template.format(ip=ip_str)
+        else:
+            checks = zip(self._rule_ipv4_checks, self._rule_checks)
+            for index, (ipv4_check, check) in enumerate(checks):
+                if ipv4_check(ip_int) if ipv4_check else check(ipaddress.IPv4Address(packed)):
+                    rule = self.rules[index]
+                    return True, rule.reason_code, rule.reason_template.format(ip=ip_str)
+        return self._check_known_list(packed)
+
+    def _classify_ipv6(self, ip_str: str) -> Tuple[bool, int, str]:
+        """IPv6 path: the rules' ipaddress-based checks."""
         try:
+            ip = ipaddress.IPv6Address(socket.inet_pton(socket.AF_INET6, ip_str))
+        except OSError:
+            # inet_pton doesn't take every form ipaddress does, e.g. scoped addresses
             ip = ipaddress.ip_address(ip_str)
 
-            # Check all rules
-            for rule in self.rules:
-                if rule.check_func(ip):
-                    return True, rule.reason_template.format(ip=ip)
-                
-            # Check known blocked IPs
-            if ip_str in self.known_block_ips:
-                return True, "Matched known block IP list"
+        for index, check in enumerate(self._rule_checks):
+            if check(ip):
+                rule = self.rules[index]
+                return True, rule.reason_code, rule.reason_template.format(ip=ip)
+        return self._check_known_list(ip.packed)
 
-            return False, "Looks okay"
-        
-        except ValueError as e:
-            return False, f"Invalid IP format: {str(e)}"
+    def _check_known_list(self, packed: bytes) -> Tuple[bool, int, str]:
+        """Decision for an address no rule matched."""
+        if packed in self._known_block_addrs:
+            return True, REASON_KNOWN_BLOCK, REASON_TEMPLATES[REASON_KNOWN_BLOCK]
+        return False, REASON_OK, REASON_TEMPLATES[REASON_OK]
 
 
@@ -1,4 +1,7 @@
 import logging
+import logging.handlers
+import queue
+import time
 from dns_manager import DNSManager
 
 def main():
@@ -7,21 +10,44 @@ def main():
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
+    listener = _log_in_background()
+    try:
+        _run_forwarder()
+    finally:
+        listener.stop()  # Writes out whatever is still queued
+        logging.getLogger().handlers = list(listener.handlers)
 
+def _run_forwarder():
     # Create and start DNS forwarder
     forwarder = DNSManager()
     try:
         forwarder.start()
+        # The server answers queries on its own thread; keep the process alive while it runs
+        while forwarder.server:
+            time.sleep(1)
     except KeyboardInterrupt:
         logging.info("DNS Forwarder stopped by user")
-        forwarder.stop()  # Ensure we stop the forwarder when interrupted
     except Exception as e:
         logging.error("DNS Forwarder stopped due to error: %s", str(e))
-        forwarder.stop()  # Also stop the forwarder on any other error
     finally:
-        # Make sure we always stop the forwarder, even if an unexpected error occurs
+        # Stop the forwarder exactly once, however the run ended, so system DNS is restored
         if forwarder:
-            forwarder.stop()
+            try:
+                forwarder.stop()
+            except Exception as e:
+                logging.error("Failed to stop DNS Forwarder: %s", str(e))
+
+def _log_in_background():
+    """
+    Moves the root logger's handlers onto a listener thread, so threads answering
+    queries only queue their records instead of waiting on console output
+    """
+    root = logging.getLogger()
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    listener.start()
+    return listener
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,14 +1,29 @@
 import logging
+import queue
+import threading
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, Optional
 from os_handlers.base import OSHandler
 
+# Notifications waiting for the OS handler; more than this are dropped
+NOTIFICATION_QUEUE_SIZE = 1024
+# Most recent notifications kept in the history; older ones are discarded
+NOTIFICATION_HISTORY_SIZE = 1000
+
 class NotificationManager:
     def __init__(self, os_handler: OSHandler):
         self.logger = logging.getLogger(__name__)
-        self.notification_history: List[Dict] = []
+        self.notification_history: Deque[Dict] = deque(maxlen=NOTIFICATION_HISTORY_SIZE)
         self.os_handler = os_handler
 
+        # OS notifications can spawn a process, so a background thread shows them
+        # and callers such as the resolver never wait on it
+        self._pending: queue.Queue = queue.Queue(maxsize=NOTIFICATION_QUEUE_SIZE)
+        self._delivery_thread = threading.Thread(target=self._deliver_notifications,
+                                                 name="notifications", daemon=True)
+        self._delivery_thread.start()
+
     def notify(self, title: str, message: str, notification_type: str = "info") -> None:
         """
         Send a system notification based on the operating system.
@@ -29,8 +44,55 @@ class NotificationManager:
             "type": notification_type
         })
 
-        # Send system notification using OS handler
-        self.os_handler.notify(title, message, notification_type)
+        # Hand the system notification to the delivery thread
+        try:
+            self._pending.put_nowait((title, message, notification_type))
+        except queue.Full:
+            self.logger.warning("Notification queue full, not showing: %s", title)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait for the notifications sent so far to be passed to the OS handler.
+        
+        Args:
+            timeout: Maximum number of seconds to wait
+            
+        Returns:
+            bool: True if they were all delivered in time, False otherwise
+        """
+        delivered = threading.Event()
+        try:
+            self._pending.put(delivered, timeout=timeout)
+        except queue.Full:
+            return False
+        return delivered.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Stop the delivery thread once the notifications sent so far are shown.
+        
+        Args:
+            timeout: Maximum number of seconds to wait for the thread to finish
+        """
+        try:
+            self._pending.put(None, timeout=timeout)
+        except queue.Full:
+            return  # Stuck on the OS handler; the daemon thread goes with the process
+        self._delivery_thread.join(timeout)
+
+    def _deliver_notifications(self) -> None:
+        """Show queued notifications through the OS handler, one at a time, until close()."""
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            if isinstance(item, threading.Event):
+                item.set()  # A flush() marker; everything before it is delivered
+                continue
+            try:
+                self.os_handler.notify(*item)
+            except Exception as e:
+                self.logger.error("Failed to show notification: %s", str(e))
 
     def _log_notification(self, title: str, message: str, notification_type: str) -> None:
         """Log the notification to the appropriate log level."""
@@ -44,11 +106,11 @@ class NotificationManager:
 
     def get_notification_history(self) -> List[Dict]:
         """Get the history of all notifications."""
-        return self.notification_history
+        return list(self.notification_history)
 
     def clear_notification_history(self) -> None:
         """Clear the notification history."""
-        self.notification_history = []
+        self.notification_history.clear()
 
     def notify_dns_change(self, old_dns: str, new_dns: str) -> None:
         """Send notification when DNS server is changed."""
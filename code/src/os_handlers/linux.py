@@ -1,7 +1,11 @@
 import subprocess
 import logging
+from typing import Optional
 from .base import OSHandler
 
+# Route flag for a usable route in /proc/net/route
+_RTF_UP = 0x1
+
 class LinuxHandler(OSHandler):
     def get_local_dns(self) -> str:
         try:
@@ -17,7 +21,12 @@ class LinuxHandler(OSHandler):
 
     def get_active_interface(self) -> str:
         try:
-            # First try to get the default route interface
+            # The kernel's routing table answers without starting a process
+            interface = self._get_default_route_interface()
+            if interface:
+                return interface
+
+            # Otherwise ask ip for the route to a public address
             try:
                 route_output = subprocess.check_output(['ip', 'route', 'get', '8.8.8.8'], encoding='utf-8', errors='ignore')
                 if 'dev' in route_output:
@@ -44,6 +53,19 @@ class LinuxHandler(OSHandler):
             logging.error(f"Error getting active interface on Linux: {str(e)}")
             return None
 
+    def _get_default_route_interface(self) -> Optional[str]:
+        """Return the interface of the lowest-metric default route in /proc/net/route."""
+        try:
+            with open('/proc/net/route') as f:
+                next(f, None)  # Column headings
+                # Iface, Destination, Gateway, Flags, RefCnt, Use, Metric, Mask, ...
+                defaults = [(int(route[6]), route[0]) for route in map(str.split, f)
+                            if len(route) >= 8 and route[1] == '00000000' and route[7] == '00000000'
+                            and int(route[3], 16) & _RTF_UP]
+        except (OSError, ValueError):
+            return None
+        return min(defaults)[1] if defaults else None
+
     def set_dns(self, dns_ip: str = "127.0.0.1") -> bool:
         interface = self.get_active_interface()
         if interface is None:
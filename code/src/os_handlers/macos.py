@@ -3,6 +3,9 @@ import re
 import logging
 from .base import OSHandler
 
+# First resolver in `scutil --dns` output, matched on the raw bytes
+_SCUTIL_NAMESERVER_RE = re.compile(rb'nameserver\[0\]\s*:\s*(\d+\.\d+\.\d+\.\d+)')
+
 class MacOSHandler(OSHandler):
     def get_local_dns(self) -> str:
         try:
@@ -15,10 +18,10 @@ class MacOSHandler(OSHandler):
                         return dns
 
             # Fallback to scutil
-            output = subprocess.check_output(['scutil', '--dns'], encoding='utf-8', errors='ignore')
-            match = re.search(r'nameserver\[0\] : (\d+\.\d+\.\d+\.\d+)', output)
+            output = subprocess.check_output(['scutil', '--dns'])
+            match = _SCUTIL_NAMESERVER_RE.search(output)
             if match:
-                dns = match.group(1)
+                dns = match.group(1).decode('ascii')
                 logging.info("Found local DNS from scutil: %s", dns)
                 return dns
         except Exception as e:
@@ -50,10 +53,9 @@ class MacOSHandler(OSHandler):
                     try:
                         # Get service info to check if it matches our default interface
                         service_info = subprocess.check_output(['networksetup', '-getinfo', service], encoding='utf-8', errors='ignore')
+                        # Check that it is actually connected, from the same output
                         if default_interface in service_info:
-                            # Check if the service is actually connected
-                            status = subprocess.check_output(['networksetup', '-getinfo', service], encoding='utf-8', errors='ignore')
-                            if 'IP address' in status and 'IPv4' in status:
+                            if 'IP address' in service_info and 'IPv4' in service_info:
                                 active_services.append(service)
                     except subprocess.CalledProcessError:
                         continue
@@ -4,13 +4,28 @@ import re
 import logging
 import os
 import platform
+from typing import Optional
 from .base import OSHandler
 
+# The "DNS Servers" entry of `ipconfig /all` output, matched on the raw bytes: the
+# rest of its line plus the indented, address-only lines listing further servers.
+# The label before the colon is bounded so a miss can't scan the whole output
+_IPCONFIG_DNS_RE = re.compile(
+    rb'DNS Servers[^:\r\n]{0,64}:([^\r\n]*(?:\r?\n[ \t]+[0-9A-Fa-f:.%]+[ \t]*(?=\r?\n|$))*)')
+# An IPv4 address among those servers; adapters may list IPv6 servers first
+_IPV4_RE = re.compile(rb'\d{1,3}(?:\.\d{1,3}){3}')
+
+# Per-adapter TCP/IP settings, keyed by adapter GUID
+_TCPIP_INTERFACES_KEY = r'SYSTEM\CurrentControlSet\Services\Tcpip\Parameters\Interfaces'
+
+# The OS doesn't change while running
+_IS_WINDOWS = platform.system().lower() == 'windows'
+
 class WindowsHandler(OSHandler):
     def __init__(self):
         super().__init__()
         self.toaster = None
-        if platform.system().lower() == 'windows':
+        if _IS_WINDOWS:
             try:
                 from win10toast import ToastNotifier
                 self.toaster = ToastNotifier()
@@ -19,22 +34,64 @@ class WindowsHandler(OSHandler):
 
     def get_local_dns(self, _retry=False) -> str:
         try:
-            output = subprocess.check_output(['ipconfig', '/all'], encoding='utf-8', errors='ignore')
-            matches = re.findall(r'DNS Servers[^\d]*(\d+\.\d+\.\d+\.\d+)', output)
-            if matches:
-                dns = matches[0]
+            # The registry answers without starting a process; ipconfig is the fallback
+            dns = self._get_registry_dns() or self._get_ipconfig_dns()
+            if dns:
                 if dns == '127.0.0.1' and not _retry:
                     logging.warning("Detected DNS is 127.0.0.1. Attempting to restore DNS to DHCP.")
                     if self.restore_dns_to_dhcp():
                         import time
                         time.sleep(2)  # allow DHCP settings to apply
                         return self.get_local_dns(_retry=True)
-                logging.info("Found local DNS from ipconfig: %s", dns)
                 return dns
         except Exception as e:
             logging.error("Error detecting local DNS: %s", str(e))
         return '8.8.8.8'
 
+    def _get_registry_dns(self) -> Optional[str]:
+        """Read the first DNS server of a connected adapter from the registry."""
+        try:
+            import winreg
+        except ImportError:
+            return None  # Not on Windows
+
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, _TCPIP_INTERFACES_KEY) as interfaces:
+                for index in range(winreg.QueryInfoKey(interfaces)[0]):
+                    with winreg.OpenKey(interfaces, winreg.EnumKey(interfaces, index)) as interface:
+                        values = {}
+                        for name in ('IPAddress', 'DhcpIPAddress', 'NameServer', 'DhcpNameServer'):
+                            try:
+                                values[name] = winreg.QueryValueEx(interface, name)[0]
+                            except OSError:
+                                pass
+
+                        # Skip adapters without an address; they keep stale DHCP settings
+                        addresses = values.get('IPAddress') or [values.get('DhcpIPAddress')]
+                        if not any(address and address != '0.0.0.0' for address in addresses):
+                            continue
+
+                        # Static servers take precedence over DHCP ones, as in Windows itself
+                        servers = (values.get('NameServer') or values.get('DhcpNameServer') or '').replace(',', ' ').split()
+                        if servers:
+                            logging.info("Found local DNS in the registry: %s", servers[0])
+                            return servers[0]
+        except OSError as e:
+            logging.debug("Could not read DNS servers from the registry: %s", str(e))
+        return None
+
+    def _get_ipconfig_dns(self) -> Optional[str]:
+        """Read the first DNS server from `ipconfig /all` output."""
+        output = subprocess.check_output(['ipconfig', '/all'])
+        # One entry per adapter; some (e.g. vEthernet) list only IPv6 servers
+        for entry in _IPCONFIG_DNS_RE.finditer(output):
+            match = _IPV4_RE.search(entry.group(1))
+            if match:
+                dns = match.group(0).decode('ascii')
+                logging.info("Found local DNS from ipconfig: %s", dns)
+                return dns
+        return None
+
     def get_active_interface(self) -> str:
         try:
              # Loop through all network interfaces
@@ -103,7 +160,7 @@ class WindowsHandler(OSHandler):
                urgency: str = "normal", timeout: int = 5000) -> None:
         """Send a system notification using win10toast on Windows, or log on other platforms."""
         try:
-            if platform.system().lower() == 'windows' and self.toaster:
+            if self.toaster:  # Only created on Windows
                 # Convert timeout from milliseconds to seconds
                 timeout_sec = timeout // 1000
                 
@@ -0,0 +1,59 @@
+from collections import deque
+
+
+class FakeDGramSocket:
+    """
+    In-memory stand-in for a non-blocking UDP socket: datagrams queued with
+    deliver() are handed out by recvfrom/recvfrom_into, and everything passed
+    to sendto is kept in sent
+    """
+
+    def __init__(self):
+        self.inbound = deque()
+        self.sent = deque()
+        self.timeout = None
+        self.closed = False
+
+    def deliver(self, data, client_address):
+        """Queues a datagram as if a client had sent it."""
+        self.inbound.append((data, client_address))
+
+    def recvfrom(self, bufsize, flags=0):
+        if not self.inbound:
+            raise BlockingIOError()
+        data, client_address = self.inbound.popleft()
+        return data[:bufsize], client_address
+
+    def recvfrom_into(self, buffer, nbytes=0, flags=0):
+        if not self.inbound:
+            raise BlockingIOError()
+        data, client_address = self.inbound.popleft()
+        nbytes = min(len(data), nbytes or len(buffer))
+        buffer[:nbytes] = data[:nbytes]
+        return nbytes, client_address
+
+    def sendto(self, data, client_address):
+        self.sent.append((bytes(data), client_address))
+        return len(data)
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def setblocking(self, flag):
+        self.timeout = None if flag else 0.0
+
+    def close(self):
+        self.closed = True
+
+
+def readable_until_drained(server, sock):
+    """
+    Replacement for DNSServer._wait_readable: reports the fake socket readable
+    while datagrams are queued, then stops the server
+    """
+    def wait_readable():
+        if sock.inbound:
+            return True
+        server.running = False
+        return False
+    return wait_readable
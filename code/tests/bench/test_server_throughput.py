@@ -0,0 +1,35 @@
+import importlib.util
+from unittest.mock import Mock
+
+import pytest
+
+from dns.server import DNSServer, _QueryQueue
+from tests._fakes import FakeDGramSocket, readable_until_drained
+
+# Queries delivered per benchmark round
+QUERIES = 1000
+
+QUERY = bytes.fromhex("abcd01000001000000000000076578616d706c6503636f6d0000010001")
+
+
+@pytest.mark.benchmark(group="dns-server")
+@pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None,
+                    reason="pytest-benchmark is not installed")
+def test_run_server_throughput(benchmark):
+    """Benchmark the reader loop queueing a burst of queries from a fake socket."""
+    server = DNSServer(5353, Mock())
+    sock = server.server_socket = FakeDGramSocket()
+    server._wait_readable = readable_until_drained(server, sock)
+
+    def deliver_burst():
+        for i in range(QUERIES):
+            sock.deliver(QUERY, ("192.168.1.100", 10000 + i))
+        server._queries = _QueryQueue(QUERIES)
+        server.running = True
+
+    def read_burst():
+        server._run_server()
+        return server._queries.qsize()
+
+    benchmark.pedantic(read_burst, setup=deliver_burst, rounds=50)
+    assert server._queries.qsize() == QUERIES
@@ -0,0 +1,38 @@
+import pathlib
+import subprocess
+import sys
+
+import pytest
+from unittest.mock import Mock, patch
+
+# Add the src directory to the path once per session so test modules can import the sources
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / 'src'))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _silence_basic_config():
+    """Keep the code under test from configuring the root logger; patched once for the session."""
+    with patch('logging.basicConfig') as basic_config:
+        yield basic_config
+
+
+@pytest.fixture(scope="session")
+def main_module():
+    """The main module, imported once for the whole session."""
+    import main
+    return main
+
+
+@pytest.fixture(scope="session")
+def notification_manager_module():
+    """The notification_manager module, imported once for the whole session."""
+    import notification_manager
+    return notification_manager
+
+
+@pytest.fixture
+def mock_run(monkeypatch):
+    """subprocess.run replaced by a mock whose commands succeed with no output."""
+    run = Mock(return_value=Mock(returncode=0, stdout=""))
+    monkeypatch.setattr(subprocess, "run", run)
+    return run
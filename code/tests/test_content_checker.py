@@ -1,12 +1,7 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch
 import requests
 import openai
-import sys
-import os
-
-# Add the src directory to the path so we can import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from content_checker import ContentChecker
 
@@ -238,6 +233,7 @@ class TestContentChecker:
             ("This is a low risk domain", "low"),
             ("Medium risk detected", "medium"),
             ("High risk malware site", "high"),
+            ("Proceed with caution, this is a HIGH-RISK site", "high"),
             ("No keywords found", "unknown")
         ]
         
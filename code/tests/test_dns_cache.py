@@ -2,11 +2,6 @@ import pytest
 import time
 import threading
 from unittest.mock import patch
-import sys
-import os
-
-# Add the src directory to the path so we can import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from dns_cache import DNSCache
 
@@ -59,7 +54,7 @@ class TestDNSCache:
         assert cache.get(question) is None
 
     def test_max_size_limit(self):
-        """Test that cache respects max_size limit with FIFO eviction."""
+        """Test that cache respects max_size limit with LRU eviction."""
         cache = DNSCache(max_size=2)
         
         # Add first entry
@@ -71,7 +66,7 @@ class TestDNSCache:
         assert cache.get(b"question1") == b"response1"
         assert cache.get(b"question2") == b"response2"
         
-        # Add third entry - should evict first
+        # Add third entry - should evict question1, the least recently used
         cache.set(b"question3", b"response3")
         assert cache.get(b"question1") is None  # Evicted
         assert cache.get(b"question2") == b"response2"
@@ -135,7 +130,7 @@ class TestDNSCache:
         assert result is None
         assert len(cache.cache) == 0
 
-    @patch('time.time')
+    @patch('time.monotonic')
     def test_time_mocking(self, mock_time):
         """Test cache behavior with mocked time."""
         mock_time.return_value = 1000
@@ -173,4 +168,142 @@ class TestDNSCache:
         result = cache.get(large_question)
         
         assert result == large_response
-        assert len(result) == 5000 
\ No newline at end of file
+        assert len(result) == 5000
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted, not the oldest."""
+        cache = DNSCache(max_size=2)
+        cache.set(b"q1", b"r1")
+        cache.set(b"q2", b"r2")
+        cache.get(b"q1")
+        cache.set(b"q3", b"r3")
+
+        assert cache.get(b"q1") == b"r1"
+        assert cache.get(b"q2") is None
+        assert cache.get(b"q3") == b"r3"
+
+    def test_set_with_ttl(self):
+        """Test that a per-entry TTL overrides the cache's TTL."""
+        cache = DNSCache(ttl=300)
+        with patch('time.monotonic', return_value=1000):
+            cache.set(b"q", b"r", ttl=10)
+        with patch('time.monotonic', return_value=1011):
+            assert cache.get(b"q") is None
+
+
+def _query(qid, name=b"\x07example\x03com\x00", additional=b""):
+    arcount = b"\x00\x01" if additional else b"\x00\x00"
+    return (qid.to_bytes(2, 'big') + b"\x01\x00\x00\x01\x00\x00\x00\x00" + arcount
+            + name + b"\x00\x01\x00\x01" + additional)
+
+
+def _response(qid, ttls, name=b"\x07example\x03com\x00"):
+    answers = b"".join(
+        b"\xc0\x0c\x00\x01\x00\x01" + ttl.to_bytes(4, 'big') + b"\x00\x04\x5d\xb8\xd8\x22"
+        for ttl in ttls)
+    return (qid.to_bytes(2, 'big') + b"\x81\x80\x00\x01" + len(ttls).to_bytes(2, 'big') + b"\x00\x00\x00\x00"
+            + name + b"\x00\x01\x00\x01" + answers)
+
+
+def _edns_cookie(cookie):
+    """OPT record carrying a client cookie."""
+    return b"\x00\x00\x29\x04\xd0\x00\x00\x00\x00\x00\x0c\x00\x0a\x00\x08" + cookie
+
+
+def _edns(payload_size=1232, dnssec_ok=False):
+    """OPT record with no options."""
+    flags = b"\x80\x00" if dnssec_ok else b"\x00\x00"
+    return b"\x00\x00\x29" + payload_size.to_bytes(2, 'big') + b"\x00\x00" + flags + b"\x00\x00"
+
+
+class TestDNSCacheResponses:
+    """Test cases for caching DNS responses by question."""
+
+    def test_get_response_uses_query_id(self):
+        """Test that a cached response is returned with the new query's ID."""
+        cache = DNSCache()
+        cache.set_response(_query(0x1234), _response(0x1234, [60]))
+
+        assert cache.get_response(_query(0xabcd)) == _response(0xabcd, [60])
+
+    def test_get_response_other_question(self):
+        """Test that a response isn't served for a different question."""
+        cache = DNSCache()
+        cache.set_response(_query(1), _response(1, [60]))
+
+        assert cache.get_response(_query(1, name=b"\x07example\x03org\x00")) is None
+
+    @pytest.mark.parametrize("ttls, expected_ttl", [
+        ([60, 30, 90], 30),
+        ([3600], 300),
+        ([], 300),
+    ], ids=["min_answer_ttl", "capped_at_cache_ttl", "no_answers"])
+    def test_set_response_ttl(self, ttls, expected_ttl):
+        """Test that responses expire with their shortest-lived answer record."""
+        cache = DNSCache(ttl=300)
+        with patch('time.monotonic', return_value=1000):
+            cache.set_response(_query(1), _response(1, ttls))
+
+        with patch('time.monotonic', return_value=1000 + expected_ttl):
+            assert cache.get_response(_query(2)) is not None
+        with patch('time.monotonic', return_value=1001 + expected_ttl):
+            assert cache.get_response(_query(2)) is None
+
+    def test_set_response_zero_ttl_not_cached(self):
+        """Test that a response with a zero TTL answer isn't cached."""
+        cache = DNSCache()
+        cache.set_response(_query(1), _response(1, [0]))
+
+        assert len(cache.cache) == 0
+
+    def test_set_response_truncated(self):
+        """Test that an unparseable response is cached for the cache's TTL."""
+        cache = DNSCache()
+        response = _response(1, [60])[:-8]
+        cache.set_response(_query(1), response)
+
+        assert cache.get_response(_query(1)) == response
+
+    def test_get_response_ages_ttls(self):
+        """Test that cache hits report answer TTLs reduced by the time spent cached."""
+        cache = DNSCache()
+        with patch('time.monotonic', return_value=1000):
+            cache.set_response(_query(1), _response(1, [60, 90]))
+
+        with patch('time.monotonic', return_value=1025.5):
+            assert cache.get_response(_query(2)) == _response(2, [35, 65])
+
+    def test_get_response_ignores_name_case(self):
+        """Test that a question differing only in case is a hit, echoed as asked."""
+        cache = DNSCache()
+        cache.set_response(_query(1), _response(1, [60]))
+
+        asked = b"\x07ExAmPlE\x03COM\x00"
+        assert cache.get_response(_query(2, name=asked)) == _response(2, [60], name=asked)
+
+    def test_get_response_ignores_edns_cookie(self):
+        """Test that queries with different EDNS cookies share a cache entry."""
+        cache = DNSCache()
+        cache.set_response(_query(1, additional=_edns_cookie(b"cookie01")), _response(1, [60]))
+
+        assert cache.get_response(_query(2, additional=_edns_cookie(b"cookie02"))) == _response(2, [60])
+        assert cache.get_response(_query(2)) is None
+
+    @pytest.mark.parametrize("asked", [
+        _edns(dnssec_ok=True),
+        _edns(payload_size=4096),
+    ], ids=["dnssec_ok", "payload_size"])
+    def test_get_response_keys_on_edns_options(self, asked):
+        """Test that an answer isn't served to a query with a different DO flag or UDP payload size."""
+        cache = DNSCache()
+        cache.set_response(_query(1, additional=_edns()), _response(1, [60]))
+
+        assert cache.get_response(_query(2, additional=asked)) is None
+        assert cache.get_response(_query(2, additional=_edns())) == _response(2, [60])
+
+    def test_set_response_other_question_not_cached(self):
+        """Test that a response that doesn't repeat the query's question isn't cached."""
+        cache = DNSCache()
+        cache.set_response(_query(1), _response(1, [60], name=b"\x07example\x03org\x00"))
+
+        assert len(cache.cache) == 0
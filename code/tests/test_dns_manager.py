@@ -1,11 +1,7 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock, mock_open
-import sys
-import os
-import json
-
-# Add the src directory to the path so we can import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from unittest.mock import Mock, patch, mock_open, ANY
+from collections import deque
+from types import SimpleNamespace
 
 from dns_manager import DNSManager
 
@@ -46,21 +42,32 @@ class MockDNSServer:
         self.stopped = True
 
 
+# Notification kinds recorded by MockNotificationManager
+DNS_ERROR, DNS_CHANGE, SERVICE_STATUS = range(3)
+
+
 class MockNotificationManager:
     """Mock notification manager for testing."""
     
     def __init__(self, os_handler):
         self.os_handler = os_handler
-        self.notifications = []
+        self.notifications = deque()
+        self.closed = False
     
     def notify_dns_error(self, message):
-        self.notifications.append(("dns_error", message))
+        self.notifications.append((DNS_ERROR, message))
     
     def notify_dns_change(self, old_dns, new_dns):
-        self.notifications.append(("dns_change", old_dns, new_dns))
+        self.notifications.append((DNS_CHANGE, old_dns, new_dns))
     
     def notify_service_status(self, status, details=None):
-        self.notifications.append(("service_status", status, details))
+        self.notifications.append((SERVICE_STATUS, status, details))
+    
+    def flush(self, timeout=5.0):
+        return True
+
+    def close(self, timeout=5.0):
+        self.closed = True
 
 
 # Sample DNS list data for testing
@@ -79,271 +86,205 @@ SAMPLE_DNS_LIST = [
     }
 ]
 
+# Fallback servers expected from SAMPLE_DNS_LIST and from the config defaults
+EXPECTED_FALLBACK = (
+    ('8.8.8.8', 53), ('8.8.4.4', 53),
+    ('1.1.1.1', 53), ('1.0.0.1', 53)
+)
+
+# Fallback list the loader would build from SAMPLE_DNS_LIST
+SAMPLE_FALLBACK_DNS_LIST = list(EXPECTED_FALLBACK)
+
+
+def expected_resolver_kwargs(nm, database_manager):
+    """Keyword arguments DNSManager.start() should pass to DNSResolver."""
+    return dict(
+        primary_dns="192.168.1.1",
+        primary_port=53,
+        fallback_dns_list=list(EXPECTED_FALLBACK),
+        notification_manager=nm,
+        database_manager=database_manager,
+        timeout=5,
+        primary_timeout=0.5,
+        max_cache_size=1000,
+        cache_ttl=300
+    )
+
+
+@pytest.fixture
+def patched_env():
+    """Patch the collaborators DNSManager builds in __init__ and start()."""
+    with patch('dns_manager.OSHandlerFactory.create_handler') as factory, \
+            patch('dns_manager.NotificationManager') as nm, \
+            patch('dns_manager.DNSResolver') as resolver, \
+            patch('dns_manager.DNSServer') as server:
+        yield SimpleNamespace(factory=factory, nm=nm, resolver=resolver, server=server)
+
+
+@pytest.fixture
+def mocks(patched_env):
+    """Pre-wired mock OS handler, notification manager, resolver and server."""
+    os_h = MockOSHandler()
+    patched_env.factory.return_value = os_h
+    nm = MockNotificationManager(os_h)
+    patched_env.nm.return_value = nm
+    resolver = Mock()
+    patched_env.resolver.return_value = resolver
+    server = MockDNSServer(53, resolver)
+    patched_env.server.return_value = server
+    return SimpleNamespace(os_h=os_h, nm=nm, resolver=resolver, server=server,
+                           resolver_class=patched_env.resolver,
+                           server_class=patched_env.server)
+
+
+@pytest.fixture
+def sample_fallback():
+    """Skip the loader and hand DNSManager the sample fallback list."""
+    with patch.object(DNSManager, '_load_fallback_dns_list',
+                      return_value=SAMPLE_FALLBACK_DNS_LIST) as loader:
+        yield loader
+
 
 class TestDNSManager:
     """Test cases for DNSManager class."""
 
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_init(self, mock_file, mock_notification_manager_class, mock_factory):
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_init(self, mocks):
         """Test DNSManager initialization."""
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
         manager = DNSManager()
         
-        assert manager.os_handler == mock_os_handler
+        assert manager.os_handler == mocks.os_h
         assert manager.local_dns == "192.168.1.1"
         assert manager.local_port == 53
         assert manager.listen_port == 53
         assert manager.server is None
-        assert manager.notification_manager == mock_notification_manager
+        assert manager.notification_manager == mocks.nm
         # Check that fallback DNS list was loaded correctly 
-        expected_fallback = [
-            ('8.8.8.8', 53), ('8.8.4.4', 53),
-            ('1.1.1.1', 53), ('1.0.0.1', 53)
-        ]
-        assert manager.fallback_dns_list == expected_fallback
+        assert manager.fallback_dns_list == list(EXPECTED_FALLBACK)
 
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('builtins.open', side_effect=FileNotFoundError())
-    def test_init_with_fallback_dns_list(self, mock_file, mock_notification_manager_class, mock_factory):
+    @patch('builtins.open', side_effect=FileNotFoundError)
+    def test_init_with_fallback_dns_list(self, mock_file, mocks):
         """Test DNSManager initialization when dns_list.json file is not found."""
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
         manager = DNSManager()
         
         # Should fall back to default DNS servers
-        expected_fallback = [
-            ('8.8.8.8', 53),      # Google Primary
-            ('8.8.4.4', 53),      # Google Secondary
-            ('1.1.1.1', 53),      # Cloudflare Primary
-            ('1.0.0.1', 53),      # Cloudflare Secondary
-        ]
-        assert manager.fallback_dns_list == expected_fallback
-
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('dns_manager.DNSResolver')
-    @patch('dns_manager.DNSServer')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_start_success(self, mock_file, mock_dns_server_class, mock_dns_resolver_class, 
-                          mock_notification_manager_class, mock_factory):
+        assert manager.fallback_dns_list == list(EXPECTED_FALLBACK)
+
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_start_success(self, mocks):
         """Test successful DNS manager start."""
-        # Setup mocks
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
-        mock_resolver = Mock()
-        mock_dns_resolver_class.return_value = mock_resolver
-        
-        mock_server = MockDNSServer(53, mock_resolver)
-        mock_dns_server_class.return_value = mock_server
-        
         manager = DNSManager()
         manager.start()
         
         # Verify DNS configuration
-        assert mock_os_handler.dns_configured is True
+        assert mocks.os_h.dns_configured is True
         
         # Verify resolver creation with correct parameters
-        mock_dns_resolver_class.assert_called_once_with(
-            primary_dns="192.168.1.1",
-            primary_port=53,
-            fallback_dns_list=[
-                ('8.8.8.8', 53), ('8.8.4.4', 53),
-                ('1.1.1.1', 53), ('1.0.0.1', 53)
-            ],
-            notification_manager=mock_notification_manager
-        )
+        mocks.resolver_class.assert_called_once()
+        assert mocks.resolver_class.call_args.kwargs == expected_resolver_kwargs(
+            mocks.nm, manager.database_manager)
         
         # Verify server creation and start
-        mock_dns_server_class.assert_called_once_with(53, mock_resolver)
-        assert mock_server.started is True
-        assert manager.server == mock_server
+        mocks.server_class.assert_called_once_with(53, mocks.resolver, cache=mocks.resolver.cache)
+        assert mocks.server.started is True
+        assert manager.server == mocks.server
         
         # Verify notifications
-        assert len(mock_notification_manager.notifications) == 2
-        assert mock_notification_manager.notifications[0] == ("dns_change", "192.168.1.1", "127.0.0.1")
-        assert mock_notification_manager.notifications[1][0] == "service_status"
-        assert mock_notification_manager.notifications[1][1] == "Started"
-
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_start_dns_config_failure(self, mock_file, mock_notification_manager_class, mock_factory):
+        assert list(mocks.nm.notifications) == [
+            (DNS_CHANGE, "192.168.1.1", "127.0.0.1"),
+            (SERVICE_STATUS, "Started", ANY),
+        ]
+
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_start_dns_config_failure(self, mocks):
         """Test DNS manager start with DNS configuration failure."""
-        # Setup mocks
-        mock_os_handler = MockOSHandler()
-        mock_os_handler.configure_local_dns = Mock(return_value=False)
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
+        mocks.os_h.configure_local_dns = Mock(return_value=False)
         
         manager = DNSManager()
         manager.start()
         
         # Verify error notification
-        assert len(mock_notification_manager.notifications) == 1
-        assert mock_notification_manager.notifications[0][0] == "dns_error"
-        assert "Failed to configure system DNS settings" in mock_notification_manager.notifications[0][1]
+        assert list(mocks.nm.notifications) == [
+            (DNS_ERROR, "Failed to configure system DNS settings"),
+        ]
         
         # Verify server was not created
         assert manager.server is None
 
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('dns_manager.DNSResolver')
-    @patch('dns_manager.DNSServer')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_stop_success(self, mock_file, mock_dns_server_class, mock_dns_resolver_class,
-                         mock_notification_manager_class, mock_factory):
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_stop_success(self, mocks):
         """Test successful DNS manager stop."""
-        # Setup mocks
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
-        mock_resolver = Mock()
-        mock_dns_resolver_class.return_value = mock_resolver
-        
-        mock_server = MockDNSServer(53, mock_resolver)
-        mock_dns_server_class.return_value = mock_server
-        
         manager = DNSManager()
         manager.start()  # Start first
         
         # Clear notifications from start
-        mock_notification_manager.notifications.clear()
+        mocks.nm.notifications.clear()
         
         manager.stop()
         
         # Verify server stop
-        assert mock_server.stopped is True
+        assert mocks.server.stopped is True
         assert manager.server is None
         
         # Verify DNS restoration
-        assert mock_os_handler.dns_restored is True
+        assert mocks.os_h.dns_restored is True
         
         # Verify notifications
-        assert len(mock_notification_manager.notifications) == 2
-        assert mock_notification_manager.notifications[0] == ("dns_change", "127.0.0.1", "DHCP")
-        assert mock_notification_manager.notifications[1] == ("service_status", "Stopped", None)
-
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_stop_no_server(self, mock_file, mock_notification_manager_class, mock_factory):
+        assert list(mocks.nm.notifications) == [
+            (DNS_CHANGE, "127.0.0.1", "DHCP"),
+            (SERVICE_STATUS, "Stopped", None),
+        ]
+        # The delivery thread is shut down once they are shown
+        assert mocks.nm.closed is True
+
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_stop_no_server(self, mocks):
         """Test DNS manager stop when no server is running."""
-        # Setup mocks
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
         manager = DNSManager()
         manager.stop()  # Stop without starting
         
         # Should not crash and no notifications should be sent
-        assert len(mock_notification_manager.notifications) == 0
-
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('dns_manager.DNSResolver')
-    @patch('dns_manager.DNSServer')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_stop_dns_restore_failure(self, mock_file, mock_dns_server_class, mock_dns_resolver_class,
-                                     mock_notification_manager_class, mock_factory):
+        assert len(mocks.nm.notifications) == 0
+        # The delivery thread started with the manager is still shut down
+        assert mocks.nm.closed is True
+
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_stop_dns_restore_failure(self, mocks):
         """Test DNS manager stop with DNS restoration failure."""
-        # Setup mocks
-        mock_os_handler = MockOSHandler()
-        mock_os_handler.restore_dns_to_dhcp = Mock(return_value=False)
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
-        mock_resolver = Mock()
-        mock_dns_resolver_class.return_value = mock_resolver
-        
-        mock_server = MockDNSServer(53, mock_resolver)
-        mock_dns_server_class.return_value = mock_server
+        mocks.os_h.restore_dns_to_dhcp = Mock(return_value=False)
         
         manager = DNSManager()
         manager.start()  # Start first
         
         # Clear notifications from start
-        mock_notification_manager.notifications.clear()
+        mocks.nm.notifications.clear()
         
         manager.stop()
         
         # Verify error notification
-        assert len(mock_notification_manager.notifications) == 2
-        assert mock_notification_manager.notifications[0][0] == "dns_error"
-        assert "Failed to restore system DNS settings" in mock_notification_manager.notifications[0][1]
-        assert mock_notification_manager.notifications[1] == ("service_status", "Stopped", None)
-
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('dns_manager.DNSResolver')
-    @patch('dns_manager.DNSServer')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_start_stop_cycle(self, mock_file, mock_dns_server_class, mock_dns_resolver_class,
-                             mock_notification_manager_class, mock_factory):
+        assert list(mocks.nm.notifications) == [
+            (DNS_ERROR, "Failed to restore system DNS settings to automatic (DHCP)"),
+            (SERVICE_STATUS, "Stopped", None),
+        ]
+
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_start_stop_cycle(self, mocks):
         """Test complete start-stop cycle."""
-        # Setup mocks
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
-        mock_resolver = Mock()
-        mock_dns_resolver_class.return_value = mock_resolver
-        
-        mock_server = MockDNSServer(53, mock_resolver)
-        mock_dns_server_class.return_value = mock_server
-        
         manager = DNSManager()
         
         # Start
         manager.start()
-        assert mock_server.started is True
-        assert manager.server == mock_server
+        assert mocks.server.started is True
+        assert manager.server == mocks.server
         
         # Stop
         manager.stop()
-        assert mock_server.stopped is True
+        assert mocks.server.stopped is True
         assert manager.server is None
 
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('dns_manager.DNSResolver')
-    @patch('dns_manager.DNSServer')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_multiple_stops(self, mock_file, mock_dns_server_class, mock_dns_resolver_class,
-                           mock_notification_manager_class, mock_factory):
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_multiple_stops(self, mocks):
         """Test multiple stop calls don't cause issues."""
-        # Setup mocks
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
-        mock_resolver = Mock()
-        mock_dns_resolver_class.return_value = mock_resolver
-        
-        mock_server = MockDNSServer(53, mock_resolver)
-        mock_dns_server_class.return_value = mock_server
-        
         manager = DNSManager()
         manager.start()
         
@@ -355,16 +296,9 @@ class TestDNSManager:
         # Should not cause any issues
         assert manager.server is None
 
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_default_configuration_values(self, mock_file, mock_notification_manager_class, mock_factory):
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_default_configuration_values(self, mocks):
         """Test that default configuration values are set correctly."""
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
         manager = DNSManager()
         
         # Test default values
@@ -373,112 +307,45 @@ class TestDNSManager:
         assert isinstance(manager.fallback_dns_list, list)
         assert len(manager.fallback_dns_list) > 0
 
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('dns_manager.DNSResolver')
-    @patch('dns_manager.DNSServer')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_resolver_configuration(self, mock_file, mock_dns_server_class, mock_dns_resolver_class,
-                                   mock_notification_manager_class, mock_factory):
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_resolver_configuration(self, mocks):
         """Test that DNS resolver is configured correctly."""
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
-        mock_resolver = Mock()
-        mock_dns_resolver_class.return_value = mock_resolver
-        
-        mock_server = MockDNSServer(53, mock_resolver)
-        mock_dns_server_class.return_value = mock_server
-        
         manager = DNSManager()
         manager.start()
         
         # Verify resolver was created with correct parameters
-        mock_dns_resolver_class.assert_called_once_with(
-            primary_dns="192.168.1.1",
-            primary_port=53,
-            fallback_dns_list=[
-                ('8.8.8.8', 53), ('8.8.4.4', 53),
-                ('1.1.1.1', 53), ('1.0.0.1', 53)
-            ],
-            notification_manager=mock_notification_manager
-        )
-
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('dns_manager.DNSResolver')
-    @patch('dns_manager.DNSServer')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_server_configuration(self, mock_file, mock_dns_server_class, mock_dns_resolver_class,
-                                 mock_notification_manager_class, mock_factory):
+        mocks.resolver_class.assert_called_once()
+        assert mocks.resolver_class.call_args.kwargs == expected_resolver_kwargs(
+            mocks.nm, manager.database_manager)
+
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_server_configuration(self, mocks):
         """Test that DNS server is configured correctly."""
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
-        mock_resolver = Mock()
-        mock_dns_resolver_class.return_value = mock_resolver
-        
-        mock_server = MockDNSServer(53, mock_resolver)
-        mock_dns_server_class.return_value = mock_server
-        
         manager = DNSManager()
         manager.start()
         
         # Verify server was created with correct parameters
-        mock_dns_server_class.assert_called_once_with(53, mock_resolver)
-
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
-    @patch('dns_manager.DNSResolver')
-    @patch('dns_manager.DNSServer')
-    @patch('builtins.open', new_callable=mock_open, read_data=json.dumps(SAMPLE_DNS_LIST))
-    def test_notification_integration(self, mock_file, mock_dns_server_class, mock_dns_resolver_class,
-                                     mock_notification_manager_class, mock_factory):
+        mocks.server_class.assert_called_once_with(53, mocks.resolver, cache=mocks.resolver.cache)
+
+    @pytest.mark.usefixtures('sample_fallback')
+    def test_notification_integration(self, mocks):
         """Test integration with notification manager."""
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
-        mock_resolver = Mock()
-        mock_dns_resolver_class.return_value = mock_resolver
-        
-        mock_server = MockDNSServer(53, mock_resolver)
-        mock_dns_server_class.return_value = mock_server
-        
         manager = DNSManager()
         
         # Start and verify notifications
         manager.start()
-        start_notifications = len(mock_notification_manager.notifications)
+        start_notifications = len(mocks.nm.notifications)
         assert start_notifications >= 2  # DNS change + service status
         
         # Stop and verify additional notifications
         manager.stop()
-        stop_notifications = len(mock_notification_manager.notifications)
+        stop_notifications = len(mocks.nm.notifications)
         assert stop_notifications > start_notifications
 
-    @patch('dns_manager.OSHandlerFactory.create_handler')
-    @patch('dns_manager.NotificationManager')
     @patch('builtins.open', new_callable=mock_open, read_data='invalid json')
-    def test_load_fallback_dns_list_invalid_json(self, mock_file, mock_notification_manager_class, mock_factory):
+    def test_load_fallback_dns_list_invalid_json(self, mock_file, mocks):
         """Test fallback DNS list loading with invalid JSON."""
-        mock_os_handler = MockOSHandler()
-        mock_factory.return_value = mock_os_handler
-        mock_notification_manager = MockNotificationManager(mock_os_handler)
-        mock_notification_manager_class.return_value = mock_notification_manager
-        
         manager = DNSManager()
         
         # Should fall back to default DNS servers on JSON parse error
-        expected_fallback = [
-            ('8.8.8.8', 53),      # Google Primary
-            ('8.8.4.4', 53),      # Google Secondary
-            ('1.1.1.1', 53),      # Cloudflare Primary
-            ('1.0.0.1', 53),      # Cloudflare Secondary
-        ]
-        assert manager.fallback_dns_list == expected_fallback 
\ No newline at end of file
+        assert manager.fallback_dns_list == list(EXPECTED_FALLBACK)
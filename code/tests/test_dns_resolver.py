@@ -1,394 +1,675 @@
+import importlib.util
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch
+from concurrent.futures import ThreadPoolExecutor
+import queue
 import socket
 import struct
-import sys
-import os
+import threading
+import time
 
-# Add the src directory to the path so we can import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from dns.resolver import DNSResolver
+from dns.resolver import DNSResolver, CONTENT_CHECK_TTL
 from ip_blocker import IPBlocker
 from content_checker import ContentChecker
 from dns_cache import DNSCache
 
 
+# Precompiled DNS header (id, flags, qd/an/ns/ar counts) and query ID layouts
+_DNS_HDR = struct.Struct('!HHHHHH')
+_QID = struct.Struct('!H')
+
+# Query ID 12345 followed by an opaque body
+_STANDARD_QUERY = _QID.pack(12345) + b"rest_of_query"
+# Header for a standard response to _STANDARD_QUERY with one answer
+_STANDARD_RESPONSE_HEADER = _DNS_HDR.pack(12345, 0x8180, 1, 1, 0, 0)
+_STANDARD_RESPONSE = _STANDARD_RESPONSE_HEADER + b"response_data"
+
+# Response with an empty question name and one A record for 8.8.8.8
+_A_RECORD_RESPONSE_8888 = (
+    b'\x00\x00'  # Query ID
+    b'\x81\x80'  # Flags
+    b'\x00\x01'  # Questions
+    b'\x00\x01'  # Answers
+    b'\x00\x00'  # Authority
+    b'\x00\x00'  # Additional
+    b'\x00'      # End of question section
+    b'\x00\x01'  # Type A
+    b'\x00\x01'  # Class IN
+    b'\xc0\x0c'  # Name (compressed)
+    b'\x00\x01'  # Type A
+    b'\x00\x01'  # Class IN
+    b'\x00\x00\x00\x3c'  # TTL
+    b'\x00\x04'  # Data length
+    b'\x08\x08\x08\x08'  # IP 8.8.8.8
+)
+
+# Same response with the A record pointing at 127.0.0.1 (blocked)
+_A_RECORD_RESPONSE_LOOPBACK = _A_RECORD_RESPONSE_8888[:-4] + b'\x7f\x00\x00\x01'
+
+
 class MockNotificationManager:
-    """Mock notification manager for testing."""
-    
+    """Mock notification manager that keeps a count and the last event per kind."""
+
     def __init__(self):
-        self.notifications = []
-    
+        self.dns_count = 0
+        self.last_dns = None
+        self.content_count = 0
+        self.last_content = None
+
     def notify_dns_change(self, old_dns, new_dns):
-        self.notifications.append(("dns_change", old_dns, new_dns))
-    
+        self.dns_count += 1
+        self.last_dns = (old_dns, new_dns)
+
     def notify_domain_inappropriate_content(self, domain, reason):
-        self.notifications.append(("inappropriate_content", domain, reason))
+        self.content_count += 1
+        self.last_content = (domain, reason)
+
+
+class FakeSocket:
+    """Minimal connected UDP socket stand-in for _try_resolve tests."""
+    __slots__ = ('recv_result', 'recv_side_effect', 'connect_side_effect', 'stale_replies',
+                 'timeout', 'peer', 'sent', 'closed')
+
+    def __init__(self, recv_result=None, recv_side_effect=None, connect_side_effect=None):
+        self.recv_result = recv_result
+        self.recv_side_effect = recv_side_effect
+        self.connect_side_effect = connect_side_effect
+        # Received before recv_result, e.g. late replies to earlier queries
+        self.stale_replies = []
+        self.timeout = None
+        self.peer = None
+        self.sent = None
+        self.closed = False
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def gettimeout(self):
+        return self.timeout
+
+    def connect(self, address):
+        if self.connect_side_effect is not None:
+            raise self.connect_side_effect
+        self.peer = address
+
+    def send(self, data):
+        self.sent = data
+
+    def recv_into(self, buffer):
+        if self.recv_side_effect is not None:
+            raise self.recv_side_effect
+        data = self.stale_replies.pop(0) if self.stale_replies else self.recv_result
+        nbytes = min(len(data), len(buffer))
+        buffer[:nbytes] = data[:nbytes]
+        return nbytes
+
+    def close(self):
+        self.closed = True
+
+
+class InlineExecutor:
+    """Executor that runs submitted calls straight away, so content checks finish inside resolve()."""
+    __slots__ = ()
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def fake_socket(monkeypatch):
+    """FakeSocket handed out by every socket.socket() call during the test."""
+    fs = FakeSocket()
+    monkeypatch.setattr('socket.socket', lambda *args, **kwargs: fs)
+    return fs
+
+
+@pytest.fixture
+def notification_manager():
+    return MockNotificationManager()
+
+
+@pytest.fixture
+def resolver(notification_manager):
+    """Fresh DNSResolver per test, running content checks inline."""
+    r = DNSResolver(
+        primary_dns="8.8.8.8",
+        primary_port=53,
+        fallback_dns_list=[("1.1.1.1", 53)],
+        notification_manager=notification_manager,
+        database_manager=None
+    )
+    r._content_check_executor = InlineExecutor()
+    return r
+
+
+@pytest.fixture(scope="module")
+def parsed_a_record():
+    """
+    Run _validate_response_ips over _A_RECORD_RESPONSE_8888 once per module with
+    every IP allowed. Returns (result, IPs handed to the blocker).
+    """
+    checked_ips = []
+
+    def allow(ip_str):
+        checked_ips.append(ip_str)
+        return False, "Looks okay"
+
+    resolver = DNSResolver("8.8.8.8", 53, [], None, None)
+    # IPBlocker has __slots__, so the method is patched on the class
+    with patch.object(type(resolver.ip_blocker), 'is_blocked_ip', side_effect=allow):
+        result = resolver._validate_response_ips(_A_RECORD_RESPONSE_8888)
+    return result, checked_ips
 
 
 class TestDNSResolver:
     """Test cases for DNSResolver class."""
 
-    def test_init(self):
+    def test_init(self, resolver, notification_manager):
         """Test DNSResolver initialization."""
-        mock_notification_manager = MockNotificationManager()
-        
-        resolver = DNSResolver(
-            primary_dns="8.8.8.8",
-            primary_port=53,
-            fallback_dns="1.1.1.1", 
-            fallback_port=53,
-            notification_manager=mock_notification_manager
-        )
-        
         assert resolver.primary_dns == "8.8.8.8"
         assert resolver.primary_port == 53
-        assert resolver.fallback_dns == "1.1.1.1"
-        assert resolver.fallback_port == 53
-        assert resolver.notification_manager == mock_notification_manager
-        assert isinstance(resolver.ip_blocker, IPBlocker)
-        assert isinstance(resolver.cache, DNSCache)
-        assert isinstance(resolver.content_checker, ContentChecker)
-
-    def test_set_content_check_api_key(self):
-        """Test setting content check API key."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        with patch.object(resolver.content_checker, 'set_api_key') as mock_set_key:
-            resolver.set_content_check_api_key("test-api-key")
-            mock_set_key.assert_called_once_with("test-api-key")
-
-    def test_resolve_cache_hit(self):
-        """Test DNS resolution with cache hit."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        query_data = b"test_query"
-        cached_response = b"cached_response"
-        
-        with patch.object(resolver.cache, 'get', return_value=cached_response):
-            result = resolver.resolve(query_data)
-            
-            assert result == cached_response
-
-    def test_resolve_primary_success(self):
-        """Test DNS resolution with primary DNS success."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        query_data = b"test_query"
-        response_data = b"response_data"
-        
-        with patch.object(resolver.cache, 'get', return_value=None), \
-             patch.object(resolver, '_try_resolve', side_effect=[response_data, None]) as mock_try_resolve, \
-             patch.object(resolver.cache, 'set') as mock_cache_set:
-            
-            result = resolver.resolve(query_data)
-            
-            assert result == response_data
-            mock_try_resolve.assert_called_once_with(query_data, "8.8.8.8", 53, is_primary=True)
-            mock_cache_set.assert_called_once_with(query_data, response_data)
-
-    def test_resolve_fallback_success(self):
-        """Test DNS resolution with fallback DNS success."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        query_data = b"test_query"
-        response_data = b"response_data"
-        
-        with patch.object(resolver.cache, 'get', return_value=None), \
-             patch.object(resolver, '_try_resolve', side_effect=[None, response_data]) as mock_try_resolve, \
-             patch.object(resolver.cache, 'set') as mock_cache_set, \
-             patch.object(resolver, '_extract_domain_name', return_value=["example", "com"]), \
-             patch.object(resolver.content_checker, 'check_domain', return_value=(True, "Safe", "other")):
-            
-            result = resolver.resolve(query_data)
-            
-            assert result == response_data
-            assert mock_try_resolve.call_count == 2
-            mock_cache_set.assert_called_once_with(query_data, response_data)
+        assert resolver.fallback_dns_list == [("1.1.1.1", 53)]
+        assert resolver.notification_manager == notification_manager
+        assert type(resolver.ip_blocker) is IPBlocker
+        assert type(resolver.cache) is DNSCache
+        assert type(resolver.content_checker) is ContentChecker
 
-    def test_resolve_inappropriate_content_detected(self):
-        """Test DNS resolution with inappropriate content detection."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        query_data = b"test_query"
-        response_data = b"response_data"
-        
-        with patch.object(resolver.cache, 'get', return_value=None), \
-             patch.object(resolver, '_try_resolve', side_effect=[None, response_data]), \
-             patch.object(resolver.cache, 'set'), \
-             patch.object(resolver, '_extract_domain_name', return_value=["malicious", "com"]), \
-             patch.object(resolver.content_checker, 'check_domain', return_value=(False, "Contains malware", "malicious")):
-            
-            result = resolver.resolve(query_data)
-            
-            assert result == response_data
-            # Check that notification was sent
-            assert len(mock_notification_manager.notifications) == 1
-            notification = mock_notification_manager.notifications[0]
-            assert notification[0] == "inappropriate_content"
-            assert notification[1] == "malicious.com"
-            assert notification[2] == "Contains malware"
-
-    def test_resolve_both_dns_fail(self):
-        """Test DNS resolution when both primary and fallback fail."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        query_data = b"test_query"
-        
-        with patch.object(resolver.cache, 'get', return_value=None), \
-             patch.object(resolver, '_try_resolve', return_value=None):
-            
-            result = resolver.resolve(query_data)
-            
-            assert result is None
+    def test_content_checker_created_on_first_use(self, notification_manager):
+        """Test that a new resolver only builds its ContentChecker when it is first needed."""
+        resolver = DNSResolver("8.8.8.8", 53, [], notification_manager, None)
+        assert 'content_checker' not in vars(resolver)
+        
+        checker = resolver.content_checker
+        assert type(checker) is ContentChecker
+        assert resolver.content_checker is checker
 
-    @patch('socket.socket')
-    def test_try_resolve_success(self, mock_socket_class):
+    def test_try_resolve_success(self, fake_socket, resolver):
         """Test successful DNS resolution attempt."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        # Create mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
         # Mock response data with valid DNS response structure
-        query_data = struct.pack('!H', 12345) + b"rest_of_query"  # Query ID + data
-        response_data = struct.pack('!HHHHHH', 12345, 0x8180, 1, 1, 0, 0) + b"response_data"
-        
-        mock_socket.recvfrom.return_value = (response_data, ("8.8.8.8", 53))
+        query_data = _STANDARD_QUERY  # Query ID + data
+        response_data = _STANDARD_RESPONSE
+        fake_socket.recv_result = response_data
         
         with patch.object(resolver, '_validate_response_ips', return_value=True):
             result = resolver._try_resolve(query_data, "8.8.8.8", 53, is_primary=True)
             
             assert result == response_data
-            mock_socket.sendto.assert_called_once_with(query_data, ("8.8.8.8", 53))
-            mock_socket.close.assert_called_once()
+            # A copy, not a view of the reused receive buffer
+            assert type(result) is bytes
+            assert fake_socket.peer == ("8.8.8.8", 53)
+            assert fake_socket.sent == query_data
+            # Kept open and pooled for the next query to this server
+            assert not fake_socket.closed
+            assert resolver._upstream_sockets[("8.8.8.8", 53)].get_nowait() is fake_socket
 
-    @patch('socket.socket')
-    def test_try_resolve_timeout(self, mock_socket_class):
+    def test_try_resolve_timeout(self, fake_socket, resolver):
         """Test DNS resolution attempt with timeout."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        # Create mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        mock_socket.recvfrom.side_effect = socket.timeout("Timeout")
+        fake_socket.recv_side_effect = socket.timeout("Timeout")
         
-        query_data = struct.pack('!H', 12345) + b"rest_of_query"
+        query_data = _STANDARD_QUERY
         
         result = resolver._try_resolve(query_data, "8.8.8.8", 53, is_primary=True)
         
         assert result is None
-        mock_socket.close.assert_called_once()
+        # Not pooled, since the late reply could still arrive on it
+        assert fake_socket.closed
+        assert ("8.8.8.8", 53) not in resolver._upstream_sockets
+
+    def test_try_resolve_connection_refused(self, fake_socket, resolver):
+        """Test that an ICMP error on the connected socket counts as a failed attempt."""
+        fake_socket.recv_side_effect = ConnectionRefusedError("Connection refused")
+
+        result = resolver._try_resolve(_STANDARD_QUERY, "8.8.8.8", 53, is_primary=True)
+
+        assert result is None
+        assert fake_socket.closed
+        assert ("8.8.8.8", 53) not in resolver._upstream_sockets
+
+    def test_try_resolve_discards_mismatched_id(self, fake_socket, resolver):
+        """Test that a reply carrying another query's ID is dropped and reading goes on."""
+        stale_response = _QID.pack(54321) + _STANDARD_RESPONSE[2:]
+        fake_socket.stale_replies = [stale_response]
+        fake_socket.recv_result = _STANDARD_RESPONSE
+
+        with patch.object(resolver, '_validate_response_ips', return_value=True):
+            result = resolver._try_resolve(_STANDARD_QUERY, "8.8.8.8", 53, is_primary=True)
 
-    @patch('socket.socket')
-    def test_try_resolve_blocked_ip(self, mock_socket_class):
+        assert result == _STANDARD_RESPONSE
+        assert fake_socket.stale_replies == []
+
+    def test_resolve_falls_back_when_primary_refuses(self, monkeypatch, resolver):
+        """Test that a refusing primary DNS still lets the fallback servers answer."""
+        # The primary's socket is created first, then the fallback's
+        refusing = FakeSocket(recv_side_effect=ConnectionRefusedError("Connection refused"))
+        answering = FakeSocket(recv_result=_STANDARD_RESPONSE)
+        created = iter([refusing, answering])
+        monkeypatch.setattr('socket.socket', lambda *args, **kwargs: next(created))
+
+        with patch.object(resolver, '_validate_response_ips', return_value=True):
+            assert resolver.resolve(_STANDARD_QUERY) == _STANDARD_RESPONSE
+
+        assert refusing.peer == ("8.8.8.8", 53) and refusing.closed
+        assert answering.peer == ("1.1.1.1", 53)
+
+    def test_resolve_falls_back_when_primary_unreachable(self, monkeypatch, resolver):
+        """Test that a socket that can't connect to the primary is closed and the fallback tried."""
+        unreachable = FakeSocket(connect_side_effect=OSError("Network is unreachable"))
+        answering = FakeSocket(recv_result=_STANDARD_RESPONSE)
+        created = iter([unreachable, answering])
+        monkeypatch.setattr('socket.socket', lambda *args, **kwargs: next(created))
+
+        with patch.object(resolver, '_validate_response_ips', return_value=True):
+            assert resolver.resolve(_STANDARD_QUERY) == _STANDARD_RESPONSE
+
+        assert unreachable.closed
+        assert answering.peer == ("1.1.1.1", 53)
+
+    def test_try_resolve_reuses_socket(self, monkeypatch, resolver):
+        """Test that queries to the same server share one connected socket."""
+        created = []
+
+        def make_socket(*args, **kwargs):
+            created.append(FakeSocket(recv_result=_STANDARD_RESPONSE))
+            return created[-1]
+        monkeypatch.setattr('socket.socket', make_socket)
+
+        with patch.object(resolver, '_validate_response_ips', return_value=True):
+            for _ in range(3):
+                assert resolver._try_resolve(_STANDARD_QUERY, "8.8.8.8", 53, is_primary=True) == _STANDARD_RESPONSE
+            resolver._try_resolve(_STANDARD_QUERY, "1.1.1.1", 53, is_primary=False)
+
+        assert [s.peer for s in created] == [("8.8.8.8", 53), ("1.1.1.1", 53)]
+
+    def test_try_resolve_primary_timeout(self, monkeypatch, resolver):
+        """Test that the primary DNS gets its own, shorter timeout."""
+        created = []
+
+        def make_socket(*args, **kwargs):
+            created.append(FakeSocket(recv_side_effect=socket.timeout("Timeout")))
+            return created[-1]
+        monkeypatch.setattr('socket.socket', make_socket)
+        resolver.primary_timeout = 0.5
+
+        resolver._try_resolve(_STANDARD_QUERY, "8.8.8.8", 53, is_primary=True)
+        resolver._try_resolve(_STANDARD_QUERY, "1.1.1.1", 53, is_primary=False)
+
+        assert [s.timeout for s in created] == [0.5, 5]
+
+    def test_try_resolve_reused_socket_gets_timeout(self, monkeypatch, resolver):
+        """Test that a pooled socket takes the timeout of the attempt reusing it."""
+        created = []
+
+        def make_socket(*args, **kwargs):
+            created.append(FakeSocket(recv_result=_STANDARD_RESPONSE))
+            return created[-1]
+        monkeypatch.setattr('socket.socket', make_socket)
+        resolver.primary_timeout = 0.5
+
+        with patch.object(resolver, '_validate_response_ips', return_value=True):
+            resolver._try_resolve(_STANDARD_QUERY, "8.8.8.8", 53, is_primary=True)
+            resolver._try_resolve(_STANDARD_QUERY, "8.8.8.8", 53, is_primary=False)
+
+        assert len(created) == 1
+        assert created[0].timeout == 5
+
+    def test_try_resolve_blocked_ip(self, fake_socket, resolver):
         """Test DNS resolution attempt with blocked IP in response."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        # Create mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        query_data = struct.pack('!H', 12345) + b"rest_of_query"
-        response_data = struct.pack('!HHHHHH', 12345, 0x8180, 1, 1, 0, 0) + b"response_data"
-        
-        mock_socket.recvfrom.return_value = (response_data, ("8.8.8.8", 53))
+        query_data = _STANDARD_QUERY
+        response_data = _STANDARD_RESPONSE
+        fake_socket.recv_result = response_data
         
         with patch.object(resolver, '_validate_response_ips', return_value=False):
             result = resolver._try_resolve(query_data, "8.8.8.8", 53, is_primary=True)
             
             assert result is None
 
-    @patch('socket.socket')
-    def test_try_resolve_no_answers(self, mock_socket_class):
+    def test_try_resolve_no_answers(self, fake_socket, resolver):
         """Test DNS resolution attempt with no answers in response."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        # Create mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        query_data = struct.pack('!H', 12345) + b"rest_of_query"
-        # Response with 0 answers
-        response_data = struct.pack('!HHHHHH', 12345, 0x8180, 1, 0, 0, 0) + b"response_data"
-        
-        mock_socket.recvfrom.return_value = (response_data, ("8.8.8.8", 53))
+        query_data = _STANDARD_QUERY
+        # Standard response with the answer count patched to 0 in place
+        response_data = bytearray(_STANDARD_RESPONSE)
+        _DNS_HDR.pack_into(response_data, 0, 12345, 0x8180, 1, 0, 0, 0)
+        fake_socket.recv_result = memoryview(response_data)
         
         result = resolver._try_resolve(query_data, "8.8.8.8", 53, is_primary=True)
         
         assert result is None
 
-    def test_validate_response_ips_a_record_valid(self):
+    def test_validate_response_ips_a_record_valid(self, parsed_a_record):
         """Test IP validation with valid A record."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        # Create mock response with A record for 8.8.8.8
-        response_data = (
-            b'\x00\x00'  # Query ID
-            b'\x81\x80'  # Flags
-            b'\x00\x01'  # Questions
-            b'\x00\x01'  # Answers
-            b'\x00\x00'  # Authority
-            b'\x00\x00'  # Additional
-            b'\x00'      # End of question section
-            b'\x00\x01'  # Type A
-            b'\x00\x01'  # Class IN
-            b'\xc0\x0c'  # Name (compressed)
-            b'\x00\x01'  # Type A
-            b'\x00\x01'  # Class IN
-            b'\x00\x00\x00\x3c'  # TTL
-            b'\x00\x04'  # Data length
-            b'\x08\x08\x08\x08'  # IP 8.8.8.8
-        )
-        
-        with patch.object(resolver.ip_blocker, 'is_blocked_ip', return_value=(False, "Looks okay")):
-            result = resolver._validate_response_ips(response_data)
-            assert result is True
+        result, checked_ips = parsed_a_record
+        assert result is True
+        assert checked_ips == ["8.8.8.8"]
 
-    def test_validate_response_ips_a_record_blocked(self):
+    def test_validate_response_ips_a_record_blocked(self, resolver):
         """Test IP validation with blocked A record."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        # Create mock response with A record for 127.0.0.1 (blocked)
-        response_data = (
-            b'\x00\x00'  # Query ID
-            b'\x81\x80'  # Flags
-            b'\x00\x01'  # Questions
-            b'\x00\x01'  # Answers
-            b'\x00\x00'  # Authority
-            b'\x00\x00'  # Additional
-            b'\x00'      # End of question section
-            b'\x00\x01'  # Type A
-            b'\x00\x01'  # Class IN
-            b'\xc0\x0c'  # Name (compressed)
-            b'\x00\x01'  # Type A
-            b'\x00\x01'  # Class IN
-            b'\x00\x00\x00\x3c'  # TTL
-            b'\x00\x04'  # Data length
-            b'\x7f\x00\x00\x01'  # IP 127.0.0.1
-        )
+        response_data = _A_RECORD_RESPONSE_LOOPBACK
+        blocker = resolver.ip_blocker
         
-        with patch.object(resolver.ip_blocker, 'is_blocked_ip', return_value=(True, "Loopback IP")):
+        with patch.object(type(blocker), 'is_blocked_ip',
+                          return_value=(True, "Loopback IP")) as mock_is_blocked:
             result = resolver._validate_response_ips(response_data)
             assert result is False
+            mock_is_blocked.assert_called_once_with("127.0.0.1")
 
-    def test_validate_response_ips_exception(self):
+    @pytest.mark.benchmark(group="dns-parse")
+    @pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None,
+                        reason="pytest-benchmark is not installed")
+    def test_validate_response_ips_perf(self, benchmark, resolver, monkeypatch):
+        """Benchmark the response parser on a realistic A-record packet."""
+        # Isolate the parser from the blocking rules
+        monkeypatch.setattr(type(resolver.ip_blocker), 'is_blocked_ip', lambda self, ip: (False, "Looks okay"))
+        
+        assert benchmark(resolver._validate_response_ips, _A_RECORD_RESPONSE_8888) is True
+
+    def test_validate_response_ips_exception(self, resolver):
         """Test IP validation with exception during parsing."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
         # Invalid response data
         response_data = b"invalid_data"
         
         result = resolver._validate_response_ips(response_data)
         assert result is False
 
-    def test_get_record_type_name(self):
+    @pytest.mark.parametrize("record_type,expected_name", [
+        (1, "A"),
+        (28, "AAAA"),
+        (5, "CNAME"),
+        (6, "SOA"),
+        (15, "MX"),
+        (16, "TXT"),
+        (65, "HTTPS"),
+        (999, "Unknown(999)")
+    ])
+    def test_get_record_type_name(self, resolver, record_type, expected_name):
         """Test getting record type names."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        test_cases = [
-            (1, "A"),
-            (28, "AAAA"),
-            (5, "CNAME"),
-            (6, "SOA"),
-            (15, "MX"),
-            (16, "TXT"),
-            (65, "HTTPS"),
-            (999, "Unknown (999)")
-        ]
-        
-        for record_type, expected_name in test_cases:
-            result = resolver._get_record_type_name(record_type)
-            assert result == expected_name
+        assert resolver._get_record_type_name(record_type) == expected_name
 
-    def test_extract_domain_name_simple(self):
+    def test_extract_domain_name_simple(self, resolver):
         """Test domain name extraction from DNS data."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
         # Simple domain name: example.com
         data = b'\x07example\x03com\x00'
         
         result = resolver._extract_domain_name(data, 0)
         assert result == ["example", "com"]
 
-    def test_extract_domain_name_empty(self):
+    def test_extract_domain_name_empty(self, resolver):
         """Test domain name extraction with empty data."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
         # Empty or invalid data
         data = b'\x00'
         
         result = resolver._extract_domain_name(data, 0)
         assert result == []
 
-    def test_extract_domain_name_exception(self):
+    def test_extract_domain_name_exception(self, resolver):
         """Test domain name extraction with exception."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
         # Data that will cause an exception
         data = b''
         
         result = resolver._extract_domain_name(data, 0)
         assert result == []
 
-    def test_fallback_dns_notification(self):
+    @pytest.mark.parametrize("question, expected", [
+        (b'\x07example\x03com\x00\x00\x01\x00\x01', "example.com"),
+        (b'\x03www\x07example\x02co\x02uk\x00\x00\x01\x00\x01', "www.example.co.uk"),
+        (b'\x00\x00\x01\x00\x01', None),                 # root name
+        (b'\x07example\x03com', None),                     # no terminating zero
+        (b'\x07exa\x00', None),                            # label runs past the name
+        (b'\xc0\x0c\x00', None),                          # pointer in a question name
+        (b'\x03\xff\xfe\xfd\x00', None),                  # non-ASCII label
+    ], ids=["simple", "multi_label", "root", "unterminated", "truncated_label", "pointer", "non_ascii"])
+    def test_query_domain(self, resolver, question, expected):
+        """Test reading the queried domain straight from the question section."""
+        assert resolver._query_domain(_DNS_HDR.pack(1, 0x0100, 1, 0, 0, 0) + question) == expected
+
+    def test_resolve_coalesces_identical_queries(self, resolver):
+        """Test that an identical query arriving mid-lookup waits for the first one's answer."""
+        release = threading.Event()
+        calls = []
+
+        def slow_resolve(query_data):
+            calls.append(query_data)
+            release.wait(5)
+            return _STANDARD_RESPONSE
+
+        first_query = _QID.pack(1) + _STANDARD_QUERY[2:]
+        second_query = _QID.pack(2) + _STANDARD_QUERY[2:]
+        results = {}
+        with patch.object(resolver, '_resolve', side_effect=slow_resolve):
+            first = threading.Thread(target=lambda: results.setdefault(1, resolver.resolve(first_query)))
+            first.start()
+            while not calls:
+                time.sleep(0.001)
+            # The first lookup is held until after the second query has joined it
+            threading.Timer(0.05, release.set).start()
+            results[2] = resolver.resolve(second_query)
+            first.join(5)
+
+        assert calls == [first_query]
+        assert results[1] == _STANDARD_RESPONSE
+        # Same answer, carrying the second client's query ID
+        assert results[2] == _QID.pack(2) + _STANDARD_RESPONSE[2:]
+        assert resolver._inflight == {}
+
+    def test_resolve_coalesced_failure(self, resolver):
+        """Test that a failed lookup is not left in flight for later queries."""
+        with patch.object(resolver, '_resolve', side_effect=[RuntimeError("boom"), None]) as mock_resolve:
+            with pytest.raises(RuntimeError):
+                resolver.resolve(_STANDARD_QUERY)
+            assert resolver.resolve(_STANDARD_QUERY) is None
+        assert mock_resolve.call_count == 2
+        assert resolver._inflight == {}
+
+    def test_record_cache_hit(self, resolver):
+        """Test that a hit answered by the server's reader is logged as a cache hit."""
+        resolver.database_manager = Mock()
+        query = _DNS_HDR.pack(1, 0x0100, 1, 0, 0, 0) + b'\x07example\x03com\x00\x00\x01\x00\x01'
+
+        resolver.record_cache_hit(query)
+        resolver._query_log.join()
+
+        resolver.database_manager.dns_query.assert_called_once_with("example.com", "cache", True, False)
+
+    def test_record_cache_hit_drops_when_queue_full(self, monkeypatch, resolver):
+        """Test that cache hits beyond the queue size are counted and dropped, not queued."""
+        resolver.database_manager = Mock()
+        resolver._query_log = queue.Queue(maxsize=1)
+        # Stands in for a logging thread stuck on the database
+        monkeypatch.setattr(resolver, '_query_log_thread', Mock())
+
+        resolver.record_cache_hit(_STANDARD_QUERY)
+        resolver.record_cache_hit(_STANDARD_QUERY)
+
+        assert resolver._query_log.qsize() == 1
+        assert resolver.dropped_query_logs == 1
+
+    def test_fallback_dns_notification(self, fake_socket, resolver, notification_manager):
         """Test that fallback DNS usage triggers notification."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
-        
-        query_data = struct.pack('!H', 12345) + b"rest_of_query"
-        response_data = struct.pack('!HHHHHH', 12345, 0x8180, 1, 1, 0, 0) + b"response_data"
+        query_data = _STANDARD_QUERY
+        response_data = _STANDARD_RESPONSE
+        fake_socket.recv_result = response_data
         
-        with patch('socket.socket') as mock_socket_class:
-            mock_socket = Mock()
-            mock_socket_class.return_value = mock_socket
-            mock_socket.recvfrom.return_value = (response_data, ("1.1.1.1", 53))
+        with patch.object(resolver, '_validate_response_ips', return_value=True):
+            result = resolver._try_resolve(query_data, "1.1.1.1", 53, is_primary=False)
             
-            with patch.object(resolver, '_validate_response_ips', return_value=True):
-                result = resolver._try_resolve(query_data, "1.1.1.1", 53, is_primary=False)
-                
-                assert result == response_data
-                # Check that DNS change notification was sent
-                assert len(mock_notification_manager.notifications) == 1
-                notification = mock_notification_manager.notifications[0]
-                assert notification[0] == "dns_change"
-                assert notification[1] == "8.8.8.8"  # primary DNS
-                assert notification[2] == "1.1.1.1"  # fallback DNS
-
-    def test_integration_resolve_flow(self):
-        """Test complete resolution flow integration."""
-        mock_notification_manager = MockNotificationManager()
-        resolver = DNSResolver("8.8.8.8", 53, "1.1.1.1", 53, mock_notification_manager)
+            assert result == response_data
+            # Check that DNS change notification was sent
+            assert notification_manager.dns_count == 1
+            assert notification_manager.last_dns == ("8.8.8.8", "1.1.1.1")  # primary -> fallback
+            assert notification_manager.content_count == 0
+
+
+@patch.object(ContentChecker, 'check_domain')
+@patch.object(DNSResolver, '_query_domain', return_value=None)
+@patch.object(DNSCache, 'set_response')
+@patch.object(DNSCache, 'get_response', return_value=None)
+@patch.object(DNSResolver, '_try_resolve', return_value=None)
+class TestResolveFlow:
+    """resolve() control flow with upstream lookups, cache and content check patched out."""
+
+    def test_resolve_primary_success(self, mock_try_resolve, mock_cache_get, mock_cache_set,
+                                     mock_query_domain, mock_check, resolver):
+        """Test DNS resolution with primary DNS success."""
+        query_data = b"test_query"
+        response_data = b"response_data"
+        mock_try_resolve.side_effect = [response_data, None]
+        
+        result = resolver.resolve(query_data)
         
+        assert result == response_data
+        mock_try_resolve.assert_called_once_with(query_data, "8.8.8.8", 53, is_primary=True)
+        mock_cache_set.assert_called_once_with(query_data, response_data)
+
+    def test_resolve_inappropriate_content_detected(self, mock_try_resolve, mock_cache_get,
+                                                    mock_cache_set, mock_query_domain, mock_check,
+                                                    resolver, notification_manager):
+        """Test DNS resolution with inappropriate content detection."""
         query_data = b"test_query"
+        response_data = b"response_data"
+        mock_try_resolve.side_effect = [None, response_data]
+        mock_query_domain.return_value = "malicious.com"
+        mock_check.return_value = (False, "Contains malware", "malicious")
         
-        # Test cache miss -> primary fail -> fallback success -> content check -> cache store
-        with patch.object(resolver.cache, 'get', return_value=None), \
-             patch.object(resolver, '_try_resolve', side_effect=[None, b"response"]), \
-             patch.object(resolver.cache, 'set') as mock_cache_set, \
-             patch.object(resolver, '_extract_domain_name', return_value=["safe", "com"]), \
-             patch.object(resolver.content_checker, 'check_domain', return_value=(True, "Safe domain", "business")):
-            
-            result = resolver.resolve(query_data)
-            
-            assert result == b"response"
-            mock_cache_set.assert_called_once_with(query_data, b"response") 
\ No newline at end of file
+        result = resolver.resolve(query_data)
+        
+        assert result == response_data
+        # Check that notification was sent
+        assert notification_manager.content_count == 1
+        assert notification_manager.last_content == ("malicious.com", "Contains malware")
+        assert notification_manager.dns_count == 0
+
+    def test_resolve_parses_domain_once(self, mock_try_resolve, mock_cache_get, mock_cache_set,
+                                        mock_query_domain, mock_check, resolver):
+        """Test that the query name is parsed once and shared by the content check and query log."""
+        mock_try_resolve.side_effect = [None, b"fallback"]
+        mock_query_domain.return_value = "example.com"
+        mock_check.return_value = (True, "Safe domain", "business")
+        resolver.database_manager = Mock()
+        resolver.database_manager.get_domain_verdict.return_value = None
+        
+        assert resolver.resolve(b"test_query") == b"fallback"
+        
+        mock_query_domain.assert_called_once_with(b"test_query")
+        mock_check.assert_called_once_with("example.com")
+        # Stored as is_unethical
+        resolver.database_manager.get_or_create_domain.assert_called_once_with("example.com", "business", False)
+        resolver.database_manager.dns_query.assert_called_once_with("example.com", "1.1.1.1", False, False)
+
+    def test_resolve_uses_stored_domain_verdict(self, mock_try_resolve, mock_cache_get, mock_cache_set,
+                                                mock_query_domain, mock_check, resolver, notification_manager):
+        """Test that a verdict stored in the database by an earlier run is used without checking again."""
+        mock_try_resolve.side_effect = [None, b"fallback"]
+        mock_query_domain.return_value = "malicious.com"
+        resolver.database_manager = Mock()
+        # Read back as (category, is_unethical)
+        resolver.database_manager.get_domain_verdict.return_value = ("malicious", True)
+        
+        assert resolver.resolve(b"test_query") == b"fallback"
+        
+        mock_check.assert_not_called()
+        resolver.database_manager.get_or_create_domain.assert_not_called()
+        assert notification_manager.content_count == 1
+        assert notification_manager.last_content == ("malicious.com", "Previously categorised as malicious")
+
+    @pytest.mark.parametrize("is_appropriate", [True, False])
+    def test_domain_verdict_round_trip(self, mock_try_resolve, mock_cache_get, mock_cache_set,
+                                       mock_query_domain, mock_check, resolver, notification_manager,
+                                       is_appropriate):
+        """Test that a verdict written to the domains table reads back the same in a later run."""
+        domains = {}
+        database = Mock()
+        database.get_or_create_domain.side_effect = lambda domain, category, is_unethical: \
+            domains.setdefault(domain, (category, is_unethical))
+        database.get_domain_verdict.side_effect = domains.get
+        resolver.database_manager = database
+        mock_query_domain.return_value = "example.com"
+        mock_check.return_value = (is_appropriate, "Reason", "business")
+
+        resolver._check_content("example.com")
+
+        assert domains == {"example.com": ("business", not is_appropriate)}
+        assert resolver._database_domain_verdict("example.com") == ("business", is_appropriate)
+
+    def test_resolve_checks_domain_content_once(self, mock_try_resolve, mock_cache_get, mock_cache_set,
+                                                mock_query_domain, mock_check, resolver, notification_manager):
+        """Test that a domain resolved by fallback DNS again is not checked again."""
+        mock_try_resolve.side_effect = [None, b"fallback"] * 2
+        mock_query_domain.return_value = "malicious.com"
+        mock_check.return_value = (False, "Contains malware", "malicious")
+        
+        assert resolver.resolve(b"test_query") == b"fallback"
+        assert resolver.resolve(b"test_query") == b"fallback"
+        
+        mock_check.assert_called_once_with("malicious.com")
+        assert notification_manager.content_count == 1
+        assert notification_manager.last_content == ("malicious.com", "Contains malware")
+
+    def test_resolve_rechecks_domain_after_ttl(self, mock_try_resolve, mock_cache_get, mock_cache_set,
+                                               mock_query_domain, mock_check, resolver, monkeypatch):
+        """Test that a domain's content is checked again once its last check is older than the TTL."""
+        mock_try_resolve.side_effect = [None, b"fallback"] * 3
+        mock_query_domain.return_value = "example.com"
+        mock_check.return_value = (True, "Safe domain", "business")
+        now = [1000.0]
+        monkeypatch.setattr('dns.resolver.time.monotonic', lambda: now[0])
+        
+        resolver.resolve(b"test_query")
+        now[0] += CONTENT_CHECK_TTL - 1
+        resolver.resolve(b"test_query")
+        assert mock_check.call_count == 1
+        
+        now[0] += 1
+        resolver.resolve(b"test_query")
+        assert mock_check.call_count == 2
+
+    def test_resolve_does_not_wait_for_content_check(self, mock_try_resolve, mock_cache_get, mock_cache_set,
+                                                     mock_query_domain, mock_check, resolver, notification_manager):
+        """Test that the fallback answer is returned while the content check is still running."""
+        mock_try_resolve.side_effect = [None, b"fallback"]
+        mock_query_domain.return_value = "malicious.com"
+        release = threading.Event()
+
+        def slow_check(domain):
+            release.wait(5)
+            return False, "Contains malware", "malicious"
+        mock_check.side_effect = slow_check
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            resolver._content_check_executor = executor
+            assert resolver.resolve(b"test_query") == b"fallback"
+            assert notification_manager.content_count == 0
+            release.set()
+        
+        assert notification_manager.content_count == 1
+
+    @pytest.mark.parametrize(
+        "cached,upstream,domain,verdict,expected,tries,flagged",
+        [
+            (b"cached", None, None, None, b"cached", 0, 0),
+            (None, [b"primary", None], None, None, b"primary", 1, 0),
+            (None, [None, b"fallback"], "safe.com",
+             (True, "Safe domain", "business"), b"fallback", 2, 0),
+            (None, [None, b"fallback"], "malicious.com",
+             (False, "Contains malware", "malicious"), b"fallback", 2, 1),
+            (None, None, None, None, None, 2, 0),
+        ],
+        ids=["cache_hit", "primary", "fallback", "fallback_flagged", "all_fail"]
+    )
+    def test_resolve_scenario(self, mock_try_resolve, mock_cache_get, mock_cache_set,
+                              mock_query_domain, mock_check, resolver, notification_manager,
+                              cached, upstream, domain, verdict, expected, tries, flagged):
+        """Test resolve() across cache hit, primary, fallback and all-fail paths."""
+        query_data = b"test_query"
+        mock_cache_get.return_value = cached
+        mock_try_resolve.side_effect = upstream
+        mock_query_domain.return_value = domain
+        mock_check.return_value = verdict
+        
+        result = resolver.resolve(query_data)
+        
+        assert result == expected
+        assert mock_try_resolve.call_count == tries
+        if expected is not None and cached is None:
+            mock_cache_set.assert_called_once_with(query_data, expected)
+        else:
+            mock_cache_set.assert_not_called()
+        assert notification_manager.content_count == flagged
@@ -1,28 +1,82 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, call
 import socket
 import threading
-import time
-import sys
-import os
+import selectors
 
-# Add the src directory to the path so we can import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from dns.server import DNSServer
+from dns.server import DNSServer, RECV_BATCH_SIZE, MAX_PENDING_QUERIES, SOCKET_BUFFER_SIZE, _QueryQueue
+from tests._fakes import FakeDGramSocket, readable_until_drained
 
 
 class MockResolver:
     """Mock DNS resolver for testing."""
-    
+
     def __init__(self):
         self.resolve_calls = []
-    
+        self.cache_hits = []
+
     def resolve(self, query_data):
         self.resolve_calls.append(query_data)
         return b"mock_response_data"
 
+    def record_cache_hit(self, query_data):
+        self.cache_hits.append(query_data)
+
+
+def batches_then_stop(server, *batches):
+    """_recv_batch side effect: hand out the batches, then stop the server."""
+    pending = list(batches)
+
+    def recv_batch():
+        if pending:
+            return pending.pop(0)
+        server.running = False
+        return []
+    return recv_batch
+
+
+def datagrams(packets):
+    """recvfrom_into side effect that delivers packets until the socket is drained."""
+    pending = list(packets)
+
+    def recvfrom_into(buffer, nbytes=0, flags=0):
+        if not pending:
+            raise BlockingIOError()
+        data, client_address = pending.pop(0)
+        buffer[:len(data)] = data
+        return len(data), client_address
+    return recvfrom_into
+
+
+def run_pipeline(server):
+    """Run the reader, a worker and the sender to completion on the calling thread."""
+    server._run_server()
+    server._queries.put(None)
+    server._worker_loop()
+    server._replies.put(None)
+    server._sender_loop()
+
 
+@pytest.fixture
+def running_server():
+    """Server with a mock socket that is always readable, marked running but with no threads started."""
+    server = DNSServer(5353, MockResolver())
+    server.server_socket = Mock()
+    server.running = True
+    server._wait_readable = lambda: True
+    return server
+
+
+@pytest.fixture
+def fake_selector():
+    """Replace the reader's selector and wakeup socket pair so start() works on a mock socket."""
+    with patch('dns.server.selectors.DefaultSelector') as selector_class, \
+            patch('dns.server.socket.socketpair', return_value=(Mock(), Mock())) as socketpair:
+        selector_class.return_value.select.return_value = []
+        yield selector_class.return_value, socketpair.return_value
+
+
+@pytest.mark.usefixtures('fake_selector')
 class TestDNSServer:
     """Test cases for DNSServer class."""
 
@@ -30,7 +84,7 @@ class TestDNSServer:
         """Test DNSServer initialization."""
         mock_resolver = MockResolver()
         server = DNSServer(5353, mock_resolver)  # Use non-privileged port for testing
-        
+
         assert server.port == 5353
         assert server.resolver == mock_resolver
         assert server.running is False
@@ -39,371 +93,470 @@ class TestDNSServer:
     @patch('socket.socket')
     def test_start_success(self, mock_socket_class):
         """Test successful DNS server start."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        # Mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        # Mock threading to avoid actual thread creation
+        server = DNSServer(5353, MockResolver())
+        mock_socket = mock_socket_class.return_value
+
         with patch('threading.Thread') as mock_thread_class:
-            mock_thread = Mock()
-            mock_thread_class.return_value = mock_thread
-            
             server.start()
-            
+
             # Verify socket setup
+            mock_socket_class.assert_called_once_with(socket.AF_INET, socket.SOCK_DGRAM)
             mock_socket.bind.assert_called_once_with(('', 5353))
-            mock_socket.settimeout.assert_called_once_with(1.0)
-            
-            # Verify thread creation and start
-            mock_thread_class.assert_called_once_with(target=server._run_server)
-            mock_thread.start.assert_called_once()
-            
+            mock_socket.setblocking.assert_called_once_with(False)
+
+            # Verify the reader, worker and sender threads were created and started
+            assert mock_thread_class.call_args_list == (
+                [call(target=server._run_server)]
+                + [call(target=server._worker_loop)] * server.workers
+                + [call(target=server._sender_loop)])
+            assert mock_thread_class.return_value.start.call_count == server.workers + 2
+
             assert server.running is True
             assert server.server_socket == mock_socket
 
+    @patch('socket.socket')
+    def test_server_socket_configuration(self, mock_socket_class):
+        """Test that the server socket gets large kernel buffers and no SO_REUSEPORT by default."""
+        server = DNSServer(5353, MockResolver())
+        with patch('threading.Thread'):
+            server.start()
+
+        setsockopt = mock_socket_class.return_value.setsockopt
+        assert setsockopt.call_args_list == [
+            call(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1),
+            call(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE),
+            call(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE),
+        ]
+
+    @pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'), reason="SO_REUSEPORT not supported")
+    @patch('socket.socket')
+    def test_server_socket_reuse_port(self, mock_socket_class):
+        """Test that reuse_port enables SO_REUSEPORT."""
+        server = DNSServer(5353, MockResolver(), reuse_port=True)
+        with patch('threading.Thread'):
+            server.start()
+
+        mock_socket_class.return_value.setsockopt.assert_any_call(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+    @patch('socket.socket')
+    def test_buffer_size_errors_are_not_fatal(self, mock_socket_class):
+        """Test that the server still starts if the OS refuses the buffer sizes."""
+        def setsockopt(level, option, value):
+            if option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+                raise OSError("Operation not permitted")
+        mock_socket_class.return_value.setsockopt.side_effect = setsockopt
+
+        server = DNSServer(5353, MockResolver())
+        with patch('threading.Thread'), patch('logging.warning') as mock_log_warning:
+            server.start()
+
+        assert server.running is True
+        assert mock_log_warning.call_count == 2
+
     @patch('socket.socket')
     def test_start_bind_error(self, mock_socket_class):
         """Test DNS server start with bind error."""
-        mock_resolver = MockResolver()
-        server = DNSServer(53, mock_resolver)  # Privileged port likely to fail
-        
-        # Mock socket that fails to bind
-        mock_socket = Mock()
-        mock_socket.bind.side_effect = OSError("Permission denied")
-        mock_socket_class.return_value = mock_socket
-        
+        server = DNSServer(53, MockResolver())
+        mock_socket_class.return_value.bind.side_effect = OSError("Permission denied")
+
         with patch('logging.error') as mock_log_error:
-            server.start()
-            
-            # Verify error was logged
+            with pytest.raises(OSError, match="Permission denied"):
+                server.start()
+
             mock_log_error.assert_called()
+            mock_socket_class.return_value.close.assert_called_once()
             assert server.running is False
             assert server.server_socket is None
 
+    def test_multiple_start_calls(self):
+        """Test that multiple start calls only start one set of server threads."""
+        server = DNSServer(5353, MockResolver(), workers=2)
+
+        with patch('socket.socket'), patch('threading.Thread') as mock_thread_class:
+            server.start()
+            server.start()
+            server.start()
+
+            # One reader, two workers and one sender
+            assert mock_thread_class.call_count == 4
+            assert mock_thread_class.return_value.start.call_count == 4
+
+    def test_restart_repopulates_thread_pool(self):
+        """Test that a stopped server starts a fresh, fixed-size set of threads."""
+        server = DNSServer(5353, MockResolver())
+
+        with patch('socket.socket'), patch('threading.Thread') as mock_thread_class:
+            server.start()
+            server.stop()
+            server.start()
+
+            assert server.running is True
+            assert mock_thread_class.call_count == 2 * (server.workers + 2)
+            assert len(server._threads) == server.workers + 2
+
+    @patch('socket.socket')
+    def test_server_threads_are_named(self, mock_socket_class):
+        """Test that the reader, workers and sender are named for debugging."""
+        server = DNSServer(5353, MockResolver(), workers=2)
+        server.start()
+        try:
+            assert [thread.name for thread in server._threads] == [
+                "dns-reader", "dns-worker-0", "dns-worker-1", "dns-sender"]
+            assert all(thread.daemon for thread in server._threads)
+        finally:
+            server.stop()
+
     def test_stop_when_not_running(self):
         """Test stopping server when it's not running."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
+        server = DNSServer(5353, MockResolver())
+
         # Should not raise any errors
         server.stop()
         assert server.running is False
 
     @patch('socket.socket')
-    def test_stop_when_running(self, mock_socket_class):
+    def test_stop_when_running(self, mock_socket_class, fake_selector):
         """Test stopping server when it's running."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        # Mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        # Start server first
-        with patch('threading.Thread'):
+        server = DNSServer(5353, MockResolver())
+        with patch('threading.Thread') as mock_thread_class:
             server.start()
-        
-        # Stop server
+
         server.stop()
-        
+
         assert server.running is False
-        mock_socket.close.assert_called_once()
+        assert server.server_socket is None
+        mock_socket_class.return_value.close.assert_called_once()
+        # The reader is woken up rather than left to time out
+        wakeup_read, wakeup_write = fake_selector[1]
+        wakeup_write.send.assert_called_once()
+        wakeup_read.close.assert_called_once()
+        fake_selector[0].close.assert_called_once()
+        # Every server thread is joined, and each worker and the sender got a stop sentinel
+        assert mock_thread_class.return_value.join.call_count == server.workers + 2
+        assert list(server._queries.low) == [None] * server.workers
+        assert list(server._replies.queue) == [None]
 
     @patch('socket.socket')
-    def test_run_server_receive_and_respond(self, mock_socket_class):
+    def test_multiple_stop_calls(self, mock_socket_class):
+        """Test that multiple stop calls only close the socket once."""
+        server = DNSServer(5353, MockResolver())
+        with patch('threading.Thread'):
+            server.start()
+
+        server.stop()
+        server.stop()
+        server.stop()
+
+        assert mock_socket_class.return_value.close.call_count == 1
+
+    def test_recv_batch_drains_queued_packets(self):
+        """Test that one wakeup drains every packet already queued on the socket."""
+        server = DNSServer(5353, MockResolver())
+        server.server_socket = Mock()
+        queued = [(b"query%d" % i, ("192.168.1.100", 12345 + i)) for i in range(3)]
+        server.server_socket.recvfrom_into.side_effect = datagrams(queued)
+
+        assert server._recv_batch() == queued
+        # The drain stops at the first read that would block
+        assert server.server_socket.recvfrom_into.call_count == 4
+        assert server._recv_batch() == []
+
+    def test_recv_batch_raises_errors_on_first_read(self):
+        """Test that a socket error with nothing received reaches the loop."""
+        server = DNSServer(5353, MockResolver())
+        server.server_socket = Mock()
+        server.server_socket.recvfrom_into.side_effect = OSError("Network error")
+
+        with pytest.raises(OSError):
+            server._recv_batch()
+
+    def test_recv_batch_reuses_receive_buffer(self):
+        """Test that packets are read into the preallocated buffer and copied out."""
+        server = DNSServer(5353, MockResolver())
+        server.server_socket = Mock()
+        server.server_socket.recvfrom_into.side_effect = datagrams(
+            [(b"a_longer_query", ("192.168.1.100", 12345)), (b"short", ("192.168.1.101", 12346))])
+
+        batch = server._recv_batch()
+
+        assert batch == [(b"a_longer_query", ("192.168.1.100", 12345)), (b"short", ("192.168.1.101", 12346))]
+        assert all(type(data) is bytes for data, _ in batch)
+        assert all(call.args[0] is server._recv_buffer
+                   for call in server.server_socket.recvfrom_into.call_args_list)
+
+    def test_recv_batch_respects_max_batch(self):
+        """Test that draining stops once the batch is full."""
+        server = DNSServer(5353, MockResolver())
+        server.server_socket = Mock()
+        server.server_socket.recvfrom_into.side_effect = datagrams(
+            [(b"query", ("192.168.1.100", 12345))] * (RECV_BATCH_SIZE + 4))
+
+        assert len(server._recv_batch()) == RECV_BATCH_SIZE
+        assert len(server._recv_batch(max_batch=4)) == 4
+
+    def test_run_server_receive_and_respond(self):
         """Test server receiving and responding to DNS queries."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        # Mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        # Mock receiving data
-        query_data = b"mock_query_data"
-        client_address = ("192.168.1.100", 12345)
-        mock_socket.recvfrom.side_effect = [
-            (query_data, client_address),
-            socket.timeout()  # Second call times out to exit loop
-        ]
-        
-        # Set up server state
-        server.server_socket = mock_socket
+        server = DNSServer(5353, MockResolver())
+        sock = server.server_socket = FakeDGramSocket()
+        server._wait_readable = readable_until_drained(server, sock)
         server.running = True
-        
-        # Run server (will exit after timeout)
-        server._run_server()
-        
-        # Verify query was processed
-        assert len(mock_resolver.resolve_calls) == 1
-        assert mock_resolver.resolve_calls[0] == query_data
-        
-        # Verify response was sent
-        mock_socket.sendto.assert_called_once_with(b"mock_response_data", client_address)
+        client_address = ("192.168.1.100", 12345)
+        sock.deliver(b"mock_query_data", client_address)
 
-    @patch('socket.socket')
-    def test_run_server_resolver_returns_none(self, mock_socket_class):
+        run_pipeline(server)
+
+        assert server.resolver.resolve_calls == [b"mock_query_data"]
+        assert list(sock.sent) == [(b"mock_response_data", client_address)]
+        assert server.running is False
+
+    def test_run_server_resolver_returns_none(self, running_server):
         """Test server behavior when resolver returns None."""
-        mock_resolver = Mock()
-        mock_resolver.resolve.return_value = None
-        server = DNSServer(5353, mock_resolver)
-        
-        # Mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        # Mock receiving data
-        query_data = b"mock_query_data"
-        client_address = ("192.168.1.100", 12345)
-        mock_socket.recvfrom.side_effect = [
-            (query_data, client_address),
-            socket.timeout()  # Second call times out to exit loop
-        ]
-        
-        # Set up server state
-        server.server_socket = mock_socket
-        server.running = True
-        
-        # Run server (will exit after timeout)
-        server._run_server()
-        
-        # Verify query was processed but no response sent
-        mock_resolver.resolve.assert_called_once_with(query_data)
-        mock_socket.sendto.assert_not_called()
+        running_server.resolver = Mock()
+        running_server.resolver.resolve.return_value = None
+        with patch.object(running_server, '_recv_batch', side_effect=batches_then_stop(
+                running_server, [(b"mock_query_data", ("192.168.1.100", 12345))])):
+            run_pipeline(running_server)
 
-    @patch('socket.socket')
-    def test_run_server_socket_error(self, mock_socket_class):
-        """Test server behavior with socket errors."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        # Mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        # Mock socket error
-        mock_socket.recvfrom.side_effect = socket.error("Network error")
-        
-        # Set up server state
-        server.server_socket = mock_socket
-        server.running = True
-        
-        with patch('logging.error') as mock_log_error:
-            server._run_server()
-            
-            # Verify error was logged
-            mock_log_error.assert_called()
+        running_server.resolver.resolve.assert_called_once_with(b"mock_query_data")
+        running_server.server_socket.sendto.assert_not_called()
 
-    @patch('socket.socket')
-    def test_run_server_general_exception(self, mock_socket_class):
-        """Test server behavior with general exceptions."""
-        mock_resolver = Mock()
-        mock_resolver.resolve.side_effect = Exception("Resolver error")
-        server = DNSServer(5353, mock_resolver)
-        
-        # Mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        # Mock receiving data
-        query_data = b"mock_query_data"
+    def test_run_server_socket_error(self, running_server):
+        """Test that socket errors are logged and the loop keeps serving."""
         client_address = ("192.168.1.100", 12345)
-        mock_socket.recvfrom.side_effect = [
-            (query_data, client_address),
-            socket.timeout()  # Second call times out to exit loop
-        ]
-        
-        # Set up server state
-        server.server_socket = mock_socket
-        server.running = True
-        
-        with patch('logging.error') as mock_log_error:
-            server._run_server()
-            
-            # Verify error was logged
-            mock_log_error.assert_called()
+        recv_batch = batches_then_stop(running_server, [(b"query", client_address)])
+        errors = [socket.error("Network error")]
 
-    @patch('socket.socket')
-    def test_run_server_stops_when_running_false(self, mock_socket_class):
-        """Test that server loop exits when running is set to False."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        # Mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        # Mock timeout to simulate no incoming data
-        mock_socket.recvfrom.side_effect = socket.timeout()
-        
-        # Set up server state
-        server.server_socket = mock_socket
-        server.running = True
-        
-        # Stop server after a short delay
-        def stop_server():
-            time.sleep(0.1)
-            server.running = False
-        
-        stop_thread = threading.Thread(target=stop_server)
-        stop_thread.start()
-        
-        # Run server (should exit when running becomes False)
-        server._run_server()
-        
-        stop_thread.join()
-        assert server.running is False
+        def flaky_recv_batch():
+            if errors:
+                raise errors.pop()
+            return recv_batch()
 
-    def test_multiple_start_calls(self):
-        """Test that multiple start calls don't cause issues."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        with patch('socket.socket') as mock_socket_class, \
-             patch('threading.Thread') as mock_thread_class:
-            
-            mock_socket = Mock()
-            mock_socket_class.return_value = mock_socket
-            mock_thread = Mock()
-            mock_thread_class.return_value = mock_thread
-            
-            # Start server multiple times
-            server.start()
-            server.start()
-            server.start()
-            
-            # Should only create one thread
-            assert mock_thread_class.call_count == 1
-            assert mock_thread.start.call_count == 1
+        with patch.object(running_server, '_recv_batch', side_effect=flaky_recv_batch), \
+                patch('logging.error') as mock_log_error:
+            run_pipeline(running_server)
 
-    def test_multiple_stop_calls(self):
-        """Test that multiple stop calls don't cause issues."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        with patch('socket.socket') as mock_socket_class:
-            mock_socket = Mock()
-            mock_socket_class.return_value = mock_socket
-            
-            with patch('threading.Thread'):
-                server.start()
-            
-            # Stop server multiple times
-            server.stop()
-            server.stop()
-            server.stop()
-            
-            # Should only close socket once
-            assert mock_socket.close.call_count == 1
+            mock_log_error.assert_called_once()
+        running_server.server_socket.sendto.assert_called_once_with(b"mock_response_data", client_address)
 
-    @patch('socket.socket')
-    def test_server_handles_concurrent_requests(self, mock_socket_class):
-        """Test server handling multiple concurrent requests."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        # Mock socket
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        # Mock multiple incoming requests
+    def test_run_server_general_exception(self, running_server):
+        """Test server behavior when the resolver raises."""
+        running_server.resolver = Mock()
+        running_server.resolver.resolve.side_effect = Exception("Resolver error")
+        with patch.object(running_server, '_recv_batch', side_effect=batches_then_stop(
+                running_server, [(b"mock_query_data", ("192.168.1.100", 12345))])), \
+                patch('logging.error') as mock_log_error:
+            run_pipeline(running_server)
+
+            mock_log_error.assert_called()
+        running_server.server_socket.sendto.assert_not_called()
+
+    def test_run_server_stops_when_running_false(self, running_server):
+        """Test that the loop exits quietly once the server is stopped."""
+        with patch.object(running_server, '_recv_batch', side_effect=batches_then_stop(running_server)), \
+                patch('logging.error') as mock_log_error:
+            run_pipeline(running_server)
+
+            mock_log_error.assert_not_called()
+        assert running_server.running is False
+
+    def test_server_handles_batched_requests(self, running_server):
+        """Test that every query in a received batch is answered."""
         requests = [
             (b"query1", ("192.168.1.100", 12345)),
             (b"query2", ("192.168.1.101", 12346)),
             (b"query3", ("192.168.1.102", 12347)),
         ]
-        
-        mock_socket.recvfrom.side_effect = requests + [socket.timeout()]
-        
-        # Set up server state
-        server.server_socket = mock_socket
+        with patch.object(running_server, '_recv_batch', side_effect=batches_then_stop(
+                running_server, requests[:2], requests[2:])):
+            run_pipeline(running_server)
+
+        assert running_server.resolver.resolve_calls == [b"query1", b"query2", b"query3"]
+        assert running_server.server_socket.sendto.call_count == 3
+
+    def test_run_server_drops_queries_when_queue_full(self, running_server):
+        """Test that the reader drops queries instead of blocking when workers fall behind."""
+        requests = [(b"query%d" % i, ("192.168.1.100", 12345)) for i in range(MAX_PENDING_QUERIES + 3)]
+        with patch.object(running_server, '_recv_batch', side_effect=batches_then_stop(
+                running_server, requests)):
+            running_server._run_server()
+
+        assert running_server._queries.qsize() == MAX_PENDING_QUERIES
+        assert running_server.dropped_queries == 3
+
+    def test_run_server_answers_cache_hits_directly(self, running_server):
+        """Test that cached queries bypass the workers and only misses are queued."""
+        running_server.cache = Mock()
+        running_server.cache.get_response.side_effect = lambda data: b"cached_response" if data == b"hit" else None
+        requests = [(b"hit", ("192.168.1.100", 12345)), (b"miss", ("192.168.1.101", 12346))]
+        with patch.object(running_server, '_recv_batch', side_effect=batches_then_stop(
+                running_server, requests)):
+            running_server._run_server()
+
+        assert list(running_server._replies.queue) == [(b"cached_response", ("192.168.1.100", 12345))]
+        assert list(running_server._queries.high) == [(b"miss", ("192.168.1.101", 12346))]
+        assert running_server.resolver.resolve_calls == []
+        # Hits answered here still show up in the query stats
+        assert running_server.resolver.cache_hits == [b"hit"]
+
+    def test_slow_clients_do_not_hold_up_fast_queries(self, running_server):
+        """Test that a client with slow lookups is served after everyone else."""
+        slow_client, fast_client = ("192.168.1.100", 12345), ("192.168.1.101", 12346)
+        with patch('dns.server.time.monotonic', side_effect=[0.0, 1.0]):
+            running_server._queries.put((b"slow_query", slow_client))
+            running_server._queries.put(None)
+            running_server._worker_loop()
+        assert slow_client[0] in running_server._slow_clients
+
+        running_server.resolver.resolve_calls.clear()
+        running_server._replies.queue.clear()
+        with patch.object(running_server, '_recv_batch', side_effect=batches_then_stop(
+                running_server, [(b"slow_query", slow_client), (b"fast_query", fast_client)])):
+            run_pipeline(running_server)
+
+        # The fast client's query is resolved first, and the slow one still gets answered
+        assert running_server.resolver.resolve_calls == [b"fast_query", b"slow_query"]
+        assert running_server.server_socket.sendto.call_count == 2
+
+    def test_fast_query_clears_slow_client(self, running_server):
+        """Test that a client is no longer deprioritized once its lookups are fast again."""
+        running_server._record_query_time("192.168.1.100", 1.0)
+        running_server._record_query_time("192.168.1.100", 0.001)
+
+        assert "192.168.1.100" not in running_server._slow_clients
+
+    def test_query_queue_put_batch_prefers_high_priority_when_full(self):
+        """Test that a batch fills the queue with high-priority queries first."""
+        queries = _QueryQueue(maxsize=3)
+
+        dropped = queries.put_batch([b"high1", b"high2"], [b"low1", b"low2"])
+
+        assert dropped == 1
+        assert list(queries.high) == [b"high1", b"high2"]
+        assert list(queries.low) == [b"low1"]
+        assert [queries.get() for _ in range(3)] == [b"high1", b"high2", b"low1"]
+
+    def test_sender_loop_flushes_ready_replies_together(self, running_server):
+        """Test that answers already queued are sent as one batch."""
+        replies = [(b"response%d" % i, ("192.168.1.100", 12345 + i)) for i in range(3)]
+        for reply in replies:
+            running_server._replies.put(reply)
+        running_server._replies.put(None)
+
+        with patch.object(running_server, '_send_batch') as mock_send_batch:
+            running_server._sender_loop()
+
+        mock_send_batch.assert_called_once_with(replies)
+
+    def test_server_handles_concurrent_requests(self):
+        """Test that queries are answered end to end by the server threads."""
+        server = DNSServer(5353, MockResolver())
+        sock = server.server_socket = FakeDGramSocket()
+        server._wait_readable = readable_until_drained(server, sock)
+        requests = [(b"query%d" % i, ("192.168.1.100", 12345 + i)) for i in range(10)]
+        for data, client_address in requests:
+            sock.deliver(data, client_address)
+
+        # Same threads start() creates, minus the real socket and selector
         server.running = True
-        
-        # Run server
-        server._run_server()
-        
-        # Verify all queries were processed
-        assert len(mock_resolver.resolve_calls) == 3
-        assert mock_resolver.resolve_calls == [b"query1", b"query2", b"query3"]
-        
-        # Verify all responses were sent
-        assert mock_socket.sendto.call_count == 3
-
-    def test_server_port_validation(self):
-        """Test server with different port values."""
-        mock_resolver = MockResolver()
-        
-        # Test valid ports
-        valid_ports = [53, 5353, 8053, 65535]
-        for port in valid_ports:
-            server = DNSServer(port, mock_resolver)
-            assert server.port == port
-        
-        # Test edge cases
-        server = DNSServer(1, mock_resolver)
-        assert server.port == 1
-        
-        server = DNSServer(65535, mock_resolver)
-        assert server.port == 65535
+        server._threads = ([threading.Thread(target=server._run_server)]
+                           + [threading.Thread(target=server._worker_loop) for _ in range(server.workers)]
+                           + [threading.Thread(target=server._sender_loop)])
+        for thread in server._threads:
+            thread.start()
+        server._threads[0].join(timeout=5)
+        server.stop()
 
-    @patch('socket.socket')
-    def test_server_socket_configuration(self, mock_socket_class):
-        """Test that server socket is configured correctly."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        with patch('threading.Thread'):
-            server.start()
-        
-        # Verify socket type and configuration
-        mock_socket_class.assert_called_once_with(socket.AF_INET, socket.SOCK_DGRAM)
-        mock_socket.bind.assert_called_once_with(('', 5353))
-        mock_socket.settimeout.assert_called_once_with(1.0)
+        assert sorted(server.resolver.resolve_calls) == sorted(data for data, _ in requests)
+        assert sorted(sock.sent) == sorted((b"mock_response_data", addr) for _, addr in requests)
+        assert sock.closed is True
+
+    def test_send_batch_skips_empty_responses(self, running_server):
+        """Test that queries without a response are not answered."""
+        replies = [
+            (b"response1", ("192.168.1.100", 12345)),
+            (None, ("192.168.1.101", 12346)),
+            (b"response3", ("192.168.1.102", 12347)),
+        ]
+        running_server._send_batch(replies)
+
+        assert [call.args for call in running_server.server_socket.sendto.call_args_list] == [
+            replies[0], replies[2]]
+
+    def test_send_batch_continues_after_send_error(self, running_server):
+        """Test that one failed send does not drop the rest of the batch."""
+        running_server.server_socket.sendto.side_effect = [OSError("Network unreachable"), 9]
+        with patch('logging.error') as mock_log_error:
+            running_server._send_batch([(b"response1", ("192.168.1.100", 12345)),
+                                        (b"response2", ("192.168.1.101", 12346))])
+
+            mock_log_error.assert_called_once()
+        assert running_server.server_socket.sendto.call_count == 2
+
+    @pytest.mark.parametrize('port', [1, 53, 5353, 8053, 65535])
+    def test_server_port_validation(self, port):
+        """Test server with different port values."""
+        assert DNSServer(port, MockResolver()).port == port
 
     @patch('socket.socket')
     def test_server_logging(self, mock_socket_class):
         """Test that server logs important events."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        mock_socket = Mock()
-        mock_socket_class.return_value = mock_socket
-        
-        with patch('logging.info') as mock_log_info, \
-             patch('threading.Thread'):
-            
+        server = DNSServer(5353, MockResolver())
+
+        with patch('logging.info') as mock_log_info, patch('threading.Thread'):
             server.start()
-            
-            # Verify start was logged
+
             mock_log_info.assert_called()
 
     def test_server_thread_safety(self):
-        """Test that server operations are thread-safe."""
-        mock_resolver = MockResolver()
-        server = DNSServer(5353, mock_resolver)
-        
-        # Test that start/stop can be called from different threads
+        """Test that start/stop can be called from different threads."""
+        server = DNSServer(5353, MockResolver())
+
         def start_server():
             with patch('socket.socket'), patch('threading.Thread'):
                 server.start()
-        
-        def stop_server():
-            server.stop()
-        
+
         start_thread = threading.Thread(target=start_server)
-        stop_thread = threading.Thread(target=stop_server)
-        
         start_thread.start()
         start_thread.join()
-        
+
+        stop_thread = threading.Thread(target=server.stop)
         stop_thread.start()
         stop_thread.join()
-        
-        # Should not raise any exceptions
-        assert True 
\ No newline at end of file
+
+        assert server.running is False
+        assert server.server_socket is None
+
+    def test_wait_readable(self, fake_selector):
+        """Test that the reader only reads when the server socket is ready."""
+        selector, _ = fake_selector
+        server = DNSServer(5353, MockResolver())
+        server.server_socket = Mock()
+        server._selector = selector
+
+        selector.select.return_value = [(Mock(fileobj=server.server_socket), selectors.EVENT_READ)]
+        assert server._wait_readable() is True
+
+        selector.select.return_value = [(Mock(fileobj=Mock()), selectors.EVENT_READ)]
+        assert server._wait_readable() is False
+
+
+class TestDNSServerLoopback:
+    """DNSServer over real loopback sockets."""
+
+    def test_answers_query_and_stops_promptly(self):
+        """Test a round trip through the server and that stop() doesn't wait for a timeout."""
+        server = DNSServer(0, MockResolver(), workers=1)
+        server.start()
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            client.settimeout(5)
+            client.sendto(b"query", ("127.0.0.1", server.server_socket.getsockname()[1]))
+            assert client.recvfrom(512)[0] == b"mock_response_data"
+        finally:
+            client.close()
+            stop_thread = threading.Thread(target=server.stop)
+            stop_thread.start()
+            stop_thread.join(timeout=0.5)
+
+        assert not stop_thread.is_alive()
+        assert server.server_socket is None
@@ -1,12 +1,16 @@
+import importlib.util
 import pytest
 import ipaddress
-import sys
-import os
+import random
+import socket
+from unittest.mock import patch
 
-# Add the src directory to the path so we can import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from ip_blocker import IPBlocker, BlockRule
+from ip_blocker import (
+    IPBlocker, BlockRule, ipv4_networks_check, format_reason,
+    NEGATIVE_CACHE_SIZE, NEGATIVE_CACHE_TTL,
+    REASON_OK, REASON_LOOPBACK, REASON_UNSPECIFIED, REASON_PRIVATE, REASON_MULTICAST,
+    REASON_LINK_LOCAL, REASON_RESERVED, REASON_KNOWN_BLOCK, REASON_INVALID, REASON_OTHER
+)
 
 
 class TestBlockRule:
@@ -267,4 +271,208 @@ class TestIPBlocker:
         
         is_blocked, reason = blocker.is_blocked_ip(custom_ip)
         assert is_blocked is False
-        assert reason == "Looks okay" 
\ No newline at end of file
+        assert reason == "Looks okay" 
+
+    def test_lru_reuse(self):
+        """Test that repeated lookups of the same IP reuse the cached decision."""
+        blocker = IPBlocker()
+
+        with patch('ip_blocker.socket.inet_pton', wraps=socket.inet_pton) as mock_inet_pton:
+            first = blocker.is_blocked_ip("8.8.8.8")
+            second = blocker.is_blocked_ip("8.8.8.8")
+
+        assert first == second == (False, "Looks okay")
+        mock_inet_pton.assert_called_once_with(socket.AF_INET, "8.8.8.8")
+
+    def test_block_rule_is_frozen(self):
+        """Test that BlockRule instances can't be changed or given new attributes."""
+        rule = BlockRule(name="test_rule", check_func=lambda ip: True, reason_template="Test reason: {ip}")
+
+        with pytest.raises((AttributeError, TypeError)):
+            rule.extra = True
+        with pytest.raises(AttributeError):
+            rule.name = "renamed"
+
+    def test_negative_cache_reuse(self):
+        """Test that invalid input is parsed once and remembered for the TTL."""
+        blocker = IPBlocker()
+        invalid = (False, "Invalid IP format: 'not.an.ip' does not appear to be an IPv4 or IPv6 address")
+
+        with patch('ip_blocker.socket.inet_pton', wraps=socket.inet_pton) as mock_inet_pton, \
+                patch('ip_blocker.time.monotonic', return_value=1000.0) as mock_monotonic:
+            assert blocker.is_blocked_ip("not.an.ip") == invalid
+            assert blocker.is_blocked_ip("not.an.ip") == invalid
+            assert mock_inet_pton.call_count == 1
+            assert "not.an.ip" in blocker._negative_cache
+            assert blocker._classify_cached.cache_info().currsize == 0
+
+            # Parsed again once the entry has expired
+            mock_monotonic.return_value = 1000.0 + NEGATIVE_CACHE_TTL
+            assert blocker.is_blocked_ip("not.an.ip") == invalid
+            assert mock_inet_pton.call_count == 2
+
+    def test_negative_cache_is_bounded(self):
+        """Test that the oldest invalid entries are evicted once the cache is full."""
+        blocker = IPBlocker()
+
+        for i in range(NEGATIVE_CACHE_SIZE + 1):
+            blocker.is_blocked_ip(f"bad-{i}")
+
+        assert len(blocker._negative_cache) == NEGATIVE_CACHE_SIZE
+        assert "bad-0" not in blocker._negative_cache
+        assert f"bad-{NEGATIVE_CACHE_SIZE}" in blocker._negative_cache
+
+    def test_blocked_ip_changes_invalidate_cache(self):
+        """Test that adding or removing a known IP is reflected in cached decisions."""
+        blocker = IPBlocker()
+        assert blocker.is_blocked_ip("1.2.3.4") == (False, "Looks okay")
+
+        blocker.add_blocked_ip("1.2.3.4")
+        assert blocker.is_blocked_ip("1.2.3.4") == (True, "Matched known block IP list")
+
+        blocker.remove_blocked_ip("1.2.3.4")
+        assert blocker.is_blocked_ip("1.2.3.4") == (False, "Looks okay")
+
+    def test_bulk_classification(self):
+        """Test that bulk classification matches checking each IP on its own."""
+        blocker = IPBlocker()
+        ips = ["8.8.8.8", "127.0.0.1", "10.0.0.1", "224.0.0.1", "203.98.7.65",
+               "not.an.ip", "::1", "8.8.8.8"]
+
+        assert blocker.is_blocked_ips(ips) == [IPBlocker().is_blocked_ip(ip) for ip in ips]
+        assert blocker.is_blocked_ips([]) == []
+
+    @pytest.mark.parametrize('ip', [
+        "0.1.2.3", "10.255.0.1", "100.64.0.1", "127.255.255.255", "169.254.0.1", "172.15.255.255",
+        "172.16.0.0", "192.0.0.7", "192.0.0.8", "192.0.0.9", "192.0.0.100", "192.0.0.171", "192.0.2.200", "198.18.5.5",
+        "198.20.0.1", "198.51.100.7", "203.0.113.9", "223.255.255.255", "239.1.2.3", "240.0.0.0",
+        "255.255.255.255", "8.8.4.4",
+    ])
+    def test_ipv4_checks_match_ipaddress(self, ip):
+        """Test that the integer IPv4 checks block exactly what the ipaddress properties block."""
+        address = ipaddress.ip_address(ip)
+        expected = any(rule.check_func(address) for rule in IPBlocker().rules)
+
+        assert IPBlocker().is_blocked_ip(ip)[0] is expected
+
+    def test_ipv4_networks_check(self):
+        """Test integer network checks with one and several networks."""
+        single = ipv4_networks_check("10.0.0.0/8")
+        multiple = ipv4_networks_check("10.0.0.0/8", "192.168.0.0/16")
+
+        assert single(int(ipaddress.IPv4Address("10.1.2.3"))) is True
+        assert single(int(ipaddress.IPv4Address("11.0.0.0"))) is False
+        assert multiple(int(ipaddress.IPv4Address("192.168.5.5"))) is True
+        assert multiple(int(ipaddress.IPv4Address("192.169.0.0"))) is False
+
+    def test_known_ip_matches_any_spelling(self):
+        """Test that known IPs match however the address is written."""
+        blocker = IPBlocker()
+        blocker.add_blocked_ip("2606:4700:4700:0:0:0:0:1111")
+
+        is_blocked, reason = blocker.is_blocked_ip("2606:4700:4700::1111")
+        assert is_blocked is True
+        assert reason == "Matched known block IP list"
+
+        blocker.remove_blocked_ip("2606:4700:4700:0:0:0:0:1111")
+        assert blocker.is_blocked_ip("2606:4700:4700::1111") == (False, "Looks okay")
+
+    def test_known_list_ignores_non_ip_entries(self):
+        """Test that entries which aren't IP addresses never match."""
+        blocker = IPBlocker()
+        blocker.add_blocked_ip("not.an.ip")
+
+        assert "not.an.ip" in blocker.known_block_ips
+        is_blocked, reason = blocker.is_blocked_ip("not.an.ip")
+        assert is_blocked is False
+        assert "Invalid IP format" in reason
+
+    @pytest.mark.parametrize('ip, expected', [
+        ("127.0.0.1", (True, REASON_LOOPBACK)),
+        ("0.0.0.0", (True, REASON_UNSPECIFIED)),
+        ("10.0.0.1", (True, REASON_PRIVATE)),
+        ("224.0.0.1", (True, REASON_MULTICAST)),
+        ("169.254.1.1", (True, REASON_LINK_LOCAL)),
+        ("240.0.0.1", (True, REASON_RESERVED)),
+        ("203.98.7.65", (True, REASON_KNOWN_BLOCK)),
+        ("8.8.8.8", (False, REASON_OK)),
+        ("not.an.ip", (False, REASON_INVALID)),
+        ("::1", (True, REASON_LOOPBACK)),
+    ])
+    def test_check_ip_reason_codes(self, ip, expected):
+        """Test that check_ip reports the matching reason code."""
+        assert IPBlocker().check_ip(ip) == expected
+
+    def test_format_reason_matches_is_blocked_ip(self):
+        """Test that formatting a reason code gives the is_blocked_ip reason."""
+        blocker = IPBlocker()
+
+        for ip in ["127.0.0.1", "10.0.0.1", "169.254.1.1", "203.98.7.65", "8.8.8.8"]:
+            _, reason_code = blocker.check_ip(ip)
+            assert format_reason(reason_code, ip) == blocker.is_blocked_ip(ip)[1]
+        assert format_reason(REASON_INVALID, "not.an.ip") == blocker.is_blocked_ip("not.an.ip")[1]
+
+    def test_custom_rule_default_reason_code(self):
+        """Test that rules without a reason code report REASON_OTHER."""
+        rule = BlockRule(name="test_rule", check_func=lambda ip: True, reason_template="Test reason: {ip}")
+
+        assert rule.reason_code == REASON_OTHER
+
+    def test_plain_addresses_skip_ipaddress_parser(self):
+        """Test that IPv4 and IPv6 addresses are parsed with inet_pton, not ipaddress."""
+        blocker = IPBlocker()
+
+        with patch('ip_blocker.ipaddress.ip_address') as mock_ip_address:
+            assert blocker.is_blocked_ip("8.8.8.8") == (False, "Looks okay")
+            assert blocker.is_blocked_ip("::1")[0] is True
+
+        mock_ip_address.assert_not_called()
+
+    def test_scoped_ipv6_falls_back_to_ipaddress(self):
+        """Test that addresses inet_pton rejects, like scoped IPv6, are still classified."""
+        is_blocked, reason = IPBlocker().is_blocked_ip("fe80::1%eth0")
+
+        assert is_blocked is True
+        assert "Invalid IP format" not in reason
+
+    def test_compiled_ipv4_table_matches_rule_loop(self):
+        """Test that the compiled range table picks the same first-matching rule as the rule loop."""
+        compiled = IPBlocker()
+        looped = IPBlocker()
+        looped._ipv4_table = None
+
+        boundaries = []
+        for rule in compiled.rules:
+            for first, last in rule.ipv4_check.ranges:
+                boundaries += [first - 1, first, last, last + 1]
+        rng = random.Random(1234)
+        addresses = [n for n in boundaries if 0 <= n < 1 << 32]
+        addresses += [rng.getrandbits(32) for _ in range(2000)]
+
+        for ip in map(str, map(ipaddress.IPv4Address, addresses)):
+            assert compiled.check_ip(ip) == looped.check_ip(ip), ip
+
+    def test_custom_rule_disables_compiled_table(self):
+        """Test that rules without network checks fall back to the rule loop."""
+        blocker = IPBlocker()
+        assert blocker.is_blocked_ip("8.8.8.8") == (False, "Looks okay")
+
+        blocker.add_rule(BlockRule(
+            name="custom",
+            check_func=lambda ip: ip in ipaddress.ip_network("8.8.8.0/24"),
+            reason_template="Custom ({ip})"
+        ))
+
+        assert blocker._ipv4_table is None
+        assert len(blocker._rule_checks) == len(blocker.rules) == 7
+        assert blocker.is_blocked_ip("8.8.8.8") == (True, "Custom (8.8.8.8)")
+        assert blocker.is_blocked_ip("::1") == (True, "Loopback IP (::1)")
+
+    @pytest.mark.benchmark(group="ip-blocker")
+    @pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None,
+                        reason="pytest-benchmark is not installed")
+    def test_classify_ipv4_perf(self, benchmark):
+        """Benchmark the uncached IPv4 path on a public address."""
+        blocker = IPBlocker()
+
+        assert benchmark(blocker._classify_uncached, "93.184.216.34") == (False, REASON_OK, "Looks okay")
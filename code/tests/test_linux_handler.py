@@ -0,0 +1,58 @@
+import pytest
+from unittest.mock import Mock, mock_open, patch
+
+# The handler module imports platform-specific packages; skip rather than fail without them
+LinuxHandler = pytest.importorskip("os_handlers.linux").LinuxHandler
+
+
+@pytest.fixture(scope="module")
+def linux_handler():
+    """One LinuxHandler shared by the module's tests; they patch what they change."""
+    return LinuxHandler()
+
+
+class TestLinuxHandler:
+    """Test cases for LinuxHandler."""
+
+    def test_init(self, linux_handler):
+        """Test LinuxHandler initialization."""
+        assert hasattr(linux_handler, 'logger')
+
+    def test_get_local_dns_success(self, linux_handler, mock_run):
+        """Test getting local DNS on Linux."""
+        # Mock successful systemd-resolve command
+        mock_run.return_value = Mock(returncode=0, stdout="DNS Servers: 192.168.1.1")
+
+        result = linux_handler.get_local_dns()
+        assert result == "192.168.1.1"
+
+    def test_set_dns_success(self, linux_handler, mock_run):
+        """Test setting DNS on Linux."""
+        with patch.object(linux_handler, 'get_active_interface', return_value="eth0"):
+            result = linux_handler.set_dns("127.0.0.1")
+            assert result is True
+
+    def test_notify_success(self, linux_handler, mock_run):
+        """Test notification on Linux."""
+        linux_handler.notify("Test Title", "Test Message")
+        mock_run.assert_called_once()
+
+    def test_get_active_interface_from_route_table(self, linux_handler, mock_run):
+        """Test that the lowest-metric default route is used without running ip."""
+        route_table = (
+            "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+            "wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0\n"
+            "eth0\t00000000\t0100000A\t0003\t0\t0\t100\t00000000\t0\t0\t0\n"
+            "eth0\t0000000A\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0\n"
+        )
+        with patch('builtins.open', mock_open(read_data=route_table)):
+            assert linux_handler.get_active_interface() == "eth0"
+        mock_run.assert_not_called()
+
+    def test_get_active_interface_falls_back_to_ip(self, linux_handler):
+        """Test that ip is asked when the route table has no default route."""
+        with patch('builtins.open', mock_open(read_data="Iface\tDestination\n")), \
+                patch('subprocess.check_output', side_effect=[
+                    "8.8.8.8 via 10.0.0.1 dev eth1 src 10.0.0.2",
+                    "2: eth1: <UP> state UP\n    inet 10.0.0.2/24"]):
+            assert linux_handler.get_active_interface() == "eth1"
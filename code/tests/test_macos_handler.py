@@ -0,0 +1,71 @@
+import pytest
+from unittest.mock import Mock, mock_open, patch
+
+# The handler module imports platform-specific packages; skip rather than fail without them
+MacOSHandler = pytest.importorskip("os_handlers.macos").MacOSHandler
+
+
+@pytest.fixture(scope="module")
+def macos_handler():
+    """One MacOSHandler shared by the module's tests; they patch what they change."""
+    return MacOSHandler()
+
+
+class TestMacOSHandler:
+    """Test cases for MacOSHandler."""
+
+    def test_init(self, macos_handler):
+        """Test MacOSHandler initialization."""
+        assert hasattr(macos_handler, 'logger')
+
+    def test_get_local_dns_success(self, macos_handler, mock_run):
+        """Test getting local DNS on macOS."""
+        # Mock successful networksetup command
+        mock_run.return_value = Mock(returncode=0, stdout="192.168.1.1")
+
+        result = macos_handler.get_local_dns()
+        assert result == "192.168.1.1"
+
+    def test_get_local_dns_nameserver_without_address(self, macos_handler):
+        """Test that a resolv.conf "nameserver" line with no address falls back to the default."""
+        with patch('builtins.open', mock_open(read_data="nameserver\n")):
+            assert macos_handler.get_local_dns() == "8.8.8.8"
+
+    def test_get_local_dns_undecodable_resolv_conf(self, macos_handler):
+        """Test that an unreadable resolv.conf falls back to the default."""
+        error = UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte')
+        with patch('builtins.open', side_effect=error):
+            assert macos_handler.get_local_dns() == "8.8.8.8"
+
+    def test_set_dns_success(self, macos_handler, mock_run):
+        """Test setting DNS on macOS."""
+        with patch.object(macos_handler, 'get_active_interface', return_value="en0"):
+            result = macos_handler.set_dns("127.0.0.1")
+            assert result is True
+
+    def test_restore_dns_to_dhcp_success(self, macos_handler, mock_run):
+        """Test restoring DNS to DHCP on macOS."""
+        with patch.object(macos_handler, 'get_active_interface', return_value="en0"):
+            result = macos_handler.restore_dns_to_dhcp()
+            assert result is True
+
+    def test_notify_success(self, macos_handler, mock_run):
+        """Test notification on macOS."""
+        macos_handler.notify("Test Title", "Test Message")
+        mock_run.assert_called_once()
+
+    def test_get_active_interface_success(self, macos_handler, mock_run):
+        """Test getting active interface on macOS."""
+        # Mock successful route command
+        mock_run.return_value = Mock(returncode=0, stdout="default via 192.168.1.1 dev en0")
+
+        result = macos_handler.get_active_interface()
+        assert result == "en0"
+
+    def test_get_active_interface_failure(self, macos_handler, mock_run):
+        """Test getting active interface failure on macOS."""
+        # Mock failed route command
+        mock_run.return_value = Mock(returncode=1, stdout="")
+
+        result = macos_handler.get_active_interface()
+        assert result == "en0"  # Should return default
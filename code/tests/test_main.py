@@ -1,292 +1,189 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-import sys
-import os
-
-# Add the src directory to the path so we can import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-import main
+from unittest.mock import Mock, call
+from types import SimpleNamespace
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional, Tuple
 
 
 class MockDNSManager:
     """Mock DNS manager for testing."""
+
+    __slots__ = ('started', 'stopped', 'start_calls', 'stop_calls', 'server', 'start_error', 'stop_error')
     
     def __init__(self):
         self.started = False
         self.stopped = False
         self.start_calls = 0
         self.stop_calls = 0
+        self.server = None
+        # Exceptions start() / stop() raise after counting the call
+        self.start_error = None
+        self.stop_error = None
     
     def start(self):
-        self.started = True
         self.start_calls += 1
+        if self.start_error is not None:
+            raise self.start_error
+        self.started = True
     
     def stop(self):
-        self.stopped = True
         self.stop_calls += 1
+        if self.stop_error is not None:
+            raise self.stop_error
+        self.stopped = True
+
+
+@pytest.fixture
+def logging_config(_silence_basic_config):
+    """The session-wide logging.basicConfig mock, with this test's calls only."""
+    _silence_basic_config.reset_mock()
+    return _silence_basic_config
+
+
+@pytest.fixture
+def patched_main(monkeypatch, main_module, logging_config):
+    """Replace DNSManager and the logging calls made by main() with plain attribute assignments."""
+    env = SimpleNamespace(dns_manager_class=Mock(), logging_config=logging_config,
+                          log_info=Mock(), log_error=Mock())
+    monkeypatch.setattr(main_module, 'DNSManager', env.dns_manager_class)
+    monkeypatch.setattr(main_module.logging, 'info', env.log_info)
+    monkeypatch.setattr(main_module.logging, 'error', env.log_error)
+    return env
+
+
+# The script guard at the end of main.py, compiled once for the module
+_MAIN_GUARD = 'if __name__ == "__main__":\n    main()'
+_MAIN_GUARD_CODE = compile(_MAIN_GUARD, '<main guard>', 'exec')
+
+@pytest.fixture
+def mock_forwarder(patched_main):
+    """MockDNSManager that main() gets from the patched DNSManager."""
+    forwarder = MockDNSManager()
+    patched_main.dns_manager_class.return_value = forwarder
+    return forwarder
+
+
+# Messages main() logs when the forwarder stops; kept here, not imported, so wording changes show up
+EXPECTED_KB_MSG = "DNS Forwarder stopped by user"
+EXPECTED_ERR_FMT = "DNS Forwarder stopped due to error: %s"
+EXPECTED_STOP_ERR_FMT = "Failed to stop DNS Forwarder: %s"
+
+
+@dataclass(frozen=True)
+class MainRunCase:
+    """One way a main() run can end, and what it should leave behind."""
+    id: str
+    start_error: Optional[BaseException] = None
+    stop_error: Optional[BaseException] = None
+    # (logging function name, expected call args) for each message main() logs, in order
+    expected_logs: Tuple[Tuple[str, tuple], ...] = ()
+
+
+MAIN_RUN_CASES = [
+    MainRunCase("success"),
+    MainRunCase("keyboard_interrupt", start_error=KeyboardInterrupt("User interrupted"),
+                expected_logs=(('info', (EXPECTED_KB_MSG,)),)),
+    MainRunCase("general_exception", start_error=Exception("Network error"),
+                expected_logs=(('error', (EXPECTED_ERR_FMT, "Network error")),)),
+    MainRunCase("runtime_error", start_error=RuntimeError("Runtime error"),
+                expected_logs=(('error', (EXPECTED_ERR_FMT, "Runtime error")),)),
+    MainRunCase("error_message_formatting",
+                start_error=Exception("Connection failed: timeout after 30 seconds"),
+                expected_logs=(('error', (EXPECTED_ERR_FMT, "Connection failed: timeout after 30 seconds")),)),
+    # Should not raise an exception despite stop() failing, only log it
+    MainRunCase("stop_method_exception", start_error=KeyboardInterrupt(), stop_error=Exception("Stop error"),
+                expected_logs=(('info', (EXPECTED_KB_MSG,)), ('error', (EXPECTED_STOP_ERR_FMT, "Stop error")))),
+]
 
 
 class TestMain:
     """Test cases for main module."""
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_success(self, mock_logging_config, mock_dns_manager_class):
-        """Test successful main execution."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        main.main()
-        
+    @pytest.mark.parametrize("case", MAIN_RUN_CASES, ids=lambda case: case.id)
+    def test_main_run(self, main_module, patched_main, mock_forwarder, case):
+        """Test how main() reports and cleans up after each way start() can end."""
+        mock_forwarder.start_error = case.start_error
+        mock_forwarder.stop_error = case.stop_error
+
+        main_module.main()
+
         # Verify logging was configured
-        mock_logging_config.assert_called_once_with(
-            level=main.logging.INFO,
+        patched_main.logging_config.assert_called_once_with(
+            level=main_module.logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
-        
+
         # Verify DNS manager was created and started
-        mock_dns_manager_class.assert_called_once()
-        assert mock_forwarder.started is True
+        patched_main.dns_manager_class.assert_called_once_with()
         assert mock_forwarder.start_calls == 1
+        assert mock_forwarder.started is (case.start_error is None)
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    @patch('logging.info')
-    def test_main_keyboard_interrupt(self, mock_log_info, mock_logging_config, mock_dns_manager_class):
-        """Test main execution with keyboard interrupt."""
-        mock_forwarder = MockDNSManager()
-        mock_forwarder.start = Mock(side_effect=KeyboardInterrupt("User interrupted"))
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        main.main()
-        
-        # Verify logging was configured
-        mock_logging_config.assert_called_once()
-        
-        # Verify DNS manager was created and started
-        mock_dns_manager_class.assert_called_once()
-        
-        # Verify keyboard interrupt was logged
-        mock_log_info.assert_called_with("DNS Forwarder stopped by user")
-        
-        # Verify stop was called
-        assert mock_forwarder.stop_calls == 1
+        # Verify the outcome was logged, and only through the expected handlers
+        logs = {'info': patched_main.log_info, 'error': patched_main.log_error}
+        for log_fn, log in logs.items():
+            expected = [call(*log_args) for fn, log_args in case.expected_logs if fn == log_fn]
+            assert log.call_args_list == expected
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    @patch('logging.error')
-    def test_main_general_exception(self, mock_log_error, mock_logging_config, mock_dns_manager_class):
-        """Test main execution with general exception."""
-        mock_forwarder = MockDNSManager()
-        mock_forwarder.start = Mock(side_effect=Exception("Network error"))
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        main.main()
-        
-        # Verify logging was configured
-        mock_logging_config.assert_called_once()
-        
-        # Verify DNS manager was created and started
-        mock_dns_manager_class.assert_called_once()
-        
-        # Verify exception was logged
-        mock_log_error.assert_called_with("DNS Forwarder stopped due to error: %s", "Network error")
-        
-        # Verify stop was called
+        # Stopped exactly once, however the run ended
         assert mock_forwarder.stop_calls == 1
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_finally_block_execution(self, mock_logging_config, mock_dns_manager_class):
-        """Test that finally block always executes."""
-        mock_forwarder = MockDNSManager()
-        mock_forwarder.start = Mock(side_effect=Exception("Test error"))
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        main.main()
-        
-        # Verify stop was called in finally block
-        assert mock_forwarder.stop_calls == 2  # Once in except, once in finally
-
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_forwarder_none_handling(self, mock_logging_config, mock_dns_manager_class):
+    def test_main_forwarder_none_handling(self, main_module, patched_main):
         """Test main execution when forwarder is None."""
-        mock_dns_manager_class.return_value = None
+        patched_main.dns_manager_class.return_value = None
         
         # Should not raise an exception
-        main.main()
-        
-        # Verify logging was configured
-        mock_logging_config.assert_called_once()
-
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_stop_method_exception(self, mock_logging_config, mock_dns_manager_class):
-        """Test main execution when stop method raises exception."""
-        mock_forwarder = MockDNSManager()
-        mock_forwarder.stop = Mock(side_effect=Exception("Stop error"))
-        mock_forwarder.start = Mock(side_effect=KeyboardInterrupt())
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        # Should not raise an exception despite stop() failing
-        main.main()
+        main_module.main()
         
         # Verify logging was configured
-        mock_logging_config.assert_called_once()
-
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_logging_configuration(self, mock_logging_config, mock_dns_manager_class):
-        """Test that logging is configured correctly."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        main.main()
-        
-        # Verify logging configuration parameters
-        mock_logging_config.assert_called_once_with(
-            level=main.logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
-
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_dns_manager_creation(self, mock_logging_config, mock_dns_manager_class):
-        """Test that DNS manager is created correctly."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        main.main()
-        
-        # Verify DNS manager was created with no arguments
-        mock_dns_manager_class.assert_called_once_with()
+        patched_main.logging_config.assert_called_once()
+        # The failed start is reported like any other error
+        patched_main.log_error.assert_called_once()
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_start_method_called(self, mock_logging_config, mock_dns_manager_class):
-        """Test that start method is called on DNS manager."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        main.main()
-        
-        # Verify start was called exactly once
-        assert mock_forwarder.start_calls == 1
-
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    @patch('logging.info')
-    @patch('logging.error')
-    def test_main_exception_handling_order(self, mock_log_error, mock_log_info, 
-                                          mock_logging_config, mock_dns_manager_class):
-        """Test that exceptions are handled in the correct order."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        # Test KeyboardInterrupt is caught before general Exception
-        mock_forwarder.start = Mock(side_effect=KeyboardInterrupt("User stop"))
-        main.main()
-        
-        mock_log_info.assert_called_with("DNS Forwarder stopped by user")
-        mock_log_error.assert_not_called()
-        
-        # Reset mocks
-        mock_log_info.reset_mock()
-        mock_log_error.reset_mock()
-        
-        # Test general Exception is caught
-        mock_forwarder.start = Mock(side_effect=RuntimeError("Runtime error"))
-        main.main()
-        
-        mock_log_error.assert_called_with("DNS Forwarder stopped due to error: %s", "Runtime error")
-        mock_log_info.assert_not_called()
-
-    def test_main_module_execution(self):
+    def test_main_module_execution(self, main_module):
         """Test that main is called when module is executed directly."""
-        with patch('main.main') as mock_main_func:
-            # Simulate running the module directly
-            with patch('__main__.__name__', '__main__'):
-                # Import and execute the module's __name__ == '__main__' block
-                exec("""
-if __name__ == "__main__":
-    main()
-                """, {'__name__': '__main__', 'main': mock_main_func})
-            
-            mock_main_func.assert_called_once()
+        # main.py ends with the guard...
+        source = Path(main_module.__file__).read_text()
+        assert _MAIN_GUARD in source
+
+        # ...which calls main() when run as a script
+        mock_main_func = Mock()
+        exec(_MAIN_GUARD_CODE, {'__name__': '__main__', 'main': mock_main_func})
+        mock_main_func.assert_called_once()
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_resource_cleanup(self, mock_logging_config, mock_dns_manager_class):
+    def test_main_resource_cleanup(self, main_module, mock_forwarder):
         """Test that resources are properly cleaned up."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
         
         # Test normal execution
-        main.main()
+        main_module.main()
         assert mock_forwarder.stop_calls == 1
         
         # Reset
         mock_forwarder.stop_calls = 0
         
         # Test with exception
-        mock_forwarder.start = Mock(side_effect=Exception("Test error"))
-        main.main()
-        assert mock_forwarder.stop_calls == 2  # Once in except, once in finally
+        mock_forwarder.start_error = Exception("Test error")
+        main_module.main()
+        assert mock_forwarder.stop_calls == 1
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_multiple_calls(self, mock_logging_config, mock_dns_manager_class):
+    def test_main_multiple_calls(self, main_module, patched_main, mock_forwarder):
         """Test that main can be called multiple times."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
         
         # Call main multiple times
-        main.main()
-        main.main()
-        main.main()
+        main_module.main()
+        main_module.main()
+        main_module.main()
         
         # Verify each call creates a new DNS manager
-        assert mock_dns_manager_class.call_count == 3
+        assert patched_main.dns_manager_class.call_count == 3
         assert mock_forwarder.start_calls == 3
         assert mock_forwarder.stop_calls == 3
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_import_safety(self, mock_logging_config, mock_dns_manager_class):
+    def test_main_import_safety(self, main_module, patched_main):
         """Test that importing main module doesn't execute main function."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        # Simply importing the module should not call main
-        # (This test verifies the if __name__ == "__main__": guard works)
-        
-        # Reset call counts
-        mock_dns_manager_class.reset_mock()
-        
-        # Re-import the module (simulating import)
-        import importlib
-        importlib.reload(main)
-        
-        # main() should not have been called during import
-        mock_dns_manager_class.assert_not_called()
+        # main() only runs behind the __name__ == "__main__" guard...
+        source = Path(main_module.__file__).read_text()
+        assert 'if __name__ == "__main__":' in source
 
-    @patch('main.DNSManager')
-    @patch('logging.basicConfig')
-    def test_main_error_message_formatting(self, mock_logging_config, mock_dns_manager_class):
-        """Test that error messages are formatted correctly."""
-        mock_forwarder = MockDNSManager()
-        mock_dns_manager_class.return_value = mock_forwarder
-        
-        test_error_message = "Connection failed: timeout after 30 seconds"
-        mock_forwarder.start = Mock(side_effect=Exception(test_error_message))
-        
-        with patch('logging.error') as mock_log_error:
-            main.main()
-            
-            # Verify error message is formatted with the exception string
-            mock_log_error.assert_called_with(
-                "DNS Forwarder stopped due to error: %s", 
-                test_error_message
-            ) 
\ No newline at end of file
+        # ...so having imported the module created no DNS manager
+        assert patched_main.dns_manager_class.call_count == 0
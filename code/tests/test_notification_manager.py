@@ -1,68 +1,88 @@
-import pytest
-from unittest.mock import Mock, patch, call
-from datetime import datetime
-import sys
-import os
+import threading
+import time
 
-# Add the src directory to the path so we can import modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import pytest
+from collections import deque
+from unittest.mock import Mock, patch
 
-from notification_manager import NotificationManager
 from os_handlers.base import OSHandler
 
 
-class MockOSHandler(OSHandler):
-    """Mock OS handler for testing."""
-    
-    def __init__(self):
-        self.notifications = []
-    
-    def get_local_dns(self) -> str:
-        return "192.168.1.1"
-    
-    def get_active_interface(self) -> str:
-        return "eth0"
-    
-    def set_dns(self, dns_ip: str = "127.0.0.1") -> bool:
-        return True
-    
-    def notify(self, title: str, message: str, notification_type: str = "info", 
-               urgency: str = "normal", timeout: int = 5000) -> None:
-        self.notifications.append({
+# Shared configuration for the spec'd OS handler mock. Copying a prebuilt Mock
+# would share its child mocks, and with them the recorded calls, between tests
+_OS_HANDLER_CONFIG = {
+    "get_local_dns.return_value": "192.168.1.1",
+    "get_active_interface.return_value": "eth0",
+    "set_dns.return_value": True,
+}
+
+
+@pytest.fixture(scope="class")
+def class_os_handler():
+    """Mock OS handler that records every notification it is asked to show."""
+    handler = Mock(spec=OSHandler, **_OS_HANDLER_CONFIG)
+    handler.notifications = []
+
+    def notify(title, message, notification_type="info", urgency="normal", timeout=5000):
+        handler.notifications.append({
             "title": title,
             "message": message,
             "type": notification_type,
             "urgency": urgency,
             "timeout": timeout
         })
+    handler.notify.side_effect = notify
+    return handler
+
+
+@pytest.fixture(scope="class")
+def manager(notification_manager_module, class_os_handler):
+    """NotificationManager shared by the tests of a class; _reset clears its state between tests."""
+    manager = notification_manager_module.NotificationManager(class_os_handler)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture(autouse=True, scope="module")
+def _freeze_time():
+    """Freeze the clock NotificationManager stamps history entries with, once for the module."""
+    with patch('notification_manager.datetime') as mock_datetime:
+        mock_datetime.now.return_value.isoformat.return_value = "2023-01-01T10:00:00"
+        yield mock_datetime
+
+
+@pytest.fixture(autouse=True)
+def _reset(manager, class_os_handler, _freeze_time):
+    """Give every test an empty history, a handler with no recorded notifications and a frozen clock."""
+    manager.flush()  # Let the previous test's notifications reach the handler first
+    manager.notification_history.clear()
+    vars(manager).pop('notify', None)  # Undo tests that rebind notify on the shared manager
+    class_os_handler.notifications.clear()
+    class_os_handler.reset_mock()
+    _freeze_time.now.return_value.isoformat.side_effect = None
 
 
 class TestNotificationManager:
     """Test cases for NotificationManager class."""
 
-    def test_init(self):
+    def test_init(self, manager, class_os_handler):
         """Test NotificationManager initialization."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
-        assert manager.os_handler == mock_os_handler
-        assert manager.notification_history == []
+        assert manager.os_handler == class_os_handler
+        assert manager.notification_history == deque()
         assert hasattr(manager, 'logger')
 
-    def test_notify_basic(self):
+    def test_notify_basic(self, manager, class_os_handler):
         """Test basic notification functionality."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
         with patch.object(manager, '_log_notification') as mock_log:
             manager.notify("Test Title", "Test Message", "info")
+            assert manager.flush()
             
             # Check that logging was called
             mock_log.assert_called_once_with("Test Title", "Test Message", "info")
             
             # Check that OS handler was called
-            assert len(mock_os_handler.notifications) == 1
-            notification = mock_os_handler.notifications[0]
+            assert len(class_os_handler.notifications) == 1
+            notification = class_os_handler.notifications[0]
             assert notification["title"] == "Test Title"
             assert notification["message"] == "Test Message"
             assert notification["type"] == "info"
@@ -75,49 +95,28 @@ class TestNotificationManager:
             assert history_entry["type"] == "info"
             assert "timestamp" in history_entry
 
-    def test_notify_default_type(self):
+    def test_notify_default_type(self, manager, class_os_handler):
         """Test notification with default type."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
         manager.notify("Title", "Message")
+        manager.flush()
         
         # Check default type is "info"
         assert manager.notification_history[0]["type"] == "info"
-        assert mock_os_handler.notifications[0]["type"] == "info"
+        assert class_os_handler.notifications[0]["type"] == "info"
 
-    def test_log_notification_info(self):
-        """Test logging of info notifications."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
-        with patch.object(manager.logger, 'info') as mock_info:
-            manager._log_notification("Title", "Message", "info")
-            mock_info.assert_called_once_with("Title: Message")
-
-    def test_log_notification_warning(self):
-        """Test logging of warning notifications."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
-        with patch.object(manager.logger, 'warning') as mock_warning:
-            manager._log_notification("Title", "Message", "warning")
-            mock_warning.assert_called_once_with("Title: Message")
-
-    def test_log_notification_error(self):
-        """Test logging of error notifications."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
-        with patch.object(manager.logger, 'error') as mock_error:
-            manager._log_notification("Title", "Message", "error")
-            mock_error.assert_called_once_with("Title: Message")
+    @pytest.mark.parametrize("notification_type, logger_method", [
+        ("info", "info"),
+        ("warning", "warning"),
+        ("error", "error"),
+    ])
+    def test_log_notification(self, manager, notification_type, logger_method):
+        """Test that each notification type is logged at the matching level."""
+        with patch.object(manager.logger, logger_method) as mock_log:
+            manager._log_notification("Title", "Message", notification_type)
+            mock_log.assert_called_once_with("Title: Message")
 
-    def test_get_notification_history(self):
+    def test_get_notification_history(self, manager):
         """Test getting notification history."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
         # Initially empty
         assert manager.get_notification_history() == []
         
@@ -130,11 +129,23 @@ class TestNotificationManager:
         assert history[0]["title"] == "Title1"
         assert history[1]["title"] == "Title2"
 
-    def test_clear_notification_history(self):
-        """Test clearing notification history."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
+        # Callers get a snapshot list, not the manager's own deque
+        history.clear()
+        assert len(manager.notification_history) == 2
+
+    def test_notification_history_is_bounded(self, manager, notification_manager_module):
+        """Test that only the most recent notifications are kept in the history."""
+        size = notification_manager_module.NOTIFICATION_HISTORY_SIZE
+        for i in range(size + 1):
+            manager.notify(f"Title{i}", "Message")
         
+        history = manager.get_notification_history()
+        assert len(history) == size
+        assert history[0]["title"] == "Title1"
+        assert history[-1]["title"] == f"Title{size}"
+
+    def test_clear_notification_history(self, manager):
+        """Test clearing notification history."""
         # Add some notifications
         manager.notify("Title1", "Message1")
         manager.notify("Title2", "Message2")
@@ -144,139 +155,143 @@ class TestNotificationManager:
         manager.clear_notification_history()
         assert len(manager.notification_history) == 0
 
-    def test_notify_dns_change(self):
-        """Test DNS change notification."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
-        with patch.object(manager, 'notify') as mock_notify:
-            manager.notify_dns_change("8.8.8.8", "1.1.1.1")
-            
-            mock_notify.assert_called_once_with(
-                "DNS Server Changed",
-                "DNS server changed from 8.8.8.8 to 1.1.1.1",
-                "info"
-            )
-
-    def test_notify_dns_error(self):
-        """Test DNS error notification."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
+    @pytest.mark.parametrize("method_name, args, expected_notify_args", [
+        pytest.param("notify_dns_change", ("8.8.8.8", "1.1.1.1"),
+                     ("DNS Server Changed", "DNS server changed from 8.8.8.8 to 1.1.1.1", "info"),
+                     id="dns_change"),
+        pytest.param("notify_dns_error", ("Failed to configure DNS",),
+                     ("DNS Configuration Error", "Failed to configure DNS", "error"),
+                     id="dns_error"),
+        pytest.param("notify_service_status", ("Started",),
+                     ("Service Status Update", "DNS Forwarder Service: Started", "info"),
+                     id="service_status_without_details"),
+        pytest.param("notify_service_status", ("Started", "Using primary DNS: 8.8.8.8"),
+                     ("Service Status Update",
+                      "DNS Forwarder Service: Started\nDetails: Using primary DNS: 8.8.8.8", "info"),
+                     id="service_status_with_details"),
+        pytest.param("notify_domain_inappropriate_content", ("example.com", "Contains malware"),
+                     ("Inappropriate Content Alert",
+                      "The domain example.com was flagged for inappropriate content.\nReason: Contains malware",
+                      "warning"),
+                     id="domain_inappropriate_content"),
+    ])
+    def test_convenience_wrappers(self, manager, method_name, args, expected_notify_args):
+        """Test that each convenience method sends the expected notification."""
+        recorded = []
+        manager.notify = lambda *args, **kwargs: recorded.append((args, kwargs))
         
-        with patch.object(manager, 'notify') as mock_notify:
-            manager.notify_dns_error("Failed to configure DNS")
-            
-            mock_notify.assert_called_once_with(
-                "DNS Configuration Error",
-                "Failed to configure DNS",
-                "error"
-            )
-
-    def test_notify_service_status_without_details(self):
-        """Test service status notification without details."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
-        with patch.object(manager, 'notify') as mock_notify:
-            manager.notify_service_status("Started")
-            
-            mock_notify.assert_called_once_with(
-                "Service Status Update",
-                "DNS Forwarder Service: Started",
-                "info"
-            )
-
-    def test_notify_service_status_with_details(self):
-        """Test service status notification with details."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
+        getattr(manager, method_name)(*args)
         
-        with patch.object(manager, 'notify') as mock_notify:
-            manager.notify_service_status("Started", "Using primary DNS: 8.8.8.8")
-            
-            expected_message = "DNS Forwarder Service: Started\nDetails: Using primary DNS: 8.8.8.8"
-            mock_notify.assert_called_once_with(
-                "Service Status Update",
-                expected_message,
-                "info"
-            )
-
-    def test_notify_domain_inappropriate_content(self):
-        """Test inappropriate content notification."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
-        with patch.object(manager, 'notify') as mock_notify:
-            manager.notify_domain_inappropriate_content("example.com", "Contains malware")
-            
-            expected_message = "The domain example.com was flagged for inappropriate content.\nReason: Contains malware"
-            mock_notify.assert_called_once_with(
-                "Inappropriate Content Alert",
-                expected_message,
-                "warning"
-            )
-
-    def test_multiple_notifications_history_order(self):
+        assert recorded == [(expected_notify_args, {})]
+
+    def test_multiple_notifications_history_order(self, manager, _freeze_time):
         """Test that notification history maintains chronological order."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
+        # Return predictable, increasing timestamps
+        _freeze_time.now.return_value.isoformat.side_effect = [
+            "2023-01-01T10:00:00",
+            "2023-01-01T10:00:01", 
+            "2023-01-01T10:00:02"
+        ]
         
-        # Add notifications with slight delay to ensure different timestamps
-        with patch('notification_manager.datetime') as mock_datetime:
-            # Mock datetime to return predictable timestamps
-            mock_datetime.now.side_effect = [
-                datetime(2023, 1, 1, 10, 0, 0),
-                datetime(2023, 1, 1, 10, 0, 1),
-                datetime(2023, 1, 1, 10, 0, 2)
-            ]
-            mock_datetime.now().isoformat.side_effect = [
-                "2023-01-01T10:00:00",
-                "2023-01-01T10:00:01", 
-                "2023-01-01T10:00:02"
-            ]
-            
-            manager.notify("First", "Message1")
-            manager.notify("Second", "Message2")
-            manager.notify("Third", "Message3")
+        manager.notify("First", "Message1")
+        manager.notify("Second", "Message2")
+        manager.notify("Third", "Message3")
         
         history = manager.get_notification_history()
         assert len(history) == 3
-        assert history[0]["title"] == "First"
-        assert history[1]["title"] == "Second"
-        assert history[2]["title"] == "Third"
+        assert [entry["title"] for entry in history] == ["First", "Second", "Third"]
+        assert [entry["timestamp"] for entry in history] == [
+            "2023-01-01T10:00:00", "2023-01-01T10:00:01", "2023-01-01T10:00:02"]
 
-    def test_notification_timestamp_format(self):
+    def test_notification_timestamp_format(self, manager):
         """Test that notification timestamps are in ISO format."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
+        manager.notify("Test", "Message")
         
-        with patch('notification_manager.datetime') as mock_datetime:
-            mock_datetime.now.return_value.isoformat.return_value = "2023-01-01T10:00:00"
-            
-            manager.notify("Test", "Message")
-            
-            history = manager.get_notification_history()
-            assert history[0]["timestamp"] == "2023-01-01T10:00:00"
+        history = manager.get_notification_history()
+        assert history[0]["timestamp"] == "2023-01-01T10:00:00"
 
-    def test_os_handler_integration(self):
+    def test_os_handler_integration(self, manager, class_os_handler):
         """Test integration with OS handler."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
         manager.notify("Test Title", "Test Message", "warning")
+        manager.flush()
         
         # Check that OS handler received the notification
-        assert len(mock_os_handler.notifications) == 1
-        notification = mock_os_handler.notifications[0]
+        assert len(class_os_handler.notifications) == 1
+        notification = class_os_handler.notifications[0]
         assert notification["title"] == "Test Title"
         assert notification["message"] == "Test Message"
         assert notification["type"] == "warning"
 
-    def test_notification_types(self):
-        """Test different notification types."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
+    def test_notify_does_not_wait_for_os_handler(self, notification_manager_module, class_os_handler):
+        """Test that notify() returns while the OS handler is still showing an earlier notification."""
+        release = threading.Event()
+        slow_handler = Mock(spec=OSHandler)
+        slow_handler.notify.side_effect = lambda *args: release.wait(5)
+        manager = notification_manager_module.NotificationManager(slow_handler)
         
+        manager.notify("First", "Message1")
+        manager.notify("Second", "Message2")
+        assert len(manager.notification_history) == 2
+        assert not manager.flush(timeout=0.01)
+        
+        release.set()
+        assert manager.flush()
+        assert [c.args[0] for c in slow_handler.notify.call_args_list] == ["First", "Second"]
+        manager.close()
+
+    def test_notify_drops_when_queue_full(self, notification_manager_module, monkeypatch):
+        """Test that notifications beyond the queue size are logged and dropped, not waited on."""
+        monkeypatch.setattr(notification_manager_module, 'NOTIFICATION_QUEUE_SIZE', 1)
+        release = threading.Event()
+        slow_handler = Mock(spec=OSHandler)
+        slow_handler.notify.side_effect = lambda *args: release.wait(5)
+        manager = notification_manager_module.NotificationManager(slow_handler)
+        
+        manager.notify("Shown", "Message")
+        while slow_handler.notify.call_count == 0:  # Delivery thread is now busy with it
+            time.sleep(0.001)
+        manager.notify("Queued", "Message")
+        manager.notify("Dropped", "Message")
+        
+        release.set()
+        assert manager.flush()
+        assert [c.args[0] for c in slow_handler.notify.call_args_list] == ["Shown", "Queued"]
+        # History still records every notification
+        assert len(manager.notification_history) == 3
+        manager.close()
+
+    def test_close_stops_delivery_thread(self, notification_manager_module):
+        """Test that close() shows what was already sent, then ends the delivery thread."""
+        handler = Mock(spec=OSHandler)
+        manager = notification_manager_module.NotificationManager(handler)
+        
+        manager.notify("Last", "Message")
+        manager.close()
+        
+        assert not manager._delivery_thread.is_alive()
+        assert [c.args[0] for c in handler.notify.call_args_list] == ["Last"]
+
+    def test_os_handler_failure_does_not_stop_delivery(self, manager, class_os_handler):
+        """Test that an OS handler error doesn't stop later notifications from being shown."""
+        notify = class_os_handler.notify.side_effect
+        failures = [RuntimeError("notify-send missing")]
+
+        def flaky_notify(*args):
+            if failures:
+                raise failures.pop()
+            notify(*args)
+        class_os_handler.notify.side_effect = flaky_notify
+        try:
+            manager.notify("First", "Message1")
+            manager.notify("Second", "Message2")
+            manager.flush()
+        finally:
+            class_os_handler.notify.side_effect = notify
+        
+        assert [n["title"] for n in class_os_handler.notifications] == ["Second"]
+
+    def test_notification_types(self, manager):
+        """Test different notification types."""
         types = ["info", "warning", "error", "custom"]
         
         for notification_type in types:
@@ -288,11 +303,8 @@ class TestNotificationManager:
         for i, notification_type in enumerate(types):
             assert history[i]["type"] == notification_type
 
-    def test_empty_strings_handling(self):
+    def test_empty_strings_handling(self, manager):
         """Test handling of empty strings in notifications."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
         manager.notify("", "", "info")
         
         history = manager.get_notification_history()
@@ -301,11 +313,8 @@ class TestNotificationManager:
         assert history[0]["message"] == ""
         assert history[0]["type"] == "info"
 
-    def test_special_characters_in_notifications(self):
+    def test_special_characters_in_notifications(self, manager):
         """Test handling of special characters in notifications."""
-        mock_os_handler = MockOSHandler()
-        manager = NotificationManager(mock_os_handler)
-        
         special_title = "Title with émojis 🚀 and symbols @#$%"
         special_message = "Message with\nnewlines and\ttabs"
         
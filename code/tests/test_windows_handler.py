@@ -0,0 +1,136 @@
+import sys
+from contextlib import contextmanager
+
+import pytest
+from unittest.mock import Mock, patch
+
+# The handler module imports platform-specific packages; skip rather than fail without them
+WindowsHandler = pytest.importorskip("os_handlers.windows").WindowsHandler
+
+
+class FakeWinreg:
+    """Stand-in for the winreg module serving one TCP/IP Interfaces key."""
+    HKEY_LOCAL_MACHINE = "HKLM"
+
+    def __init__(self, interfaces):
+        self.interfaces = interfaces  # adapter GUID -> {value name: data}
+
+    @contextmanager
+    def OpenKey(self, key, sub_key):
+        yield self.interfaces if key == self.HKEY_LOCAL_MACHINE else key[sub_key]
+
+    def QueryInfoKey(self, key):
+        return len(key), len(key), 0
+
+    def EnumKey(self, key, index):
+        return list(key)[index]
+
+    def QueryValueEx(self, key, name):
+        if name not in key:
+            raise FileNotFoundError(name)
+        return key[name], 1
+
+
+@pytest.fixture
+def no_registry_dns(windows_handler, monkeypatch):
+    """Make the registry lookup come up empty, so get_local_dns falls back to ipconfig."""
+    monkeypatch.setattr(windows_handler, '_get_registry_dns', lambda: None)
+
+
+@pytest.fixture(scope="module")
+def windows_handler():
+    """One WindowsHandler shared by the module's tests; they patch what they change."""
+    return WindowsHandler()
+
+
+class TestWindowsHandler:
+    """Test cases for WindowsHandler."""
+
+    def test_init(self, windows_handler):
+        """Test WindowsHandler initialization."""
+        assert hasattr(windows_handler, 'logger')
+
+    def test_get_local_dns_success(self, windows_handler, no_registry_dns, mock_run):
+        """Test getting local DNS on Windows."""
+        # Mock successful netsh command output
+        mock_run.return_value = Mock(returncode=0, stdout=b"DNS Servers configured through DHCP: 192.168.1.1")
+
+        result = windows_handler.get_local_dns()
+        assert result == "192.168.1.1"
+
+    def test_get_local_dns_failure(self, windows_handler, no_registry_dns, mock_run):
+        """Test getting local DNS failure on Windows."""
+        # Mock failed netsh command
+        mock_run.return_value = Mock(returncode=1, stdout=b"")
+
+        result = windows_handler.get_local_dns()
+        assert result == "8.8.8.8"  # Should return default
+
+    @pytest.mark.parametrize("stdout, expected", [
+        (b"   DNS Servers . . . . . . . . . . . : 10.0.0.53\r\n", "10.0.0.53"),
+        (b"   DNS Servers . . . . . . . . . . . :\r\n   NetBIOS over Tcpip. . . . . . . . : Enabled 1.2.3.4", None),
+        (b"   DNS Servers . . . . . . . . . . . : fe80::1%12\r\n"
+         b"                                       192.168.1.1\r\n"
+         b"   NetBIOS over Tcpip. . . . . . . . : Enabled\r\n", "192.168.1.1"),
+        (b"Ethernet adapter vEthernet (Default Switch):\r\n"
+         b"   DNS Servers . . . . . . . . . . . : fec0:0:0:ffff::1%1\r\n"
+         b"                                       fec0:0:0:ffff::2%1\r\n"
+         b"   NetBIOS over Tcpip. . . . . . . . : Enabled\r\n"
+         b"Wireless LAN adapter Wi-Fi:\r\n"
+         b"   DNS Servers . . . . . . . . . . . : 192.168.1.1\r\n", "192.168.1.1"),
+    ], ids=["ipconfig_line", "address_on_other_line", "ipv6_first", "ipv6_only_adapter_first"])
+    def test_get_ipconfig_dns(self, windows_handler, mock_run, stdout, expected):
+        """Test that only addresses listed under DNS Servers are taken from ipconfig."""
+        mock_run.return_value = Mock(returncode=0, stdout=stdout)
+
+        assert windows_handler._get_ipconfig_dns() == expected
+
+    def test_get_local_dns_from_registry(self, windows_handler, monkeypatch, mock_run):
+        """Test that a DNS server found in the registry is used without running ipconfig."""
+        monkeypatch.setattr(windows_handler, '_get_registry_dns', lambda: "10.0.0.1")
+        
+        assert windows_handler.get_local_dns() == "10.0.0.1"
+        mock_run.assert_not_called()
+
+    def test_get_registry_dns(self, windows_handler, monkeypatch):
+        """Test reading the DNS server of the first connected adapter from the registry."""
+        monkeypatch.setitem(sys.modules, 'winreg', FakeWinreg({
+            "{disconnected}": {"DhcpIPAddress": "0.0.0.0", "DhcpNameServer": "192.168.0.1"},
+            "{no-dns}": {"DhcpIPAddress": "10.1.1.5"},
+            "{wifi}": {"DhcpIPAddress": "192.168.1.20", "DhcpNameServer": "192.168.1.1 192.168.1.2"},
+        }))
+        
+        assert windows_handler._get_registry_dns() == "192.168.1.1"
+
+    def test_get_registry_dns_prefers_static_servers(self, windows_handler, monkeypatch):
+        """Test that statically configured DNS servers win over DHCP-provided ones."""
+        monkeypatch.setitem(sys.modules, 'winreg', FakeWinreg({
+            "{ethernet}": {"IPAddress": ["10.0.0.5"], "NameServer": "9.9.9.9,1.1.1.1",
+                           "DhcpNameServer": "10.0.0.1"},
+        }))
+        
+        assert windows_handler._get_registry_dns() == "9.9.9.9"
+
+    def test_set_dns_success(self, windows_handler, mock_run):
+        """Test setting DNS on Windows."""
+        with patch.object(windows_handler, 'get_active_interface', return_value="Wi-Fi"):
+            result = windows_handler.set_dns("127.0.0.1")
+            assert result is True
+
+    def test_set_dns_failure(self, windows_handler, mock_run):
+        """Test setting DNS failure on Windows."""
+        # Mock failed command
+        mock_run.return_value.returncode = 1
+
+        with patch.object(windows_handler, 'get_active_interface', return_value="Wi-Fi"):
+            result = windows_handler.set_dns("127.0.0.1")
+            assert result is False
+
+    def test_notify(self, windows_handler):
+        """Test notification on Windows."""
+        with patch('win10toast.ToastNotifier') as mock_toast:
+            mock_notifier = Mock()
+            mock_toast.return_value = mock_notifier
+
+            windows_handler.notify("Test Title", "Test Message")
+            mock_notifier.show_toast.assert_called_once()